@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import banco_tkx
+import bi_operacional
+import cache_consultas
+import calculadora_tkx
+import consolidado_dre
+import distribuicao_precos
+import janelas_metricas
+import rastreamento_sql
+import relatorio_repasse
+import simulador_preco
+
+# API HTTP (JSON) de cotação, DRE e BI para o dashboard React e outras ferramentas.
+#
+#   GET  /saude
+#   GET  /cotacao?km=7.5&hora=18:30          cotação com a dinâmica do horário e o DRE da corrida
+#   POST /cotacoes  {"corridas": [{"km": 7.5, "hora": "18:30"}, ...]}
+#   GET  /dre[?mes=AAAA-MM | ?inicio=AAAA-MM-DD&fim=AAAA-MM-DD]
+#   GET  /turnos[?limite=10&ordem=comissao|corridas]
+#   GET  /precos[?inicio=AAAA-MM&fim=AAAA-MM&turno=NOITE&faixa=2&metrica=razao]
+#   GET  /motoristas/<id>/extrato[?corridas=1]
+#   GET  /motoristas/<id>/janelas, /clientes/<id>/janelas   7, 30 e 90 dias[?hoje=AAAA-MM-DD]
+#   GET  /alertas[?limite=4.5&janela=7&hoje=AAAA-MM-DD]     motoristas com a nota em queda
+#
+# O laço asyncio só lê e escreve nos sockets: o SQLite roda num pool limitado de threads,
+# cada uma com a sua conexão de leitura (banco_tkx.conectar() é por thread e reaproveitada).
+# Com o pool e a fila cheios a API responde 503 em vez de acumular requisições.
+#
+# Respostas de GET levam ETag calculado das versões (versoes_tabelas) das tabelas lidas,
+# checadas por PRAGMA data_version como no cache_consultas: If-None-Match com o mesmo ETag
+# devolve 304 sem rodar a consulta. A /cotacao sem hora usa a hora atual e vai sem ETag.
+# Carga local: python carga_api.py --servidor
+
+PORTA_PADRAO = 8080
+THREADS = 4
+MAX_PENDENTES = 64       # requisições no pool (rodando + na fila) antes de responder 503
+MAX_CORPO = 1_048_576
+MAX_LOTE = 10_000        # corridas por POST /cotacoes
+TIMEOUT_OCIOSO = 30      # segundos de conexão keep-alive parada
+
+MENSAGENS = {200: "OK", 204: "No Content", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+             405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ErroHTTP(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _numero(consulta, nome, tipo=float, padrao=None):
+    valor = consulta.get(nome, padrao)
+    if valor is None:
+        raise ErroHTTP(400, f"parâmetro '{nome}' obrigatório")
+    try:
+        return tipo(valor)
+    except (TypeError, ValueError):
+        raise ErroHTTP(400, f"parâmetro '{nome}' inválido: {valor!r}") from None
+
+
+# --- Rotas (rodam nas threads do pool) ---
+
+def _saude(consulta, corpo):
+    return {"status": "ok", "banco": banco_tkx.caminho_banco(), "municipio": banco_tkx.municipio_atual()}
+
+
+def _cotacao(consulta, corpo):
+    km = _numero(consulta, "km")
+    hora = consulta.get("hora") or datetime.now().strftime("%H:%M")
+    try:
+        periodo, multiplicador, valor = simulador_preco.cotar_corrida(km, hora)
+    except ValueError as e:
+        raise ErroHTTP(400, str(e)) from None
+    try:
+        dre = calculadora_tkx.calcular_dre(km, valor)._asdict()
+    except LookupError:
+        dre = None  # município sem configuração: a cotação vale, o DRE não
+    return {"km": km, "hora": hora, "periodo": periodo, "multiplicador": multiplicador, "valor": valor, "dre": dre}
+
+
+def _cotacoes(consulta, corpo):
+    try:
+        corridas = json.loads(corpo or b"{}")["corridas"]
+        distancias = [float(c["km"]) for c in corridas]
+        horarios = [c.get("hora") or datetime.now().strftime("%H:%M") for c in corridas]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ErroHTTP(400, 'corpo esperado: {"corridas": [{"km": 7.5, "hora": "18:30"}, ...]}') from None
+    if len(corridas) > MAX_LOTE:
+        raise ErroHTTP(413, f"no máximo {MAX_LOTE} corridas por lote")
+    try:
+        valores = simulador_preco.cotar_lote(distancias, horarios)
+    except ValueError as e:
+        raise ErroHTTP(400, str(e)) from None
+    return {"valores": [float(v) for v in valores]}
+
+
+def _totais(totais):
+    return {**totais._asdict(), "lucro_liquido": totais.lucro_liquido}
+
+
+def _data(consulta, nome, formato):
+    valor = consulta.get(nome)
+    if valor is not None:
+        try:
+            normalizado = datetime.strptime(valor, formato).strftime(formato)
+        except ValueError:
+            normalizado = None
+        if normalizado != valor:  # AAAA-MM-DD com zeros: é a forma gravada nos consolidados
+            raise ErroHTTP(400, f"parâmetro '{nome}' inválido: {valor!r}")
+    return valor
+
+
+def _dre(consulta, corpo):
+    if "mes" in consulta:
+        mes = _data(consulta, "mes", "%Y-%m")
+        return {"mes": mes, **_totais(consolidado_dre.totais_mes(mes))}
+    inicio, fim = _data(consulta, "inicio", "%Y-%m-%d"), _data(consulta, "fim", "%Y-%m-%d")
+    return {"inicio": inicio, "fim": fim, **_totais(consolidado_dre.totais_periodo(inicio, fim))}
+
+
+def _turnos(consulta, corpo):
+    ordem = consulta.get("ordem", "comissao")
+    if ordem not in bi_operacional.ORDENS_RANKING:
+        raise ErroHTTP(400, f"ordem deve ser uma de {sorted(bi_operacional.ORDENS_RANKING)}")
+    limite = _numero(consulta, "limite", int, 10)
+    return [{"turno": turno.nome, "inicio": turno.hora_inicio, "fim": turno.hora_fim,
+             "ranking": [{"nome": nome, "corridas": corridas, "comissao": comissao} for nome, corridas, comissao in ranking]}
+            for turno, ranking in bi_operacional.ranking_turnos(limite, ordem)]
+
+
+def _precos(consulta, corpo):
+    metrica = consulta.get("metrica", "razao")
+    if metrica not in distribuicao_precos.METRICAS:
+        raise ErroHTTP(400, f"metrica deve ser uma de {list(distribuicao_precos.METRICAS)}")
+    turnos = None
+    if "turno" in consulta:
+        turno = distribuicao_precos.buscar_turno(consulta["turno"])
+        if turno is None:
+            raise ErroHTTP(404, f"turno {consulta['turno']!r} não configurado")
+        turnos = {turno.id}
+    faixa = _numero(consulta, "faixa", int) if "faixa" in consulta else None
+    if faixa is not None and not 0 <= faixa < len(distribuicao_precos.ROTULOS_FAIXAS):
+        raise ErroHTTP(400, f"faixa deve ir de 0 a {len(distribuicao_precos.ROTULOS_FAIXAS) - 1}")
+    inicio, fim = _data(consulta, "inicio", "%Y-%m"), _data(consulta, "fim", "%Y-%m")
+    esbocos = distribuicao_precos.contagens(inicio, fim)
+    esboco = distribuicao_precos.recorte(esbocos, metrica, turnos, None if faixa is None else {faixa})
+    if metrica == "razao":
+        # razão tarifa/concorrente em % de diferença, nos percentis e nos limites do histograma
+        converter = distribuicao_precos.diferenca_percentual
+        resumo = distribuicao_precos.resumo_diferenca(esboco)
+    else:
+        converter = float
+        resumo = distribuicao_precos.resumo(esboco, gama=distribuicao_precos.gama(metrica))
+    return {"metrica": metrica, "turno": consulta.get("turno"), "faixa": faixa, **resumo,
+            "histograma": [{"de": converter(de), "ate": converter(ate), "corridas": n}
+                           for de, ate, n in distribuicao_precos.histograma(esboco, gama=distribuicao_precos.gama(metrica))]}
+
+
+def _extrato(consulta, corpo, motorista_id):
+    motorista_id = int(motorista_id)
+    motorista = banco_tkx.buscar_motorista(motorista_id)
+    if motorista is None:
+        raise ErroHTTP(404, f"motorista {motorista_id} não encontrado")
+    # Totais do dre_motorista (um registro por mês); as corridas uma a uma só se pedidas
+    totais = consolidado_dre.totais_por_motorista().get(motorista_id) or consolidado_dre.TotaisDRE(0, 0, 0, 0, 0)
+    resposta = {
+        "motorista": motorista._asdict(),
+        "corridas": totais.corridas,
+        "total_pago": totais.bruto,
+        "comissao_tkx": totais.comissao,
+        "total_repasse": totais.bruto - totais.comissao,
+    }
+    if consulta.get("corridas") in ("1", "true"):
+        _, corridas, _ = relatorio_repasse.dados_extrato_motorista(motorista_id)
+        resposta["itens"] = [{"valor_pago": valor, "taxa_tkx": taxa, "data": data} for valor, taxa, data in corridas]
+    return resposta
+
+
+def _janelas(consulta, corpo, entidade, entidade_id):
+    janelas = janelas_metricas.metricas_de(entidade, int(entidade_id), consulta.get("hoje"))
+    if not any(janelas.values()):
+        raise ErroHTTP(404, f"{entidade} {entidade_id} sem corridas nos últimos {max(janelas)} dias")
+    return {entidade: int(entidade_id), "janelas": {str(j): m._asdict() if m else None for j, m in janelas.items()}}
+
+
+def _alertas(consulta, corpo):
+    janela = _numero(consulta, "janela", int, 7)
+    if janela not in janelas_metricas.JANELAS:
+        raise ErroHTTP(400, f"janela deve ser uma de {list(janelas_metricas.JANELAS)}")
+    limite = _numero(consulta, "limite", float, janelas_metricas.NOTA_ALERTA)
+    return [m._asdict() for m in janelas_metricas.alertas_nota(limite, janela, hoje=consulta.get("hoje"))]
+
+
+# (método, caminho, função, tabelas de que a resposta depende: None = sem ETag)
+ROTAS = [
+    ("GET", r"/saude", _saude, None),
+    ("GET", r"/cotacao", _cotacao, ("tarifas_dinamicas", "configuracoes_estrategicas")),
+    ("POST", r"/cotacoes", _cotacoes, None),
+    ("GET", r"/dre", _dre, ("historico_corridas",)),
+    ("GET", r"/turnos", _turnos, ("historico_corridas", "motoristas_cadastro", "turnos")),
+    ("GET", r"/precos", _precos, ("historico_corridas", "turnos")),
+    ("GET", r"/motoristas/(\d+)/extrato", _extrato, ("historico_corridas", "motoristas_cadastro")),
+    # As janelas andam com a data de hoje, sem escrita nenhuma: sem ETag
+    ("GET", r"/(motorista|cliente)s/(\d+)/janelas", _janelas, None),
+    ("GET", r"/alertas", _alertas, None),
+]
+_ROTAS = [(metodo, re.compile(padrao + "$"), funcao, tabelas) for metodo, padrao, funcao, tabelas in ROTAS]
+
+# Parâmetro que, omitido, vira a hora atual: a resposta muda sem escrita nenhuma, então sem ETag
+PARAMETRO_HORA_ATUAL = {_cotacao: "hora"}
+
+
+def _encontrar_rota(metodo, caminho):
+    permitidos = []
+    for metodo_rota, padrao, funcao, tabelas in _ROTAS:
+        achou = padrao.match(caminho)
+        if achou:
+            if metodo_rota == metodo:
+                return funcao, tabelas, achou.groups()
+            permitidos.append(metodo_rota)
+    raise ErroHTTP(405 if permitidos else 404, f"{metodo} {caminho}: " + ("método não permitido" if permitidos else "rota inexistente"))
+
+
+def atender(metodo, alvo, corpo=b"", if_none_match=None):
+    """(status, corpo JSON em bytes ou None, etag) de uma requisição. Roda numa thread do pool."""
+    partes = urlsplit(alvo)
+    consulta = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+    try:
+        funcao, tabelas, grupos = _encontrar_rota(metodo, partes.path.rstrip("/") or "/")
+        etag = None
+        with rastreamento_sql.origem(f"api {metodo} {partes.path}"):
+            hora_atual = PARAMETRO_HORA_ATUAL.get(funcao)
+            if tabelas and (hora_atual is None or hora_atual in consulta):
+                caminho, versoes = cache_consultas.versoes(tabelas)
+                etag = '"' + hashlib.sha1(repr((caminho, alvo, versoes)).encode()).hexdigest()[:20] + '"'
+                if if_none_match and etag in if_none_match:
+                    return 304, None, etag
+            resultado = funcao(consulta, corpo, *grupos)
+        return 200, json.dumps(resultado, ensure_ascii=False).encode(), etag
+    except ErroHTTP as e:
+        return e.status, json.dumps({"erro": str(e)}, ensure_ascii=False).encode(), None
+
+
+class ServidorAPI:
+    def __init__(self, host="127.0.0.1", porta=PORTA_PADRAO, threads=THREADS, max_pendentes=MAX_PENDENTES):
+        self.host, self.porta = host, porta
+        self.max_pendentes = max_pendentes
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="tkx-api")
+        self._pendentes = 0
+        self._servidor = None
+
+    async def iniciar(self):
+        banco_tkx.conectar()  # migrações antes da primeira requisição
+        self._servidor = await asyncio.start_server(self._conexao, self.host, self.porta)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        return self
+
+    async def servir(self):
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    def encerrar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _executar(self, metodo, alvo, corpo, if_none_match):
+        if self._pendentes >= self.max_pendentes:
+            return 503, json.dumps({"erro": "servidor ocupado, tente de novo"}).encode(), None
+        self._pendentes += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, atender, metodo, alvo, corpo, if_none_match)
+        except Exception as e:
+            return 500, json.dumps({"erro": f"{type(e).__name__}: {e}"}, ensure_ascii=False).encode(), None
+        finally:
+            self._pendentes -= 1
+
+    async def _conexao(self, leitor, escritor):
+        try:
+            while True:
+                try:
+                    linha = await asyncio.wait_for(leitor.readline(), TIMEOUT_OCIOSO)
+                except asyncio.TimeoutError:
+                    break
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode("latin-1").split()
+                except ValueError:
+                    await self._responder(escritor, 400, json.dumps({"erro": "linha de requisição inválida"}).encode(), None, False)
+                    break
+                cabecalhos = {}
+                while True:
+                    cabecalho = await leitor.readline()
+                    if cabecalho in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = cabecalho.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                conexao = cabecalhos.get("connection", "").lower()
+                manter = conexao != "close" if versao == "HTTP/1.1" else conexao == "keep-alive"
+
+                try:
+                    tamanho = int(cabecalhos.get("content-length") or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    await self._responder(escritor, 400, json.dumps({"erro": "content-length inválido"}).encode(), None, False)
+                    break
+                if tamanho > MAX_CORPO:
+                    await self._responder(escritor, 413, json.dumps({"erro": "corpo grande demais"}).encode(), None, False)
+                    break
+                corpo = await leitor.readexactly(tamanho) if tamanho else b""
+
+                if metodo == "OPTIONS":  # preflight do navegador (dashboard em outra origem)
+                    await self._responder(escritor, 204, None, None, manter)
+                else:
+                    status, resposta, etag = await self._executar(metodo, alvo, corpo, cabecalhos.get("if-none-match"))
+                    await self._responder(escritor, status, resposta, etag, manter)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _responder(self, escritor, status, corpo, etag, manter):
+        linhas = [
+            f"HTTP/1.1 {status} {MENSAGENS.get(status, '')}",
+            "Access-Control-Allow-Origin: *",
+            "Access-Control-Expose-Headers: ETag",
+            f"Connection: {'keep-alive' if manter else 'close'}",
+        ]
+        if status == 204:
+            linhas += ["Access-Control-Allow-Methods: GET, POST, OPTIONS", "Access-Control-Allow-Headers: Content-Type, If-None-Match"]
+        if status == 503:
+            linhas.append("Retry-After: 1")
+        if etag:
+            # no-cache: o cliente pode guardar, mas revalida sempre (resposta 304 se nada mudou)
+            linhas += [f"ETag: {etag}", "Cache-Control: no-cache"]
+        if corpo is not None:
+            linhas += ["Content-Type: application/json; charset=utf-8", f"Content-Length: {len(corpo)}"]
+        elif status not in (204, 304):
+            linhas.append("Content-Length: 0")
+        escritor.write(("\r\n".join(linhas) + "\r\n\r\n").encode("latin-1") + (corpo or b""))
+        await escritor.drain()
+
+
+async def _principal(host, porta, threads, max_pendentes):
+    servidor = await ServidorAPI(host, porta, threads, max_pendentes).iniciar()
+    print(f"🌐 API TKX em http://{servidor.host}:{servidor.porta} ({banco_tkx.caminho_banco()}, {threads} threads)", flush=True)
+    try:
+        await servidor.servir()
+    finally:
+        servidor.encerrar()
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="API HTTP de cotação, DRE e BI da TKX.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--threads", type=int, default=THREADS, help="threads (conexões) do SQLite")
+    parser.add_argument("--max-pendentes", type=int, default=MAX_PENDENTES)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_principal(args.host, args.porta, args.threads, args.max_pendentes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
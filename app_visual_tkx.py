@@ -1,5 +1,12 @@
+from functools import partial
+
 import customtkinter as ctk
-import sqlite3
+
+import busca_cadastros
+import consultas_gui
+from executor_gui import ExecutorConsultas, MonitorAlteracoes
+
+INTERVALO_ATUALIZACAO_MS = 5000 # Checa se o banco mudou e recarrega a aba visível
 
 class AppTKX(ctk.CTk):
     def __init__(self):
@@ -16,10 +23,25 @@ class AppTKX(ctk.CTk):
         self.tabview.add("📊 Dashboard")
         self.tabview.add("🚕 BI Operacional")
         self.tabview.add("📈 BI Estratégico")
+        self.tabview.add("👥 Cadastros")
 
         self.setup_dashboard()
         self.setup_bi_operacional()
         self.setup_bi_estrategico()
+        self.setup_cadastros()
+
+        # Consultas rodam em threads; a janela não congela enquanto o SQL executa
+        self.executor = ExecutorConsultas(self)
+        self.monitor = MonitorAlteracoes()
+        self.monitor.mudou()
+        self.atualizacao_por_aba = {
+            "📊 Dashboard": self.atualizar_financeiro,
+            "🚕 BI Operacional": self.atualizar_operacional,
+            "📈 BI Estratégico": self.atualizar_estrategico,
+            "👥 Cadastros": self.atualizar_cadastros,
+        }
+        self.after(INTERVALO_ATUALIZACAO_MS, self.atualizacao_automatica)
+        self.protocol("WM_DELETE_WINDOW", self.fechar)
 
     def setup_dashboard(self):
         tab = self.tabview.tab("📊 Dashboard")
@@ -30,7 +52,7 @@ class AppTKX(ctk.CTk):
 
     def setup_bi_operacional(self):
         tab = self.tabview.tab("🚕 BI Operacional")
-        ctk.CTkLabel(tab, text="PERFORMANCE POR TURNO (12h)", font=("Arial", 20, "bold")).pack(pady=10)
+        ctk.CTkLabel(tab, text="PERFORMANCE POR TURNO", font=("Arial", 20, "bold")).pack(pady=10)
         
         # Container para os dois turnos lado a lado
         self.frame_oper = ctk.CTkFrame(tab)
@@ -51,56 +73,143 @@ class AppTKX(ctk.CTk):
         self.txt_estrat.pack(pady=10)
         ctk.CTkButton(tab, text="GERAR RX COMPLETO", command=self.atualizar_estrategico).pack(pady=10)
 
+    def setup_cadastros(self):
+        tab = self.tabview.tab("👥 Cadastros")
+        ctk.CTkLabel(tab, text="MOTORISTAS E CLIENTES", font=("Arial", 20, "bold")).pack(pady=10)
+
+        filtros = ctk.CTkFrame(tab)
+        filtros.pack(fill="x", padx=10)
+        self.busca_cadastros = ctk.CTkEntry(filtros, width=420, placeholder_text="Nome, placa, CPF ou telefone")
+        self.busca_cadastros.pack(side="left", padx=10, pady=10)
+        self.busca_cadastros.bind("<Return>", lambda _: self.nova_busca_cadastros())
+        self.tipo_cadastros = ctk.CTkOptionMenu(filtros, values=["Todos", "Motoristas", "Clientes"],
+                                                command=lambda _: self.nova_busca_cadastros())
+        self.tipo_cadastros.pack(side="left", padx=10)
+        self.status_cadastros = ctk.CTkOptionMenu(filtros, values=["Qualquer status", "ativo", "pendente", "bloqueado"],
+                                                  command=lambda _: self.nova_busca_cadastros())
+        self.status_cadastros.pack(side="left", padx=10)
+        ctk.CTkButton(filtros, text="BUSCAR", width=100, command=self.nova_busca_cadastros).pack(side="left", padx=10)
+
+        self.txt_cadastros = ctk.CTkTextbox(tab, width=900, height=430, font=("Courier New", 13))
+        self.txt_cadastros.pack(pady=10)
+
+        # Paginação por cursor: a pilha guarda o início de cada página já vista (Anterior)
+        navegacao = ctk.CTkFrame(tab, fg_color="transparent")
+        navegacao.pack()
+        ctk.CTkButton(navegacao, text="◀ ANTERIOR", width=120, command=self.pagina_anterior_cadastros).pack(side="left", padx=10)
+        self.lbl_pagina_cadastros = ctk.CTkLabel(navegacao, text="Página 1")
+        self.lbl_pagina_cadastros.pack(side="left", padx=10)
+        ctk.CTkButton(navegacao, text="PRÓXIMA ▶", width=120, command=self.proxima_pagina_cadastros).pack(side="left", padx=10)
+        self.inicios_cadastros = [None]
+        self.proximo_cadastros = None
+
+    # --- Atualização em segundo plano ---
+
+    def atualizacao_automatica(self):
+        # Só recarrega quando outra conexão gravou algo (PRAGMA data_version)
+        try:
+            if self.monitor.mudou():
+                self.atualizacao_por_aba[self.tabview.get()](automatico=True)
+        finally:
+            self.after(INTERVALO_ATUALIZACAO_MS, self.atualizacao_automatica)
+
+    def mostrar_carregando(self, *caixas):
+        for caixa in caixas:
+            caixa.delete("1.0", "end")
+            caixa.insert("end", "⏳ Carregando...")
+
+    def mostrar_erro(self, *caixas):
+        def exibir(erro):
+            for caixa in caixas:
+                caixa.delete("1.0", "end")
+                caixa.insert("end", f"❌ Erro ao consultar o banco: {erro}")
+        return exibir
+
+    def fechar(self):
+        self.executor.encerrar()
+        self.destroy()
+
     # --- Lógica de Banco de Dados para as Abas ---
 
-    def atualizar_financeiro(self):
-        conn = sqlite3.connect('tkx_franca.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT SUM(valor_total_pago), SUM(taxa_app_valor) FROM historico_corridas")
-        res = cursor.fetchone()
-        bruto = res[0] or 0
-        lucro = res[1] or 0
+    def atualizar_financeiro(self, automatico=False):
+        if not automatico: self.mostrar_carregando(self.txt_dash)
+        self.executor.submeter("financeiro", consultas_gui.consultar_financeiro, self.exibir_financeiro, self.mostrar_erro(self.txt_dash))
+
+    def exibir_financeiro(self, dados):
+        bruto, lucro = dados
         
         self.txt_dash.delete("1.0", "end")
         self.txt_dash.insert("end", f"FATURAMENTO BRUTO: R$ {bruto:.2f}\nLUCRO TKX (15%): R$ {lucro:.2f}\nSTATUS: OPERACIONAL")
-        conn.close()
 
-    def atualizar_operacional(self):
-        conn = sqlite3.connect('tkx_franca.db')
-        cursor = conn.cursor()
-        
-        # Diurno 06h-18h
-        cursor.execute("SELECT m.nome, COUNT(h.id) FROM motoristas_cadastro m JOIN historico_corridas h ON m.id = h.motorista_id WHERE h.hora_partida BETWEEN '06:00' AND '18:00' GROUP BY m.nome ORDER BY COUNT(h.id) DESC LIMIT 10")
-        diurno = cursor.fetchall()
-        self.txt_diurno.delete("1.0", "end")
-        self.txt_diurno.insert("end", "☀️ TURNO DIURNO (06h - 18h)\n" + "="*30 + "\n")
-        for nome, qtd in diurno: self.txt_diurno.insert("end", f"{nome[:15]:<15} | Corridas: {qtd}\n")
-
-        # Noturno 18h-06h
-        cursor.execute("SELECT m.nome, COUNT(h.id) FROM motoristas_cadastro m JOIN historico_corridas h ON m.id = h.motorista_id WHERE h.hora_partida > '18:00' OR h.hora_partida < '06:00' GROUP BY m.nome ORDER BY COUNT(h.id) DESC LIMIT 10")
-        noturno = cursor.fetchall()
-        self.txt_noturno.delete("1.0", "end")
-        self.txt_noturno.insert("end", "🌙 TURNO NOTURNO (18h - 06h)\n" + "="*30 + "\n")
-        for nome, qtd in noturno: self.txt_noturno.insert("end", f"{nome[:15]:<15} | Corridas: {qtd}\n")
-        conn.close()
-
-    def atualizar_estrategico(self):
-        conn = sqlite3.connect('tkx_franca.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT AVG(valor_total_pago), AVG(preco_concorrente) FROM historico_corridas WHERE preco_concorrente IS NOT NULL")
-        precos = cursor.fetchone()
+    def atualizar_operacional(self, automatico=False):
+        if not automatico: self.mostrar_carregando(self.txt_diurno, self.txt_noturno)
+        self.executor.submeter("operacional", consultas_gui.consultar_operacional, self.exibir_operacional, self.mostrar_erro(self.txt_diurno, self.txt_noturno))
+
+    def exibir_operacional(self, dados):
+        caixas = (self.txt_diurno, self.txt_noturno)
+        for caixa in caixas: caixa.delete("1.0", "end")
+
+        # Turnos configurados (tabela turnos) distribuídos entre as duas colunas
+        for i, (turno, ranking) in enumerate(dados):
+            caixa = caixas[i % 2]
+            caixa.insert("end", f"🕒 TURNO {turno.nome} ({turno.hora_inicio} - {turno.hora_fim})\n" + "="*30 + "\n")
+            for nome, qtd in ranking: caixa.insert("end", f"{nome[:15]:<15} | Corridas: {qtd}\n")
+            caixa.insert("end", "\n")
+
+    def atualizar_estrategico(self, automatico=False):
+        if not automatico: self.mostrar_carregando(self.txt_estrat)
+        self.executor.submeter("estrategico", consultas_gui.consultar_estrategico, self.exibir_estrategico, self.mostrar_erro(self.txt_estrat))
+
+    def exibir_estrategico(self, dados):
+        precos, top_lucro, distribuicao = dados
         
         self.txt_estrat.delete("1.0", "end")
         if precos[0]:
             diff = ((precos[0] / precos[1]) - 1) * 100
             status = "MAIS CARO" if diff > 0 else "MAIS BARATO"
             self.txt_estrat.insert("end", f"📊 MERCADO: {abs(diff):.1f}% {status} que a concorrência\n\n")
+        if distribuicao["diferenca"]["n"]:
+            self.txt_estrat.insert("end", "📐 DIFERENÇA POR CORRIDA (P10 | MEDIANA | P90):\n")
+            linhas = [("GERAL", distribuicao["diferenca"])] + [(t.nome, d) for t, d in distribuicao["turnos"]]
+            linhas += distribuicao["faixas"]
+            for rotulo, d in linhas:
+                if d["n"]:
+                    self.txt_estrat.insert("end", f"{rotulo[:12]:<12} {d['p10']:+6.1f}% | {d['p50']:+6.1f}% | {d['p90']:+6.1f}%\n")
+            self.txt_estrat.insert("end", "\n")
         
         self.txt_estrat.insert("end", "💎 CORRIDAS COM MAIOR LUCRATIVIDADE:\n")
-        cursor.execute("SELECT id, (taxa_app_valor - custo_gateway - custos_fixos_totais) as lucro FROM historico_corridas ORDER BY lucro DESC LIMIT 5")
-        for id_c, lucro in cursor.fetchall():
+        for id_c, lucro in top_lucro:
             self.txt_estrat.insert("end", f"Corrida #{id_c} | Lucro TKX: R$ {lucro:.2f}\n")
-        conn.close()
+
+    def nova_busca_cadastros(self):
+        self.inicios_cadastros = [None]
+        self.atualizar_cadastros()
+
+    def proxima_pagina_cadastros(self):
+        if self.proximo_cadastros is not None:
+            self.inicios_cadastros.append(self.proximo_cadastros)
+            self.atualizar_cadastros()
+
+    def pagina_anterior_cadastros(self):
+        if len(self.inicios_cadastros) > 1:
+            self.inicios_cadastros.pop()
+            self.atualizar_cadastros()
+
+    def atualizar_cadastros(self, automatico=False):
+        if not automatico: self.mostrar_carregando(self.txt_cadastros)
+        tipo = {"Motoristas": "motorista", "Clientes": "cliente"}.get(self.tipo_cadastros.get())
+        status = self.status_cadastros.get() if self.status_cadastros.get() in busca_cadastros.STATUS else None
+        consulta = partial(consultas_gui.consultar_cadastros, self.busca_cadastros.get(), tipo, status, self.inicios_cadastros[-1])
+        self.executor.submeter("cadastros", consulta, self.exibir_cadastros, self.mostrar_erro(self.txt_cadastros))
+
+    def exibir_cadastros(self, pagina):
+        self.proximo_cadastros = pagina.proximo
+        self.lbl_pagina_cadastros.configure(text=f"Página {len(self.inicios_cadastros)}")
+        self.txt_cadastros.delete("1.0", "end")
+        if not pagina.cadastros:
+            self.txt_cadastros.insert("end", "Nenhum cadastro encontrado.")
+        for cadastro in pagina.cadastros:
+            self.txt_cadastros.insert("end", busca_cadastros.formatar_cadastro(cadastro) + "\n")
 
 if __name__ == "__main__":
     app = AppTKX()
@@ -0,0 +1,429 @@
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import migracoes
+import rastreamento_sql
+
+# Camada única de acesso aos bancos da TKX (um por município) usada por todos os scripts.
+# - Uma conexão por thread e por arquivo, reaproveitada entre chamadas
+# - WAL: leitores (GUI, relatórios) não bloqueiam quem grava corridas
+# - Caminho configurável por argumento ou pela variável TKX_DB_PATH; sem eles, o banco do
+#   município TKX_MUNICIPIO (padrão: Franca) no registro municipios.json (ver municipios_tkx)
+# - TKX_SQL_TRACE liga o rastreamento de instruções (ver rastreamento_sql)
+# - Meses fechados saem do historico_corridas para partições (ver particionar_corridas);
+#   fonte_corridas() diz de onde ler cada período
+
+CAMINHO_PADRAO = 'tkx_franca.db'
+VARIAVEL_CAMINHO = 'TKX_DB_PATH'
+MUNICIPIO_PADRAO = 'Franca'
+VARIAVEL_MUNICIPIO = 'TKX_MUNICIPIO'
+CAMINHO_REGISTRO = 'municipios.json'
+VARIAVEL_REGISTRO = 'TKX_MUNICIPIOS'
+
+PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),      # seguro em WAL; só o último commit pode se perder numa queda de energia
+    ("cache_size", "-32768"),       # 32 MB de cache de páginas por conexão
+    ("mmap_size", "268435456"),     # 256 MB mapeados em memória para leitura
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", "30000"),
+]
+STATEMENTS_EM_CACHE = 256
+ESQUEMA_ARQUIVO = 'arquivo'
+
+_local = threading.local()
+_trava_migracao = threading.Lock()
+_bancos_migrados = set()
+_registro = {}  # arquivo do registro lido por último e {município: banco}
+
+
+def municipio_atual():
+    """Município deste processo: TKX_MUNICIPIO ou Franca."""
+    return os.environ.get(VARIAVEL_MUNICIPIO) or MUNICIPIO_PADRAO
+
+
+def caminho_registro():
+    return os.path.abspath(os.environ.get(VARIAVEL_REGISTRO) or CAMINHO_REGISTRO)
+
+
+def _ler_registro(arquivo):
+    """{município: caminho como está no arquivo}; sem registro, só Franca em tkx_franca.db."""
+    try:
+        with open(arquivo, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {MUNICIPIO_PADRAO: CAMINHO_PADRAO}
+
+
+def _bancos_municipios():
+    arquivo = caminho_registro()
+    if _registro.get("arquivo") != arquivo:
+        # Caminhos relativos valem a partir da pasta do registro
+        pasta = os.path.dirname(arquivo)
+        _registro.update(arquivo=arquivo, bancos={m: os.path.join(pasta, c) for m, c in _ler_registro(arquivo).items()})
+    return _registro["bancos"]
+
+
+def listar_municipios():
+    """{município: caminho absoluto do banco}, na ordem do registro."""
+    return dict(_bancos_municipios())
+
+
+def caminho_municipio(municipio=None):
+    """Banco do município (padrão: o atual). LookupError se ele não estiver no registro."""
+    municipio = municipio or municipio_atual()
+    bancos = _bancos_municipios()
+    if municipio not in bancos:
+        raise LookupError(f"Município {municipio} não está no registro {caminho_registro()}.")
+    return bancos[municipio]
+
+
+def registrar_municipio(municipio, caminho):
+    """Inclui (ou muda) o banco de um município no registro."""
+    arquivo = caminho_registro()
+    bancos = _ler_registro(arquivo)
+    bancos[municipio] = caminho
+    temporario = arquivo + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(bancos, f, indent=2, ensure_ascii=False)
+    os.replace(temporario, arquivo)
+    _registro.clear()
+
+
+def caminho_banco(caminho=None):
+    """Resolve o arquivo do banco: argumento > TKX_DB_PATH > banco do município atual no registro."""
+    return os.path.abspath(caminho or os.environ.get(VARIAVEL_CAMINHO) or caminho_municipio())
+
+
+def _abrir(caminho):
+    # uri=True permite anexar o banco de arquivo como somente leitura (file:...?mode=ro)
+    conn = sqlite3.connect(caminho, timeout=30, cached_statements=STATEMENTS_EM_CACHE, uri=True,
+                           factory=rastreamento_sql.fabrica_conexao())
+    for nome, valor in PRAGMAS:
+        conn.execute(f"PRAGMA {nome} = {valor}")
+    # Migrações rodam uma vez por processo e por arquivo
+    with _trava_migracao:
+        if caminho not in _bancos_migrados:
+            migracoes.aplicar_migracoes(conn)
+            _bancos_migrados.add(caminho)
+    return conn
+
+
+def conectar(caminho=None):
+    """Devolve a conexão desta thread para o banco (abre e configura na primeira vez)."""
+    caminho = caminho_banco(caminho)
+    conexoes = getattr(_local, "conexoes", None)
+    if conexoes is None:
+        conexoes = _local.conexoes = {}
+    conn = conexoes.get(caminho)
+    if conn is None:
+        conn = conexoes[caminho] = _abrir(caminho)
+    return conn
+
+
+def conectar_municipio(municipio=None):
+    """Conexão com o banco do município; o atual respeita TKX_DB_PATH, como conectar()."""
+    if not municipio or municipio == municipio_atual():
+        return conectar()
+    return conectar(caminho_municipio(municipio))
+
+
+def fechar_conexoes():
+    """Fecha as conexões abertas pela thread atual."""
+    for conn in getattr(_local, "conexoes", {}).values():
+        conn.close()
+    _local.conexoes = {}
+    _local.particoes = {}
+
+
+@contextmanager
+def transacao(conn=None):
+    """Transação de escrita: BEGIN IMMEDIATE, COMMIT no sucesso e ROLLBACK em erro."""
+    conn = conn or conectar()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+# --- Linhas tipadas ---
+
+Motorista = namedtuple("Motorista", "id nome cpf telefone veiculo_modelo placa status")
+Cliente = namedtuple("Cliente", "id nome telefone email")
+Tarifa = namedtuple("Tarifa", "periodo hora_inicio hora_fim multiplicador")
+Turno = namedtuple("Turno", "id nome hora_inicio hora_fim")
+ConfigMunicipio = namedtuple("ConfigMunicipio", "municipio tarifa_base_fixa valor_por_km custo_gateway_percentual seguro_app_fixo manutencao_app_fixo")
+Corrida = namedtuple("Corrida", "id motorista_id cliente_id valor_total_pago km_distancia taxa_app_valor custo_gateway custos_fixos_totais data_cadastro hora_partida preco_concorrente avaliacao_motorista")
+
+
+def _tipado(tipo, linha):
+    return tipo._make(linha) if linha else None
+
+
+def buscar_motorista(motorista_id, conn=None):
+    conn = conn or conectar()
+    linha = conn.execute(
+        "SELECT id, nome, cpf, telefone, veiculo_modelo, placa, status FROM motoristas_cadastro WHERE id = ?",
+        (motorista_id,),
+    ).fetchone()
+    return _tipado(Motorista, linha)
+
+
+def listar_motoristas(conn=None):
+    conn = conn or conectar()
+    cursor = conn.execute("SELECT id, nome, cpf, telefone, veiculo_modelo, placa, status FROM motoristas_cadastro")
+    return [Motorista._make(l) for l in cursor]
+
+
+def listar_clientes(conn=None):
+    conn = conn or conectar()
+    cursor = conn.execute("SELECT id, nome, telefone, email FROM clientes")
+    return [Cliente._make(l) for l in cursor]
+
+
+def inserir_motorista(nome, cpf, telefone, placa, veiculo_modelo, status='ativo', conn=None):
+    conn = conn or conectar()
+    with transacao(conn):
+        cursor = conn.execute("""
+            INSERT INTO motoristas_cadastro (nome, cpf, telefone, placa, veiculo_modelo, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (nome, cpf, telefone, placa, veiculo_modelo, status))
+    return cursor.lastrowid
+
+
+def inserir_cliente(nome, telefone, email, conn=None):
+    conn = conn or conectar()
+    with transacao(conn):
+        cursor = conn.execute("""
+            INSERT INTO clientes (nome, telefone, email)
+            VALUES (?, ?, ?)
+        """, (nome, telefone, email))
+    return cursor.lastrowid
+
+
+def buscar_configuracao(municipio=None, conn=None):
+    """Configuração do município (padrão: o atual), lida do banco dele."""
+    municipio = municipio or municipio_atual()
+    conn = conn or conectar_municipio(municipio)
+    linha = conn.execute("""
+        SELECT municipio, tarifa_base_fixa, valor_por_km, custo_gateway_percentual, seguro_app_fixo, manutencao_app_fixo
+        FROM configuracoes_estrategicas WHERE municipio = ?
+    """, (municipio,)).fetchone()
+    return _tipado(ConfigMunicipio, linha)
+
+
+def listar_tarifas(tabela='tarifas_dinamicas', conn=None):
+    conn = conn or conectar()
+    cursor = conn.execute(f"SELECT periodo, hora_inicio, hora_fim, multiplicador FROM {tabela} ORDER BY id")
+    return [Tarifa._make(l) for l in cursor]
+
+
+def listar_turnos(conn=None):
+    conn = conn or conectar()
+    cursor = conn.execute("SELECT id, nome, hora_inicio, hora_fim FROM turnos ORDER BY id")
+    return [Turno._make(l) for l in cursor]
+
+
+def turnos_por_minuto(conn=None):
+    """Lista de 1440 posições: turno_id de cada minuto do dia (None se nenhum turno cobre)."""
+    conn = conn or conectar()
+    mapa = [None] * 1440
+    for minuto, turno_id in conn.execute("SELECT minuto, turno_id FROM turnos_minutos"):
+        mapa[minuto] = turno_id
+    return mapa
+
+
+# Colunas lidas para refazer o que é contado por turno (dre_turno e esboços de preços)
+COLUNAS_POR_TURNO = ("data_cadastro", "turno_id", "km_distancia", "valor_total_pago", "preco_concorrente",
+                     "taxa_app_valor", "custo_gateway", "custos_fixos_totais")
+
+
+def configurar_turnos(turnos, conn=None):
+    """Troca os turnos por [(nome, 'HH:MM' início, 'HH:MM' fim), ...] e reclassifica o histórico.
+
+    Reescreve turno_id de todas as corridas e refaz o dre_turno e os esboços de preços,
+    que são contados por turno: é operação de manutenção, não de rotina.
+    """
+    conn = conn or conectar()
+    particoes_do_periodo(conn)  # anexa o arquivo, se houver, antes da transação
+    with transacao(conn):
+        conn.execute("DELETE FROM turnos")
+        conn.executemany("INSERT INTO turnos (nome, hora_inicio, hora_fim) VALUES (?, ?, ?)", turnos)
+        conn.execute("DELETE FROM turnos_minutos")
+        conn.execute(migracoes.SQL_COMPILAR_TURNOS)
+        conn.execute(migracoes.sql_preencher_turnos())
+        # Os gatilhos já moveram as corridas do histórico vivo, mas as partições guardam o
+        # turno antigo: a fonte_corridas o tira da configuração nova pelo minuto do dia
+        fonte = fonte_corridas(conn, colunas=COLUNAS_POR_TURNO)
+        tabela, chaves, expressoes = next(c for c in migracoes.CONSOLIDADOS_DRE if c[0] == "dre_turno")
+        conn.execute(f"DELETE FROM {tabela}")
+        conn.execute(migracoes.sql_recalculo_consolidado(tabela, chaves, expressoes, fonte=fonte))
+        conn.execute("DELETE FROM esboco_precos")
+        for sql in migracoes.sql_recalculo_esbocos(fonte=fonte):
+            conn.execute(sql)
+    return listar_turnos(conn)
+
+
+# --- Partições mensais do histórico ---
+#
+# Cada mês fechado vira uma tabela corridas_AAAA_MM, no próprio banco ou no banco de
+# arquivo (<banco>_arquivo.db, anexado como `arquivo`, somente leitura). O historico_corridas
+# fica só com os meses abertos. Consultas que precisam de meses fechados leem pelo que
+# fonte_corridas() devolve: a visão temporária corridas_todas (tudo) ou só as partições
+# do período pedido.
+
+Particao = namedtuple("Particao", "mes esquema tabela status corridas primeiro_id ultimo_id versao_turnos")
+
+
+def caminho_arquivo(conn=None):
+    """Arquivo do banco de arquivo ao lado do principal: tkx_franca.db -> tkx_franca_arquivo.db."""
+    conn = conn or conectar()
+    principal = next(l[2] for l in conn.execute("PRAGMA database_list") if l[1] == "main")
+    base, extensao = os.path.splitext(principal)
+    return f"{base}_arquivo{extensao or '.db'}"
+
+
+def _estado_particoes(conn):
+    estados = getattr(_local, "particoes", None)
+    if estados is None:
+        estados = _local.particoes = {}
+    estado = estados.get(id(conn))
+    if estado is None or estado["conn"] is not conn:
+        estado = estados[id(conn)] = {"conn": conn, "versao": None, "arquivo": None, "particoes": [], "fontes": {}}
+    return estado
+
+
+def anexar_arquivo(conn=None, gravavel=False):
+    """Anexa o banco de arquivo como `arquivo`: somente leitura, a não ser com gravavel=True.
+
+    Não pode ser chamado dentro de uma transação (restrição do ATTACH/DETACH).
+    """
+    conn = conn or conectar()
+    estado = _estado_particoes(conn)
+    modo = "rw" if gravavel else "ro"
+    if estado["arquivo"] in (modo, "rw"):
+        return
+    if estado["arquivo"]:
+        conn.execute(f"DETACH DATABASE {ESQUEMA_ARQUIVO}")
+        estado["versao"] = None  # a visão apontava para o anexo antigo
+    caminho = caminho_arquivo(conn)
+    alvo = caminho if gravavel else pathlib.Path(caminho).as_uri() + "?mode=ro"
+    conn.execute(f"ATTACH DATABASE ? AS {ESQUEMA_ARQUIVO}", (alvo,))
+    if gravavel:
+        conn.execute(f"PRAGMA {ESQUEMA_ARQUIVO}.journal_mode = WAL")
+    estado["arquivo"] = modo
+
+
+def listar_particoes(conn=None):
+    conn = conn or conectar()
+    cursor = conn.execute("""
+        SELECT mes, esquema, tabela, status, corridas, primeiro_id, ultimo_id, versao_turnos
+        FROM particoes_corridas ORDER BY mes
+    """)
+    return [Particao._make(l) for l in cursor]
+
+
+def colunas_corridas(conn, esquema="main", tabela="historico_corridas", gravaveis=False):
+    """Colunas da tabela de corridas (gravaveis=True deixa de fora as geradas)."""
+    # table_xinfo: hidden 0 = comum, 2/3 = gerada (virtual/armazenada)
+    return [l[1] for l in conn.execute(f"PRAGMA {esquema}.table_xinfo({tabela})")
+            if l[6] == 0 or (not gravaveis and l[6] in (2, 3))]
+
+
+def _atualizar_particoes(conn):
+    """Recria a visão corridas_todas (e anexa o arquivo) quando o registro de partições ou os turnos mudam."""
+    estado = _estado_particoes(conn)
+    versoes = dict(conn.execute("SELECT tabela, versao FROM versoes_tabelas WHERE tabela IN ('particoes_corridas', 'turnos')"))
+    versao = (versoes.get("particoes_corridas", 0), versoes.get("turnos", 0))
+    if estado["versao"] == versao:
+        return estado
+
+    particoes = listar_particoes(conn)
+    if any(p.esquema == ESQUEMA_ARQUIVO for p in particoes):
+        anexar_arquivo(conn)
+    colunas = colunas_corridas(conn)
+    fontes = {None: "main.historico_corridas"}
+    for p in particoes:
+        tabela = f"{p.esquema}.{p.tabela}"
+        existentes = set(colunas_corridas(conn, p.esquema, p.tabela))
+        # Partições não são reescritas: se os turnos mudaram depois do fechamento, o turno
+        # sai da configuração atual pelo minuto do dia, como no histórico vivo
+        turnos_mudaram = p.versao_turnos != versao[1]
+        if existentes.issuperset(colunas) and not turnos_mudaram:
+            fontes[p.mes] = tabela
+            continue
+        expressoes = []
+        for coluna in colunas:
+            if coluna == "turno_id" and turnos_mudaram:
+                expressoes.append(f"(SELECT turno_id FROM main.turnos_minutos WHERE minuto = {p.tabela}.minuto_dia) AS turno_id")
+            elif coluna in existentes:
+                expressoes.append(coluna)
+            elif coluna in migracoes.COLUNAS_GERADAS:  # coluna gerada criada depois do fechamento
+                expressoes.append(f"({migracoes.COLUNAS_GERADAS[coluna]}) AS {coluna}")
+            else:
+                expressoes.append(f"NULL AS {coluna}")
+        fontes[p.mes] = f"(SELECT {', '.join(expressoes)} FROM {tabela})"
+
+    conn.execute("DROP VIEW IF EXISTS temp.corridas_todas")
+    if particoes:
+        lista = ", ".join(colunas)
+        conn.execute("CREATE TEMP VIEW corridas_todas AS " + " UNION ALL ".join(f"SELECT {lista} FROM {f}" for f in fontes.values()))
+    estado.update(versao=versao, particoes=particoes, fontes=fontes)
+    return estado
+
+
+def particoes_do_periodo(conn=None, inicio=None, fim=None):
+    """Tabelas (ou subconsultas) com as corridas entre inicio e fim (AAAA-MM ou AAAA-MM-DD, inclusivos).
+
+    A primeira é sempre o historico_corridas; depois vêm só as partições dos meses do
+    intervalo (sem datas, todas). Chame fora de transação na primeira vez depois de um arquivamento (pode anexar o arquivo).
+    """
+    conn = conn or conectar()
+    estado = _atualizar_particoes(conn)
+    meses = [p.mes for p in estado["particoes"]
+             if (inicio is None or p.mes >= inicio[:7]) and (fim is None or p.mes <= fim[:7])]
+    return [estado["fontes"][mes] for mes in [None] + meses]
+
+
+def sql_por_particao(sql, conn=None, inicio=None, fim=None):
+    """`sql` (com {corridas} no lugar da tabela) repetido para cada partição do período, em UNION ALL.
+
+    Para agregações que rodam em cada partição pelos índices dela e somam os parciais fora.
+    """
+    return " UNION ALL ".join(sql.format(corridas=c) for c in particoes_do_periodo(conn, inicio, fim))
+
+
+def fonte_corridas(conn=None, inicio=None, fim=None, colunas=None):
+    """O que pôr no FROM para ler as corridas entre inicio e fim (ver particoes_do_periodo).
+
+    Sem partições no período é o próprio historico_corridas. Com elas, a visão corridas_todas
+    ou, com `colunas`, um UNION ALL só com essas colunas (o SQLite não poda as colunas de
+    uma visão composta: ler 3 colunas pela visão materializa todas).
+    """
+    fontes = particoes_do_periodo(conn, inicio, fim)
+    if len(fontes) == 1:
+        return "historico_corridas"
+    if colunas is None:
+        if len(fontes) == len(_estado_particoes(conn or conectar())["fontes"]):
+            return "corridas_todas"
+        colunas = colunas_corridas(conn or conectar())
+    lista = ", ".join(colunas)
+    return "(" + " UNION ALL ".join(f"SELECT {lista} FROM {f}" for f in fontes) + ")"
+
+
+def ultimo_id_corridas(conn=None):
+    """Maior id de corrida no histórico vivo ou nas partições (sem varrer a visão)."""
+    conn = conn or conectar()
+    return conn.execute("""
+        SELECT MAX(COALESCE((SELECT MAX(id) FROM historico_corridas), 0),
+                   COALESCE((SELECT MAX(ultimo_id) FROM particoes_corridas), 0))
+    """).fetchone()[0]
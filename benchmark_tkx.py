@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import banco_tkx
+import bi_estrategico
+import bi_operacional
+import cache_consultas
+import calculadora_tkx
+import consolidado_dre
+import consultas_gui
+import popular_bi
+import relatorio_repasse
+import simulador_preco
+
+# Benchmarks dos relatórios, do simulador e das consultas da GUI.
+#   python benchmark_tkx.py --tamanhos 10000 1000000 --saida bench.json
+#   python benchmark_tkx.py --baseline bench_base.json   (sai com código 1 se houver regressão)
+# Os bancos de teste são gerados de forma determinística (semente e datas fixas) em bench_dbs/.
+
+PASTA_BANCOS = "bench_dbs"
+SEMENTE = 42
+FIM_PERIODO = datetime(2026, 1, 31)
+INTERVALO_PROGRESSO = 100  # instruções da VM do SQLite entre chamadas do contador
+LOTE_KM = [2.0 + (i % 40) * 0.5 for i in range(10_000)]
+LOTE_HORARIOS = [f"{(i * 7) % 24:02d}:{(i * 13) % 60:02d}" for i in range(10_000)]
+# Vai no "meta" do JSON: os dois últimos campos de cada caso são aproximações, não medidas diretas
+CAMPOS = {
+    "p50_ms": "mediana do tempo de uma execução (ms)",
+    "p95_ms": "percentil 95 do tempo (ms)",
+    "media_ms": "média do tempo (ms)",
+    "min_ms": "menor tempo (ms)",
+    "instrucoes_vm": "proxy de linhas varridas: instruções da VM do SQLite por execução, "
+                     f"contadas de {INTERVALO_PROGRESSO} em {INTERVALO_PROGRESSO}; não é o nº de linhas",
+    "pico_python_kb": "proxy de memória: pico do tracemalloc numa execução (só o que o Python aloca; "
+                      "não é RSS e não inclui o cache de páginas do SQLite)",
+}
+
+# nome -> função(conn, caminho). Todas usam as versões "dados_*" dos relatórios, que não imprimem.
+CASOS = {
+    "bi_operacional": lambda conn, caminho: bi_operacional.dados_bi_operacional(conn),
+    "bi_estrategico": lambda conn, caminho: bi_estrategico.dados_bi_estrategico(conn),
+    "dashboard_financeiro.historico": lambda conn, caminho: consolidado_dre.totais_periodo(conn=conn),
+    "dashboard_financeiro.mes": lambda conn, caminho: consolidado_dre.totais_mes("2026-01", conn=conn),
+    "relatorio_repasse": lambda conn, caminho: relatorio_repasse.dados_extrato_motorista(1, conn),
+    "simulador_preco.cotar_corrida": lambda conn, caminho: simulador_preco.cotar_corrida(7.5, "18:30", caminho),
+    "simulador_preco.cotar_lote": lambda conn, caminho: simulador_preco.cotar_lote(LOTE_KM, LOTE_HORARIOS, caminho),
+    "calculadora_tkx.reprecificar_periodo": lambda conn, caminho: calculadora_tkx.reprecificar_periodo("2026-01-01", "2026-01-31", conn=conn),
+    "AppTKX.atualizar_financeiro": lambda conn, caminho: consultas_gui.consultar_financeiro(conn),
+    "AppTKX.atualizar_operacional": lambda conn, caminho: consultas_gui.consultar_operacional(conn),
+    "AppTKX.atualizar_estrategico": lambda conn, caminho: consultas_gui.consultar_estrategico(conn),
+}
+
+
+def preparar_banco(corridas, pasta=PASTA_BANCOS):
+    """Cria (ou reaproveita) o banco de benchmark com `corridas` corridas. Devolve o caminho."""
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.abspath(os.path.join(pasta, f"tkx_bench_{corridas}.db"))
+    if os.path.exists(caminho):
+        conn = banco_tkx.conectar(caminho)
+        # Conta também os meses já particionados (o histórico vivo sozinho fica menor)
+        fonte = banco_tkx.fonte_corridas(conn, colunas=("id",))
+        if conn.execute(f"SELECT COUNT(*) FROM {fonte}").fetchone()[0] == corridas:
+            return caminho
+        banco_tkx.fechar_conexoes()
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(caminho + sufixo):
+                os.remove(caminho + sufixo)
+
+    print(f"⏳ Gerando banco de benchmark com {corridas:,} corridas...")
+    conn = banco_tkx.conectar(caminho)
+    popular_bi.carregar_corridas(
+        corridas,
+        motoristas=max(10, corridas // 2000),
+        clientes=max(100, corridas // 20),
+        dias=365,
+        semente=SEMENTE,
+        fim=FIM_PERIODO,
+        lote=100_000,
+        rapido=True,
+        conn=conn,
+        verbose=False,
+    )
+    conn.execute("ANALYZE")
+    return caminho
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def medir(funcao, caminho, aquecimento=2, repeticoes=10):
+    """Roda `funcao(conn, caminho)` com aquecimento e devolve as estatísticas da medição."""
+    conn = banco_tkx.conectar(caminho)
+    for _ in range(aquecimento):
+        funcao(conn, caminho)
+
+    passos = [0]
+    def contar():
+        passos[0] += 1
+        return 0
+
+    tempos = []
+    conn.set_progress_handler(contar, INTERVALO_PROGRESSO)
+    try:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao(conn, caminho)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    finally:
+        conn.set_progress_handler(None, 0)
+
+    # Pico de memória de uma execução a mais, fora da medição de tempo (tracemalloc deixa o
+    # Python mais lento). Conta só o que o Python aloca: o cache de páginas do SQLite fica fora.
+    tracemalloc.start()
+    try:
+        funcao(conn, caminho)
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(_percentil(tempos, 0.50), 3),
+        "p95_ms": round(_percentil(tempos, 0.95), 3),
+        "media_ms": round(statistics.fmean(tempos), 3),
+        "min_ms": round(min(tempos), 3),
+        # Instruções da VM por execução: cresce com as linhas lidas (proxy de "linhas varridas")
+        "instrucoes_vm": passos[0] * INTERVALO_PROGRESSO // repeticoes,
+        "pico_python_kb": pico // 1024,
+    }
+
+
+def executar(tamanhos, casos=None, aquecimento=2, repeticoes=10, verbose=True):
+    resultados = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "aquecimento": aquecimento,
+            "repeticoes": repeticoes,
+            "campos": CAMPOS,
+        },
+        "resultados": {},
+    }
+    for tamanho in tamanhos:
+        caminho = preparar_banco(tamanho)
+        por_caso = resultados["resultados"][str(tamanho)] = {}
+        for nome, funcao in CASOS.items():
+            if casos and nome not in casos:
+                continue
+            por_caso[nome] = medir(funcao, caminho, aquecimento, repeticoes)
+            if verbose:
+                r = por_caso[nome]
+                print(f"{tamanho:>10,} | {nome:<32} | p50 {r['p50_ms']:>9.2f} ms | p95 {r['p95_ms']:>9.2f} ms | VM {r['instrucoes_vm']:>12,}")
+    return resultados
+
+
+def comparar(atual, baseline, tolerancia=0.20, piso_ms=0.5):
+    """Lista de regressões: casos cujo p50 piorou mais que `tolerancia` (ignora variações < piso_ms)."""
+    regressoes = []
+    for tamanho, casos in atual["resultados"].items():
+        for nome, r in casos.items():
+            base = baseline.get("resultados", {}).get(tamanho, {}).get(nome)
+            if not base:
+                continue
+            if r["p50_ms"] > base["p50_ms"] * (1 + tolerancia) and r["p50_ms"] - base["p50_ms"] > piso_ms:
+                regressoes.append((tamanho, nome, base["p50_ms"], r["p50_ms"]))
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks dos relatórios e consultas TKX.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000], help="nº de corridas de cada banco")
+    parser.add_argument("--casos", nargs="*", help=f"subconjunto de: {', '.join(CASOS)}")
+    parser.add_argument("--aquecimento", type=int, default=2)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--saida", default="bench_resultados.json")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.20, help="piora aceita no p50 (0.20 = 20%%)")
+    parser.add_argument("--cache", action="store_true", help="mede com o cache de resultados ligado (padrão: desligado)")
+    args = parser.parse_args()
+
+    # Sem o cache cada repetição mede a consulta de verdade, não um acerto em memória
+    cache_consultas.configurar(ativo=args.cache)
+
+    resultados = executar(args.tamanhos, args.casos, args.aquecimento, args.repeticoes)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Resultados salvos em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressoes = comparar(resultados, baseline, args.tolerancia)
+        for tamanho, nome, antes, depois in regressoes:
+            print(f"❌ REGRESSÃO {nome} ({int(tamanho):,} corridas): {antes:.2f} ms -> {depois:.2f} ms")
+        if regressoes:
+            sys.exit(1)
+        print("✅ Nenhuma regressão em relação ao baseline.")
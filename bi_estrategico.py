@@ -1,54 +1,112 @@
+import os
 import sqlite3
 
-def bi_estrategico():
-    conn = sqlite3.connect('tkx_franca.db')
+import banco_tkx
+import cache_consultas
+import distribuicao_precos
+import rankings_bi
+import snapshot_colunar
+
+# O comparativo de mercado roda em cada partição do histórico (pelos índices dela) e os
+# parciais são combinados por soma/contagem. Os tops vêm dos placares (rankings_bi) e os
+# percentis da diferença para o concorrente, dos esboços de preços (distribuicao_precos).
+SQL_MERCADO_PARTE = """
+    SELECT TOTAL(valor_total_pago) AS soma_pago, COUNT(valor_total_pago) AS n_pago,
+           TOTAL(preco_concorrente) AS soma_concorrente, COUNT(preco_concorrente) AS n_concorrente
+    FROM {corridas} WHERE preco_concorrente IS NOT NULL
+"""
+SQL_MERCADO = "SELECT SUM(soma_pago) / SUM(n_pago), SUM(soma_concorrente) / SUM(n_concorrente) FROM ({partes})"
+# As somas e contagens, para combinar com as de outros bancos (ver municipios_tkx)
+SQL_MERCADO_PARCIAIS = "SELECT TOTAL(soma_pago), TOTAL(n_pago), TOTAL(soma_concorrente), TOTAL(n_concorrente) FROM ({partes})"
+
+
+def parciais_mercado(conn=None):
+    """(soma paga, nº, soma do concorrente, nº) das corridas com preço do concorrente."""
+    conn = conn or banco_tkx.conectar()
+    return conn.execute(SQL_MERCADO_PARCIAIS.format(partes=banco_tkx.sql_por_particao(SQL_MERCADO_PARTE, conn))).fetchone()
+
+
+def diferenca_mercado(media_paga, media_concorrente):
+    """Quanto (%) a TKX cobra acima (+) ou abaixo (-) do concorrente; None sem dados."""
+    if media_paga and media_concorrente:
+        return ((media_paga / media_concorrente) - 1) * 100
+    return None
+
+
+@cache_consultas.em_cache("historico_corridas", "clientes", "turnos")
+def dados_bi_estrategico(conn=None, motor=None):
+    """Dados do RX estratégico, sem imprimir nada (usado pelo relatório e pelos benchmarks).
+
+    motor="colunar" (ou TKX_MOTOR_BI=colunar) calcula sobre o snapshot colunar; se ele não
+    estiver disponível (ex.: sem NumPy), cai para o SQL.
+    """
+    conn = conn or banco_tkx.conectar()
+    if (motor or os.environ.get("TKX_MOTOR_BI")) == "colunar":
+        try:
+            dados = snapshot_colunar.dados_bi_estrategico(conn)
+            dados["distribuicao"] = distribuicao_precos.dados_distribuicao(conn=conn)
+            return dados
+        except RuntimeError:
+            pass
     cursor = conn.cursor()
 
+    # 1. Comparativo de Mercado
+    cursor.execute(SQL_MERCADO.format(partes=banco_tkx.sql_por_particao(SQL_MERCADO_PARTE, conn)))
+    precos = cursor.fetchone()
+    diferenca = diferenca_mercado(*precos) if precos else None
+
+    # 2. Top 5 Corridas Lucrativas
+    corridas = rankings_bi.top_corridas_lucro(5, conn=conn)
+
+    # 3. RX de Clientes (Fidelidade) - None quando a tabela ainda não existe
+    try:
+        clientes = rankings_bi.clientes_fieis(3, conn=conn)
+    except sqlite3.OperationalError:
+        clientes = None
+
+    # 4. Distribuição da diferença (p10/p50/p90 no total, por turno e por faixa de km)
+    distribuicao = distribuicao_precos.dados_distribuicao(conn=conn)
+
+    return {"diferenca_mercado": diferenca, "top_lucro": corridas, "clientes_fieis": clientes,
+            "distribuicao": distribuicao}
+
+def bi_estrategico():
+    dados = dados_bi_estrategico()
+
     print("\n" + "📈"*25)
     print("      RX FINANCEIRO E COMPARATIVO DE MERCADO")
     print("📈"*25)
 
     # 1. Comparativo de Mercado
-    cursor.execute("SELECT AVG(valor_total_pago), AVG(preco_concorrente) FROM historico_corridas WHERE preco_concorrente IS NOT NULL")
-    precos = cursor.fetchone()
-    if precos and precos[0] and precos[1]:
-        diff = ((precos[0] / precos[1]) - 1) * 100
+    diff = dados["diferenca_mercado"]
+    if diff is not None:
         status = "MAIS CARO" if diff > 0 else "MAIS BARATO"
         print(f"Status vs Concorrência: {abs(diff):.1f}% {status} que a média local")
     else:
         print("Status vs Concorrência: Dados insuficientes para comparar.")
+    distribuicao = dados["distribuicao"]
+    if distribuicao["diferenca"]["n"]:
+        d = distribuicao["diferenca"]
+        print(f"Diferença por corrida: P10 {d['p10']:+.1f}% | Mediana {d['p50']:+.1f}% | P90 {d['p90']:+.1f}%")
+        for turno, d in distribuicao["turnos"]:
+            if d["n"]:
+                print(f"   {turno.nome[:12]:<12} P10 {d['p10']:+.1f}% | Mediana {d['p50']:+.1f}% | P90 {d['p90']:+.1f}%")
 
     # 2. Top 5 Corridas Lucrativas
     print("\n💎 TOP 5 CORRIDAS MAIS LUCRATIVAS (MARGEM LÍQUIDA):")
-    query = """
-        SELECT id, (taxa_app_valor - custo_gateway - custos_fixos_totais) as lucro_real
-        FROM historico_corridas
-        ORDER BY lucro_real DESC LIMIT 5
-    """
-    cursor.execute(query)
-    corridas = cursor.fetchall()
-    for id_c, lucro in corridas:
+    for id_c, lucro in dados["top_lucro"]:
         print(f"Corrida #{id_c} | Lucro Líquido: R$ {lucro:.2f}")
 
-    # 3. RX de Clientes (Fidelidade) - Com tratamento de erro para a tabela
+    # 3. RX de Clientes (Fidelidade)
     print("\n👥 CLIENTES MAIS FIÉIS (Top 3):")
-    try:
-        cursor.execute("""
-            SELECT c.nome, COUNT(h.id) 
-            FROM clientes_cadastro c 
-            JOIN historico_corridas h ON c.id = h.cliente_id 
-            GROUP BY c.nome 
-            ORDER BY COUNT(h.id) DESC LIMIT 3
-        """)
-        clientes = cursor.fetchall()
-        if not clientes:
-            print("Nenhum dado de cliente fiel encontrado ainda.")
+    clientes = dados["clientes_fieis"]
+    if clientes is None:
+        print("Aviso: Tabela de clientes ainda não populada ou vinculada.")
+    elif not clientes:
+        print("Nenhum dado de cliente fiel encontrado ainda.")
+    else:
         for nome, total in clientes:
             print(f"Passageiro: {nome} | Viagens: {total}")
-    except sqlite3.OperationalError:
-        print("Aviso: Tabela de clientes ainda não populada ou vinculada.")
-
-    conn.close()
 
 if __name__ == "__main__":
-    bi_estrategico()
\ No newline at end of file
+    bi_estrategico()
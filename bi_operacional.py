@@ -1,36 +1,136 @@
-import sqlite3
+import os
+import sys
+from datetime import date
+
+import banco_tkx
+import cache_consultas
+import janelas_metricas
+import resolvedor_tarifas
+import snapshot_colunar
+
+# Ranking de todos os turnos numa passada só pelo índice (turno_id, motorista_id, comissão):
+# agrupa por turno e motorista e numera dentro de cada turno com ROW_NUMBER(). Com meses
+# fechados, cada partição é agrupada pelo seu próprio índice e os parciais são somados.
+SQL_RANKING_PARTE = """
+        SELECT h.turno_id, h.motorista_id, COUNT(*) AS corridas, SUM(h.taxa_app_valor) AS comissao
+        FROM {corridas} h
+        WHERE h.turno_id IS NOT NULL
+        GROUP BY h.turno_id, h.motorista_id
+"""
+SQL_RANKING_TURNOS = """
+    WITH por_motorista AS (
+        SELECT turno_id, motorista_id, SUM(corridas) AS corridas, SUM(comissao) AS comissao
+        FROM ({partes})
+        GROUP BY turno_id, motorista_id
+    ),
+    ranqueado AS (
+        SELECT p.turno_id, m.nome, p.corridas, p.comissao,
+               ROW_NUMBER() OVER (PARTITION BY p.turno_id ORDER BY {ordem} DESC, p.motorista_id) AS posicao
+        FROM por_motorista p
+        JOIN motoristas_cadastro m ON m.id = p.motorista_id
+    )
+    SELECT turno_id, nome, corridas, comissao FROM ranqueado
+    WHERE posicao <= ?
+    ORDER BY turno_id, posicao
+"""
+ORDENS_RANKING = {"comissao": "p.comissao", "corridas": "p.corridas"}
+SQL_NOTAS_PARTE = "SELECT TOTAL(avaliacao_motorista) AS soma, COUNT(avaliacao_motorista) AS n FROM {corridas}"
+
+def parciais_notas(conn=None):
+    """(soma das notas, nº de avaliações): a média da frota, combinável entre bancos."""
+    conn = conn or banco_tkx.conectar()
+    partes = banco_tkx.sql_por_particao(SQL_NOTAS_PARTE, conn)
+    return conn.execute(f"SELECT TOTAL(soma), TOTAL(n) FROM ({partes})").fetchone()
+
+@cache_consultas.em_cache("historico_corridas", "motoristas_cadastro", "turnos")
+def ranking_turnos(limite=10, ordem="comissao", conn=None):
+    """[(Turno, [(nome, corridas, comissão), ...]), ...] para todos os turnos configurados."""
+    conn = conn or banco_tkx.conectar()
+    rankings = {}
+    sql = SQL_RANKING_TURNOS.format(partes=banco_tkx.sql_por_particao(SQL_RANKING_PARTE, conn), ordem=ORDENS_RANKING[ordem])
+    for turno_id, nome, corridas, comissao in conn.execute(sql, (limite,)):
+        rankings.setdefault(turno_id, []).append((nome, corridas, comissao))
+    return [(turno, rankings.get(turno.id, [])) for turno in banco_tkx.listar_turnos(conn)]
+
+@cache_consultas.em_cache("historico_corridas", "motoristas_cadastro")
+def top_drivers(inicio, fim, limite=10, conn=None):
+    """Top motoristas por comissão TKX com partida entre inicio e fim (HH:MM, inclusivos).
+
+    Início maior que o fim atravessa a meia-noite (ex.: 18:01 -> 05:59).
+    """
+    conn = conn or banco_tkx.conectar()
+    ini, fim = resolvedor_tarifas.minuto_do_dia(inicio), resolvedor_tarifas.minuto_do_dia(fim)
+    filtro = "h.minuto_dia BETWEEN ? AND ?" if ini <= fim else "(h.minuto_dia >= ? OR h.minuto_dia <= ?)"
+    query = f"""
+        SELECT m.nome, COUNT(h.id), SUM(h.taxa_app_valor)
+        FROM motoristas_cadastro m
+        JOIN {banco_tkx.fonte_corridas(conn, colunas=("id", "motorista_id", "minuto_dia", "taxa_app_valor"))} h ON m.id = h.motorista_id
+        WHERE {filtro}
+        GROUP BY m.id
+        ORDER BY SUM(h.taxa_app_valor) DESC LIMIT ?
+    """
+    return conn.execute(query, (ini, fim, limite)).fetchall()
+
+def dados_bi_operacional(conn=None, motor=None, hoje=None):
+    """Dados do BI operacional, sem imprimir nada (usado pelo relatório e pelos benchmarks).
+
+    motor="colunar" (ou TKX_MOTOR_BI=colunar) usa o snapshot colunar, com o SQL de reserva.
+    hoje (AAAA-MM-DD, padrão: hoje) é o último dia das janelas móveis e dos alertas.
+    """
+    # As janelas dependem do dia e não só das tabelas: o dia (e o motor) entram na chave do cache
+    return _dados_bi_operacional(hoje or date.today().isoformat(), motor or os.environ.get("TKX_MOTOR_BI"), conn=conn)
+
+
+@cache_consultas.em_cache("historico_corridas", "motoristas_cadastro", "turnos")
+def _dados_bi_operacional(hoje, motor, conn=None):
+    conn = conn or banco_tkx.conectar()
+    # Janelas móveis e alertas de qualidade: dos baldes diários, nos dois motores
+    janelas = {"frota": janelas_metricas.resumo_frota(hoje, conn=conn),
+               "alertas": janelas_metricas.alertas_nota(hoje=hoje, conn=conn)}
+    if motor == "colunar":
+        try:
+            return {**snapshot_colunar.dados_bi_operacional(conn), **janelas}
+        except RuntimeError:
+            pass
+    turnos = [(t.nome, t.hora_inicio, t.hora_fim, ranking) for t, ranking in ranking_turnos(10, conn=conn)]
+    soma, n = parciais_notas(conn)
+    return {"turnos": turnos, "nota_media": soma / n if n else 0, **janelas}
 
 def bi_operacional():
-    conn = sqlite3.connect('tkx_franca.db')
-    cursor = conn.cursor()
+    dados = dados_bi_operacional()
 
     print("\n" + "█"*50)
     print("      📊 BI OPERACIONAL - PERFORMANCE TKX")
     print("█"*50)
 
-    # Função interna para buscar Top 10 por turno
-    def top_drivers(inicio, fim, turno_nome):
+    # Top 10 por turno
+    for turno_nome, inicio, fim, ranking in dados["turnos"]:
         print(f"\n🏆 TOP 10 DRIVERS - TURNO {turno_nome} ({inicio}h às {fim}h):")
-        query = """
-            SELECT m.nome, COUNT(h.id), SUM(h.taxa_app_valor)
-            FROM motoristas_cadastro m
-            JOIN historico_corridas h ON m.id = h.motorista_id
-            WHERE h.hora_partida BETWEEN ? AND ?
-            GROUP BY m.nome
-            ORDER BY SUM(h.taxa_app_valor) DESC LIMIT 10
-        """
-        cursor.execute(query, (inicio, fim))
-        for i, (nome, qtd, valor) in enumerate(cursor.fetchall(), 1):
+        for i, (nome, qtd, valor) in enumerate(ranking, 1):
             print(f"{i:2d}º | {nome[:15]:<15} | Corridas: {qtd:3d} | Lucro TKX: R$ {valor:.2f}")
 
-    top_drivers("06:00", "18:00", "DIURNO")
-    top_drivers("18:01", "05:59", "NOTURNO")
-
     print("\n" + "-"*50)
     print("⭐ MÉTRICAS DE QUALIDADE E RETENÇÃO:")
-    cursor.execute("SELECT AVG(avaliacao_motorista) FROM historico_corridas")
-    print(f"Nota Média da Frota: {cursor.fetchone()[0] or 0:.1f} / 5.0")
-    
-    conn.close()
+    print(f"Nota Média da Frota: {dados['nota_media']:.1f} / 5.0")
+    for janela, (corridas, _, comissao, _, media) in dados["frota"].items():
+        nota = f"{media:.2f}" if media is not None else "-"
+        print(f"Últimos {janela:>2} dias: {corridas:7d} corridas | Lucro TKX: R$ {comissao:11.2f} | Nota: {nota}")
+
+    alertas = dados["alertas"]
+    print(f"\n⚠️ NOTA DOS ÚLTIMOS 7 DIAS ABAIXO DE {janelas_metricas.NOTA_ALERTA:.1f}: {len(alertas)} motorista(s)")
+    for m in alertas[:10]:
+        tendencia = f"{m.tendencia:+.2f}/sem" if m.tendencia is not None else "-"
+        print(f"{(m.nome or '?')[:15]:<15} | Nota: {m.media:.2f} ({m.avaliacoes} avaliações) | Tendência: {tendencia}")
 
-if __name__ == "__main__": bi_operacional()
\ No newline at end of file
+if __name__ == "__main__":
+    # python bi_operacional.py --turnos MADRUGADA=00:00-06:00 MANHA=06:00-12:00 TARDE=12:00-18:00 NOITE=18:00-00:00
+    if len(sys.argv) > 2 and sys.argv[1] == "--turnos":
+        novos = []
+        for item in sys.argv[2:]:
+            nome, faixa = item.split("=")
+            inicio, fim = faixa.split("-")
+            novos.append((nome, inicio, fim))
+        for turno in banco_tkx.configurar_turnos(novos):
+            print(f"✅ Turno {turno.nome}: {turno.hora_inicio} às {turno.hora_fim}")
+    else:
+        bi_operacional()
@@ -0,0 +1,152 @@
+import argparse
+import re
+import sys
+from collections import namedtuple
+
+import banco_tkx
+
+# Busca e listagem paginada de motoristas e clientes (migração 11).
+#
+#   buscar("joao")        nome sem acento e por prefixo: "joao si" acha "João Silva"
+#   buscar("abc12")       placa, CPF e telefone (com ou sem DDD), pontuação ignorada
+#   buscar(status="ativo", tipo="motorista")      listagem filtrada, sem texto
+#
+# A paginação é por chave (keyset): cada página devolve `proximo` (nome e chave do último
+# cadastro) e a seguinte começa depois dele pelo índice de nome, sem OFFSET. A página 500
+# custa o mesmo que a primeira.
+#
+#   python busca_cadastros.py joao --status ativo
+#   python busca_cadastros.py --tipo cliente --limite 50
+
+LIMITE = 20
+TIPOS = ("motorista", "cliente")
+STATUS = ("ativo", "pendente", "bloqueado")
+
+# chave: rowid do índice de busca (2*id motoristas, 2*id + 1 clientes); ordena empates de nome
+Cadastro = namedtuple("Cadastro", "tipo id nome documento telefone status chave")
+Pagina = namedtuple("Pagina", "cadastros proximo")
+
+_SQL_TIPO = {
+    "motorista": """
+        SELECT 'motorista', t.id, t.nome, t.placa, t.telefone, t.status, 2 * t.id AS chave
+        FROM {origem} motoristas_cadastro t{juncao}
+        WHERE {filtros}
+        ORDER BY t.nome, t.id LIMIT :limite
+    """,
+    "cliente": """
+        SELECT 'cliente', t.id, t.nome, t.email, t.telefone, NULL, 2 * t.id + 1 AS chave
+        FROM {origem} clientes t{juncao}
+        WHERE {filtros}
+        ORDER BY t.nome, t.id LIMIT :limite
+    """,
+}
+_RESTO_ROWID = {"motorista": 0, "cliente": 1}
+
+
+def expressao_busca(texto):
+    """Texto digitado -> consulta FTS5 (termos com prefixo, todos obrigatórios). None se vazio.
+
+    Termos com dígitos são documentos (CPF, placa, telefone): a pontuação sai e o termo fica
+    inteiro ("ABC-1234" -> abc1234). Os demais se quebram como o índice quebra os nomes.
+    """
+    termos = []
+    for termo in (texto or "").split():
+        if any(c.isdigit() for c in termo) and "@" not in termo:
+            termos.append(re.sub(r"\W|_", "", termo))
+        else:
+            termos += re.split(r"\W|_", termo)
+    termos = [t for t in termos if t]
+    return " ".join(f'"{t}"*' for t in termos) or None
+
+
+def buscar(texto=None, tipo=None, status=None, apos=None, limite=LIMITE, conn=None):
+    """Página de cadastros em ordem de nome. `apos` é o `proximo` da página anterior."""
+    if tipo not in (None, *TIPOS):
+        raise ValueError(f"tipo deve ser {' ou '.join(TIPOS)}")
+    if status not in (None, *STATUS):
+        raise ValueError(f"status deve ser {', '.join(STATUS)}")
+    conn = conn or banco_tkx.conectar()
+    consulta = expressao_busca(texto)
+    # Status só existe para motoristas
+    tipos = [t for t in TIPOS if (tipo or t) == t and not (status and t == "cliente")]
+    params = {"busca": consulta, "status": status, "limite": limite,
+              "nome": apos[0] if apos else None, "chave": apos[1] if apos else None}
+
+    partes = []
+    for t in tipos:
+        filtros = []
+        if consulta:
+            # O FTS devolve os rowids que casam; cada tabela junta só os seus
+            origem, juncao = "busca_cadastros b JOIN", " ON t.id = b.rowid / 2"
+            filtros += ["busca_cadastros MATCH :busca", f"b.rowid % 2 = {_RESTO_ROWID[t]}"]
+        else:
+            origem, juncao = "", ""
+        if status == "pendente":
+            # Sem status conta como pendente (o padrão do cadastro), como em contagens()
+            filtros.append("(t.status = :status OR t.status IS NULL)")
+        elif status:
+            filtros.append("t.status = :status")
+        if apos:
+            # (nome, chave) > cursor, escrito para o índice de nome fazer a faixa
+            filtros.append(f"t.nome >= :nome AND (t.nome > :nome OR 2 * t.id + {_RESTO_ROWID[t]} > :chave)")
+        sql = _SQL_TIPO[t].format(origem=origem, juncao=juncao, filtros=" AND ".join(filtros) or "1")
+        partes.append(f"SELECT * FROM ({sql})")
+
+    linhas = conn.execute(
+        f"SELECT * FROM ({' UNION ALL '.join(partes)}) ORDER BY 3, 7 LIMIT :limite", params).fetchall()
+    cadastros = [Cadastro._make(l) for l in linhas]
+    proximo = (cadastros[-1].nome, cadastros[-1].chave) if len(cadastros) == limite else None
+    return Pagina(cadastros, proximo)
+
+
+def paginas(texto=None, tipo=None, status=None, limite=LIMITE, conn=None):
+    """Gera as páginas em sequência até a última."""
+    apos = None
+    while True:
+        pagina = buscar(texto, tipo, status, apos, limite, conn)
+        yield pagina
+        if pagina.proximo is None:
+            return
+        apos = pagina.proximo
+
+
+def contagens(conn=None):
+    """{'motoristas': {status: n}, 'clientes': n}."""
+    conn = conn or banco_tkx.conectar()
+    return {
+        "motoristas": dict(conn.execute("SELECT COALESCE(status, 'pendente'), COUNT(*) FROM motoristas_cadastro GROUP BY 1")),
+        "clientes": conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0],
+    }
+
+
+def formatar_cadastro(c):
+    if c.tipo == "motorista":
+        return f"🚗 #{c.id:<6} {c.nome[:28]:<28} | Placa: {c.documento or '-':<8} | Tel: {c.telefone or '-':<12} | {c.status}"
+    return f"👤 #{c.id:<6} {c.nome[:28]:<28} | Tel: {c.telefone or '-':<12} | {c.documento or ''}"
+
+
+def navegar(texto=None, tipo=None, status=None, limite=LIMITE, conn=None):
+    """Mostra página a página no terminal (Enter avança, q sai)."""
+    for numero, pagina in enumerate(paginas(texto, tipo, status, limite, conn), 1):
+        if not pagina.cadastros and numero == 1:
+            print("Nenhum cadastro encontrado.")
+            return
+        print(f"\n--- Página {numero} ---")
+        for c in pagina.cadastros:
+            print(formatar_cadastro(c))
+        if pagina.proximo is None or input("\n[Enter] próxima página | [q] sair: ").strip().lower() == "q":
+            return
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Busca de motoristas e clientes.")
+    parser.add_argument("texto", nargs="*", help="nome, placa, CPF ou telefone (prefixo, sem acento)")
+    parser.add_argument("--tipo", choices=TIPOS)
+    parser.add_argument("--status", choices=STATUS, help="só motoristas com este status")
+    parser.add_argument("--limite", type=int, default=LIMITE, help="cadastros por página")
+    args = parser.parse_args(argv)
+    navegar(" ".join(args.texto), args.tipo, args.status, args.limite)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,222 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import banco_tkx
+
+# Cache de resultados dos relatórios (CLI e abas do AppTKX).
+#
+# Cada entrada guarda a versão (versoes_tabelas) das tabelas de que o resultado depende e
+# só vale enquanto essas versões não mudarem. Para não consultar versoes_tabelas a cada
+# acerto, a conexão é checada antes por PRAGMA data_version (commits de outras conexões)
+# e total_changes (escritas dela mesma): se nada mudou, as versões lidas da última vez valem.
+#
+# Camada em disco opcional (TKX_CACHE_DISCO=arquivo ou configurar(disco=...)): um processo
+# recém-aberto reaproveita os últimos resultados enquanto as versões baterem.
+#
+# Os resultados são compartilhados: quem recebe não deve alterá-los.
+
+MAX_ENTRADAS = 256
+VARIAVEL_DISCO = 'TKX_CACHE_DISCO'
+
+_trava = threading.Lock()
+_entradas = OrderedDict()  # chave -> (versões, resultado)
+_local = threading.local()
+_config = {"ativo": True, "max_entradas": MAX_ENTRADAS, "disco": os.environ.get(VARIAVEL_DISCO)}
+_estatisticas = {"acertos": 0, "acertos_disco": 0, "falhas": 0, "invalidacoes": 0, "descartes": 0}
+_por_funcao = {}
+
+
+def configurar(ativo=None, max_entradas=None, disco=None):
+    """Liga/desliga o cache, muda o limite de entradas ou o arquivo da camada em disco ('' desliga)."""
+    with _trava:
+        if ativo is not None:
+            _config["ativo"] = ativo
+        if max_entradas is not None:
+            _config["max_entradas"] = max_entradas
+            while len(_entradas) > max_entradas:
+                _entradas.popitem(last=False)
+        if disco is not None:
+            _config["disco"] = disco or None
+            _local.__dict__.pop("disco", None)
+
+
+def limpar():
+    with _trava:
+        _entradas.clear()
+
+
+def estatisticas():
+    """Acertos, falhas e invalidações (totais e por consulta) e o tamanho atual do cache."""
+    with _trava:
+        total = _estatisticas["acertos"] + _estatisticas["acertos_disco"] + _estatisticas["falhas"]
+        return {
+            **_estatisticas,
+            "entradas": len(_entradas),
+            "taxa_acerto": (_estatisticas["acertos"] + _estatisticas["acertos_disco"]) / total if total else 0.0,
+            "por_consulta": {nome: dict(v) for nome, v in _por_funcao.items()},
+        }
+
+
+def _contar(nome, evento):
+    _estatisticas[evento] += 1
+    _por_funcao.setdefault(nome, {"acertos": 0, "acertos_disco": 0, "falhas": 0, "invalidacoes": 0, "descartes": 0})[evento] += 1
+
+
+def _estado_conexao(conn):
+    """(caminho do banco, versões das tabelas) desta conexão, relidas só se algo foi gravado."""
+    estados = getattr(_local, "estados", None)
+    if estados is None:
+        estados = _local.estados = {}
+    marca = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+    estado = estados.get(id(conn))
+    if estado is None or estado[0] is not conn:
+        caminho = next(l[2] for l in conn.execute("PRAGMA database_list") if l[1] == "main")
+        estado = estados[id(conn)] = [conn, caminho, None, None]
+    if estado[2] != marca:
+        estado[3] = dict(conn.execute("SELECT tabela, versao FROM versoes_tabelas"))
+        estado[2] = marca
+    return estado[1], estado[3]
+
+
+def versoes(tabelas, conn=None):
+    """(caminho do banco, versões das tabelas): muda sempre que alguma delas é alterada.
+
+    Mesma checagem barata do cache (PRAGMA data_version), para ETags e afins.
+    """
+    conn = conn or banco_tkx.conectar()
+    caminho, todas = _estado_conexao(conn)
+    return caminho, tuple(todas.get(t, 0) for t in tabelas)
+
+
+# --- Camada em disco ---
+
+def _disco():
+    caminho = _config["disco"]
+    if not caminho:
+        return None
+    conn = getattr(_local, "disco", None)
+    if conn is None:
+        conn = _local.disco = sqlite3.connect(caminho, timeout=5)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS resultados (chave TEXT PRIMARY KEY, versoes BLOB, resultado BLOB)")
+    return conn
+
+
+def _chave_disco(chave):
+    return hashlib.sha1(repr(chave).encode()).hexdigest()
+
+
+def _ler_disco(chave, versoes):
+    conn = _disco()
+    if conn is None:
+        return None
+    linha = conn.execute("SELECT versoes, resultado FROM resultados WHERE chave = ?", (_chave_disco(chave),)).fetchone()
+    if linha is None or pickle.loads(linha[0]) != versoes:
+        return None
+    return (pickle.loads(linha[1]),)
+
+
+def _gravar_disco(chave, versoes, resultado):
+    conn = _disco()
+    if conn is None:
+        return
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO resultados (chave, versoes, resultado) VALUES (?, ?, ?)",
+                         (_chave_disco(chave), pickle.dumps(versoes), pickle.dumps(resultado)))
+    except (sqlite3.Error, pickle.PicklingError, TypeError, AttributeError):
+        pass  # o disco é só um atalho: resultado que não serializa fica apenas em memória
+
+
+# --- Consulta com cache ---
+
+def obter(nome, parametros, tabelas, calcular, conn=None):
+    """Resultado de `calcular()` para (nome, parametros), reaproveitado enquanto `tabelas` não mudarem."""
+    if not _config["ativo"]:
+        return calcular()
+    conn = conn or banco_tkx.conectar()
+    caminho, todas = _estado_conexao(conn)
+    versoes = tuple(todas.get(t, 0) for t in tabelas)
+    chave = (caminho, nome, parametros)
+
+    with _trava:
+        entrada = _entradas.get(chave)
+        if entrada is not None:
+            if entrada[0] == versoes:
+                _entradas.move_to_end(chave)
+                _contar(nome, "acertos")
+                return entrada[1]
+            del _entradas[chave]
+            _contar(nome, "invalidacoes")
+
+    do_disco = _ler_disco(chave, versoes)
+    if do_disco is not None:
+        resultado = do_disco[0]
+        evento = "acertos_disco"
+    else:
+        resultado = calcular()
+        evento = "falhas"
+        _gravar_disco(chave, versoes, resultado)
+
+    with _trava:
+        _contar(nome, evento)
+        _entradas[chave] = (versoes, resultado)
+        _entradas.move_to_end(chave)
+        while len(_entradas) > _config["max_entradas"]:
+            _entradas.popitem(last=False)
+            _contar(nome, "descartes")
+    return resultado
+
+
+def consultar(sql, parametros=(), tabelas=("historico_corridas",), conn=None):
+    """fetchall() de uma consulta SQL, com cache pela própria consulta e parâmetros."""
+    conn = conn or banco_tkx.conectar()
+    return obter(sql, tuple(parametros), tabelas, lambda: conn.execute(sql, parametros).fetchall(), conn)
+
+
+def em_cache(*tabelas):
+    """Decorador para funções de relatório com parâmetro `conn=None`.
+
+    A chave é a função mais os demais argumentos (já com os valores padrão, então
+    f(10) e f(limite=10) caem na mesma entrada); `tabelas` são as tabelas lidas por ela.
+    """
+    def decorador(funcao):
+        nome = f"{funcao.__module__}.{funcao.__qualname__}"
+        assinatura = inspect.signature(funcao)
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            argumentos = assinatura.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            conn = argumentos.arguments.pop("conn", None)
+            parametros = tuple(argumentos.arguments.items())
+            return obter(nome, parametros, tabelas, lambda: funcao(**argumentos.arguments, conn=conn), conn)
+
+        envoltorio.sem_cache = funcao
+        return envoltorio
+    return decorador
+
+
+if __name__ == "__main__":
+    import time
+
+    import bi_estrategico
+    import bi_operacional
+    import cache_consultas  # a instância usada pelos relatórios, não a deste __main__
+    import consolidado_dre
+
+    # Mostra o ganho de repetir os relatórios sem nenhuma gravação no meio
+    for funcao in (bi_operacional.dados_bi_operacional, bi_estrategico.dados_bi_estrategico, consolidado_dre.totais_periodo):
+        tempos = []
+        for _ in range(3):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        print(f"{funcao.__module__}.{funcao.__name__:<24} " + " | ".join(f"{t:8.3f} ms" for t in tempos))
+    print(cache_consultas.estatisticas())
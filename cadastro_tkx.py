@@ -1,4 +1,256 @@
-import sqlite3
+import argparse
+import csv
+import re
+import sys
+import time
+from collections import namedtuple
+
+import banco_tkx
+
+# Cadastro de motoristas e clientes: um por vez (perguntas no terminal) ou em massa a
+# partir de planilhas CSV (campanhas de adesão da frota).
+#
+#   python cadastro_tkx.py                                        cadastro interativo
+#   python cadastro_tkx.py importar motoristas frota.csv          importação em massa
+#   python cadastro_tkx.py importar clientes base.csv --rejeitados recusados.csv
+#
+# A importação lê o CSV em blocos de LOTE linhas (o arquivo nunca fica inteiro na memória).
+# Em cada bloco CPF, telefone, placa e e-mail são normalizados e validados, as colunas UNIQUE
+# são conferidas com uma consulta por coluna (não uma por linha) e o bloco é gravado numa
+# transação: quem já existe (mesmo CPF / mesmo telefone) é atualizado, quem não existe é
+# inserido. Campos vazios na planilha não apagam o que já está cadastrado. Linhas recusadas
+# vão para o arquivo de rejeitados com o número da linha e o motivo.
+
+LOTE = 5000
+STATUS_MOTORISTA = ("pendente", "ativo", "bloqueado")
+
+# Cabeçalhos comuns nas planilhas -> coluna do banco
+APELIDOS = {
+    "modelo": "veiculo_modelo", "veiculo": "veiculo_modelo", "veículo": "veiculo_modelo",
+    "celular": "telefone", "fone": "telefone", "e-mail": "email",
+}
+
+
+# --- Normalização e validação ---
+
+def _digitos(valor):
+    return re.sub(r"\D", "", valor)
+
+
+def normalizar_cpf(valor):
+    """'123.456.789-09' -> '12345678909'. ValueError se os dígitos verificadores não conferem."""
+    cpf = _digitos(valor)
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        raise ValueError(f"CPF inválido: {valor}")
+    for tamanho in (9, 10):
+        soma = sum(int(d) * (tamanho + 1 - i) for i, d in enumerate(cpf[:tamanho]))
+        if (soma * 10 % 11) % 10 != int(cpf[tamanho]):
+            raise ValueError(f"CPF inválido: {valor}")
+    return cpf
+
+
+def normalizar_telefone(valor):
+    """'+55 (16) 99123-4567' -> '16991234567' (DDD + número, 10 ou 11 dígitos)."""
+    telefone = _digitos(valor).lstrip("0")
+    if len(telefone) in (12, 13) and telefone.startswith("55"):
+        telefone = telefone[2:]
+    if len(telefone) not in (10, 11) or telefone[0] == "0" or (len(telefone) == 11 and telefone[2] != "9"):
+        raise ValueError(f"Telefone inválido: {valor}")
+    return telefone
+
+
+def normalizar_placa(valor):
+    """'abc-1234' -> 'ABC1234'; aceita o padrão antigo e o Mercosul (ABC1D23)."""
+    placa = re.sub(r"[\s-]", "", valor).upper()
+    if not re.fullmatch(r"[A-Z]{3}[0-9][A-Z0-9][0-9]{2}", placa):
+        raise ValueError(f"Placa inválida: {valor}")
+    return placa
+
+
+def normalizar_email(valor):
+    email = valor.strip().lower()
+    if not re.fullmatch(r"[^@\s]+@[^@\s]+\.[^@\s]+", email):
+        raise ValueError(f"E-mail inválido: {valor}")
+    return email
+
+
+def normalizar_status(valor):
+    status = valor.strip().lower()
+    if status not in STATUS_MOTORISTA:
+        raise ValueError(f"Status inválido: {valor} (use {', '.join(STATUS_MOTORISTA)})")
+    return status
+
+
+def _texto(valor):
+    return " ".join(valor.split())
+
+
+NORMALIZADORES = {
+    "nome": _texto, "veiculo_modelo": _texto, "cpf": normalizar_cpf, "telefone": normalizar_telefone,
+    "placa": normalizar_placa, "email": normalizar_email, "status": normalizar_status,
+}
+
+# chave: coluna UNIQUE que identifica o cadastro (linha repetida atualiza);
+# unica: outra coluna UNIQUE, que não pode pertencer a outro cadastro
+Importacao = namedtuple("Importacao", "tabela campos obrigatorios chave unica padroes")
+IMPORTACOES = {
+    "motoristas": Importacao("motoristas_cadastro", ("nome", "cpf", "telefone", "placa", "veiculo_modelo", "status"),
+                             ("nome", "cpf"), "cpf", "placa", {"status": "pendente"}),
+    "clientes": Importacao("clientes", ("nome", "telefone", "email"), ("nome", "telefone"), "telefone", "email", {}),
+}
+
+
+def validar_registro(especificacao, bruto):
+    """Dict da planilha -> dict normalizado (campos vazios viram None). ValueError se inválido."""
+    registro = {}
+    for campo in especificacao.campos:
+        valor = (bruto.get(campo) or "").strip()
+        if not valor:
+            if campo in especificacao.obrigatorios:
+                raise ValueError(f"{campo} obrigatório")
+            registro[campo] = None
+            continue
+        registro[campo] = NORMALIZADORES[campo](valor)
+    return registro
+
+
+# --- Importação em massa ---
+
+def _ler_csv(arquivo):
+    """Gera (nº da linha, dict) de um CSV com ',' ';' ou tab e cabeçalho na primeira linha."""
+    amostra = arquivo.read(8192)
+    arquivo.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.reader(arquivo, dialeto)
+    cabecalho = [APELIDOS.get(c.strip().lower(), c.strip().lower()) for c in next(leitor, [])]
+    for linha in leitor:
+        if any(c.strip() for c in linha):
+            yield leitor.line_num, dict(zip(cabecalho, linha))
+
+
+def _em_lotes(itens, tamanho):
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _cadeia(primeiro, resto):
+    yield primeiro
+    yield from resto
+
+
+def _consultar_em_partes(conn, sql, valores, parte=10_000):
+    """Linhas de um SELECT ... IN ({}) com muitos valores (limite de parâmetros do SQLite)."""
+    for i in range(0, len(valores), parte):
+        trecho = valores[i:i + parte]
+        yield from conn.execute(sql.format(", ".join("?" * len(trecho))), trecho)
+
+
+def _gravar_lote(conn, esp, linhas, rejeitar):
+    """Confere as colunas UNIQUE do lote em bloco e grava numa transação. Devolve (inseridos, atualizados)."""
+    chaves = list({r[esp.chave] for _, _, r in linhas})
+    unicos = list({r[esp.unica] for _, _, r in linhas if r[esp.unica]})
+    with banco_tkx.transacao(conn):
+        # Valor atual da coluna única de cada cadastro envolvido e o dono de cada valor
+        atual = dict(_consultar_em_partes(conn, f"SELECT {esp.chave}, {esp.unica} FROM {esp.tabela} WHERE {esp.chave} IN ({{}})",
+                                          chaves))
+        existentes, original = set(atual), dict(atual)
+        dono = {u: k for k, u in atual.items() if u}
+        if unicos:
+            dono.update(_consultar_em_partes(conn, f"SELECT {esp.unica}, {esp.chave} FROM {esp.tabela} WHERE {esp.unica} IN ({{}})",
+                                             unicos))
+
+        # Na ordem do arquivo, como se cada linha fosse gravada sozinha: linhas repetidas
+        # do mesmo cadastro se fundem (a última preenchida vale)
+        finais = {}
+        for numero, bruto, r in linhas:
+            k, u = r[esp.chave], r[esp.unica]
+            if u and dono.get(u, k) != k:
+                rejeitar(numero, bruto, f"{esp.unica} {u} já pertence a outro cadastro ({esp.chave} {dono[u]})")
+                continue
+            if u:
+                if atual.get(k) and atual[k] != u:
+                    dono.pop(atual[k], None)
+                atual[k], dono[u] = u, k
+            finais.setdefault(k, {}).update((c, v) for c, v in r.items() if v is not None)
+
+        atualizar = [r for k, r in finais.items() if k in existentes]
+        inserir = [r for k, r in finais.items() if k not in existentes]
+        # Quem troca a coluna única solta a antiga antes (trocas entre cadastros do mesmo lote)
+        trocas = [r[esp.chave] for r in atualizar if r.get(esp.unica) and r[esp.unica] != original[r[esp.chave]]]
+        if trocas:
+            conn.executemany(f"UPDATE {esp.tabela} SET {esp.unica} = NULL WHERE {esp.chave} = ?", [(k,) for k in trocas])
+        outros = [c for c in esp.campos if c != esp.chave]
+        if atualizar:
+            conn.executemany(
+                f"UPDATE {esp.tabela} SET {', '.join(f'{c} = COALESCE(?, {c})' for c in outros)} WHERE {esp.chave} = ?",
+                [[r.get(c) for c in outros] + [r[esp.chave]] for r in atualizar])
+        if inserir:
+            conn.executemany(
+                f"INSERT INTO {esp.tabela} ({', '.join(esp.campos)}) VALUES ({', '.join('?' * len(esp.campos))})",
+                [[r.get(c, esp.padroes.get(c)) for c in esp.campos] for r in inserir])
+    return len(inserir), len(atualizar)
+
+
+def importar_csv(tipo, caminho, rejeitados=None, lote=LOTE, conn=None):
+    """Importa motoristas ou clientes de um CSV. Devolve dict com as contagens e o tempo."""
+    esp = IMPORTACOES[tipo]
+    conn = conn or banco_tkx.conectar()
+    rejeitados = rejeitados or caminho.rsplit(".", 1)[0] + "_rejeitados.csv"
+    totais = {"linhas": 0, "inseridos": 0, "atualizados": 0, "rejeitados": 0}
+    t0 = time.perf_counter()
+
+    with open(caminho, newline="", encoding="utf-8-sig") as entrada, \
+            open(rejeitados, "w", newline="", encoding="utf-8") as saida:
+        arquivo_rejeitados = csv.writer(saida)
+        arquivo_rejeitados.writerow(["linha", "motivo", *esp.campos])
+
+        def rejeitar(numero, bruto, motivo):
+            arquivo_rejeitados.writerow([numero, motivo, *(bruto.get(c, "") for c in esp.campos)])
+            totais["rejeitados"] += 1
+
+        linhas = _ler_csv(entrada)
+        primeira = next(linhas, None)
+        if primeira is not None:
+            faltando = [c for c in esp.obrigatorios if c not in primeira[1]]
+            if faltando:
+                raise ValueError(f"Colunas obrigatórias ausentes no CSV: {', '.join(faltando)}")
+            linhas = _cadeia(primeira, linhas)
+
+        for bloco in _em_lotes(linhas, lote):
+            validos = []
+            for numero, bruto in bloco:
+                totais["linhas"] += 1
+                try:
+                    validos.append((numero, bruto, validar_registro(esp, bruto)))
+                except ValueError as e:
+                    rejeitar(numero, bruto, str(e))
+            if validos:
+                inseridos, atualizados = _gravar_lote(conn, esp, validos, rejeitar)
+                totais["inseridos"] += inseridos
+                totais["atualizados"] += atualizados
+
+    totais.update(segundos=time.perf_counter() - t0, arquivo_rejeitados=rejeitados)
+    return totais
+
+
+def exibir_importacao(tipo, totais):
+    segundos = max(totais["segundos"], 1e-9)
+    print(f"\n✅ Importação de {tipo}: {totais['linhas']:,} linhas em {segundos:.2f}s ({totais['linhas'] / segundos:,.0f} linhas/s)")
+    print(f"Inseridos: {totais['inseridos']:,} | Atualizados: {totais['atualizados']:,} | Rejeitados: {totais['rejeitados']:,}")
+    if totais["rejeitados"]:
+        print(f"Motivos das recusas em: {totais['arquivo_rejeitados']}")
+
+
+# --- Cadastro interativo ---
 
 def cadastrar_motorista():
     nome = input("Nome do Motorista: ")
@@ -8,15 +260,8 @@ def cadastrar_motorista():
     modelo = input("Modelo do Veículo: ")
 
     try:
-        conn = sqlite3.connect('tkx_franca.db')
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO motoristas_cadastro (nome, cpf, telefone, placa, veiculo_modelo, status) 
-            VALUES (?, ?, ?, ?, ?, 'ativo')
-        """, (nome, cpf, tel, placa, modelo))
-        conn.commit()
+        banco_tkx.inserir_motorista(nome, normalizar_cpf(cpf), normalizar_telefone(tel), normalizar_placa(placa), modelo)
         print(f"\n✅ Motorista {nome} cadastrado com sucesso!")
-        conn.close()
     except Exception as e:
         print(f"\n❌ Erro ao cadastrar: {e}")
 
@@ -26,25 +271,39 @@ def cadastrar_cliente():
     email = input("Email: ")
 
     try:
-        conn = sqlite3.connect('tkx_franca.db')
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO clientes (nome, telefone, email) 
-            VALUES (?, ?, ?)
-        """, (nome, tel, email))
-        conn.commit()
+        banco_tkx.inserir_cliente(nome, normalizar_telefone(tel), normalizar_email(email) if email.strip() else None)
         print(f"\n✅ Cliente {nome} cadastrado com sucesso!")
-        conn.close()
     except Exception as e:
         print(f"\n❌ Erro ao cadastrar: {e}")
 
-# Menu Principal
-print("--- SISTEMA DE CADASTRO TKX ---")
-opcao = input("Deseja cadastrar [1] Motorista ou [2] Cliente? ")
+def menu():
+    print("--- SISTEMA DE CADASTRO TKX ---")
+    opcao = input("Deseja cadastrar [1] Motorista ou [2] Cliente? ")
+
+    if opcao == '1':
+        cadastrar_motorista()
+    elif opcao == '2':
+        cadastrar_cliente()
+    else:
+        print("Opção inválida.")
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Cadastro de motoristas e clientes da TKX.")
+    sub = parser.add_subparsers(dest="comando")
+    importar = sub.add_parser("importar", help="importação em massa a partir de CSV")
+    importar.add_argument("tipo", choices=sorted(IMPORTACOES))
+    importar.add_argument("arquivo", help="CSV com cabeçalho (separador , ; ou tab)")
+    importar.add_argument("--rejeitados", help="CSV das linhas recusadas (padrão: <arquivo>_rejeitados.csv)")
+    importar.add_argument("--lote", type=int, default=LOTE, help="linhas por transação")
+    args = parser.parse_args(argv)
+
+    if args.comando != "importar":
+        menu()
+        return
+    try:
+        exibir_importacao(args.tipo, importar_csv(args.tipo, args.arquivo, args.rejeitados, args.lote))
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
 
-if opcao == '1':
-    cadastrar_motorista()
-elif opcao == '2':
-    cadastrar_cliente()
-else:
-    print("Opção inválida.")
\ No newline at end of file
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,69 +1,156 @@
-import sqlite3
+from collections import namedtuple
 
-def setup_database():
-    """Cria a tabela e insere dados de teste se não existirem."""
-    conn = sqlite3.connect('tkx_franca.db')
+try:
+    import numpy as np
+except ImportError:  # sem NumPy o cálculo em lote roda em listas Python
+    np = None
+
+import banco_tkx
+
+TAXA_COMISSAO = 0.15 # Seus 15%
+
+# Mesmos campos para uma corrida (floats) ou para um lote (arrays NumPy / listas)
+ResultadoDRE = namedtuple(
+    "ResultadoDRE",
+    "distancia_km valor_pago custo_gateway comissao_tkx custos_fixos lucro_liquido_tkx repasse_motorista",
+)
+
+# Configuração por município, lida do banco uma vez e reaproveitada até recarregar_configuracao().
+# Sem município, vale o do processo (banco_tkx.municipio_atual(), TKX_MUNICIPIO).
+_configuracoes = {}
+
+# Valores de Franca, usados para um município novo até ele ter os seus
+CONFIG_PADRAO = {"tarifa_base_fixa": 5.00, "valor_por_km": 2.43, "custo_gateway_percentual": 2.5,
+                 "seguro_app_fixo": 0.60, "manutencao_app_fixo": 0.40}
+
+
+def setup_database(municipio=None, conn=None, **valores):
+    """Garante a configuração do município (o schema é criado pelas migrações).
+
+    Sem configuração gravada, insere CONFIG_PADRAO com os `valores` informados por cima.
+    """
+    municipio = municipio or banco_tkx.municipio_atual()
+    conn = conn or banco_tkx.conectar_municipio(municipio)
     cursor = conn.cursor()
-    
-    # Resetar tabela para garantir schema atualizado
-    cursor.execute("DROP TABLE IF EXISTS configuracoes_estrategicas")
-    
-    cursor.execute('''
-        CREATE TABLE configuracoes_estrategicas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            municipio TEXT,
-            tarifa_base_fixa REAL,
-            valor_por_km REAL,
-            custo_gateway_percentual REAL,
-            seguro_app_fixo REAL,
-            manutencao_app_fixo REAL
-        )
-    ''')
-    
+
     # Verifica se já existem dados, se não, insere o padrão
-    cursor.execute("SELECT count(*) FROM configuracoes_estrategicas WHERE municipio = 'Franca'")
+    cursor.execute("SELECT count(*) FROM configuracoes_estrategicas WHERE municipio = ?", (municipio,))
     if cursor.fetchone()[0] == 0:
-        cursor.execute("INSERT INTO configuracoes_estrategicas (municipio, tarifa_base_fixa, valor_por_km, custo_gateway_percentual, seguro_app_fixo, manutencao_app_fixo) VALUES ('Franca', 5.00, 2.43, 2.5, 0.60, 0.40)")
-        conn.commit()
-        print("Dados de configuração inseridos com sucesso.")
-    
-    conn.close()
+        config = {**CONFIG_PADRAO, **valores}
+        with banco_tkx.transacao(conn):
+            cursor.execute(f"INSERT INTO configuracoes_estrategicas (municipio, {', '.join(config)}) VALUES (?{', ?' * len(config)})",
+                           (municipio, *config.values()))
+        recarregar_configuracao(municipio)
+        print(f"Dados de configuração de {municipio} inseridos com sucesso.")
 
-def calcular_corrida_franca(distancia_km, valor_pago_slider):
-    setup_database() # Garante que o banco existe
 
-    # 1. Conecta ao banco de dados que você criou
-    conn = sqlite3.connect('tkx_franca.db')
-    cursor = conn.cursor()
+def carregar_configuracao(municipio=None, conn=None):
+    """Configuração do município (ConfigMunicipio) ou None. Só consulta o banco na primeira vez."""
+    municipio = municipio or banco_tkx.municipio_atual()
+    config = _configuracoes.get(municipio)
+    if config is None:
+        config = banco_tkx.buscar_configuracao(municipio, conn)
+        if config is not None:
+            _configuracoes[municipio] = config
+    return config
 
-    # 2. Busca as configurações de Franca que salvamos
-    cursor.execute("SELECT tarifa_base_fixa, valor_por_km, custo_gateway_percentual, seguro_app_fixo, manutencao_app_fixo FROM configuracoes_estrategicas WHERE municipio = 'Franca'")
-    config = cursor.fetchone()
-    
-    if config:
-        tarifa_base, valor_km, gateway_perc, seguro, manutencao = config
-
-        # 3. Cálculos do DRE (Regras de Negócio do Alessandro)
-        custo_transacao = valor_pago_slider * (gateway_perc / 100)
-        comissao_bruta_tkx = valor_pago_slider * 0.15 # Seus 15%
-        custos_fixos = seguro + manutencao
-        
-        lucro_liquido_tkx = comissao_bruta_tkx - custo_transacao - custos_fixos
-        repasse_motorista = valor_pago_slider - comissao_bruta_tkx
-
-        # 4. Exibe o resultado no console
-        print(f"--- RELATÓRIO DE CORRIDA (FRANCA) ---")
-        print(f"Distância: {distancia_km}km | Pago pelo Passageiro: R$ {valor_pago_slider:.2f}")
-        print(f"-------------------------------------")
-        print(f"Repasse p/ Motorista: R$ {repasse_motorista:.2f}")
-        print(f"Custo Gateway (2.5%): R$ {custo_transacao:.2f}")
-        print(f"Custos Fixos (Seguro/Manut): R$ {custos_fixos:.2f}")
-        print(f"LUCRO LÍQUIDO TKX: R$ {lucro_liquido_tkx:.2f}")
+
+def recarregar_configuracao(municipio=None):
+    """Descarta a configuração em memória (de um município ou de todos) após alterá-la no banco."""
+    if municipio is None:
+        _configuracoes.clear()
     else:
-        print("Configuração não encontrada para Franca.")
-    
-    conn.close()
+        _configuracoes.pop(municipio, None)
+
+
+def _config_obrigatoria(municipio, config):
+    config = config or carregar_configuracao(municipio)
+    if config is None:
+        raise LookupError(f"Configuração não encontrada para {municipio or banco_tkx.municipio_atual()}.")
+    return config
+
+
+def calcular_dre(distancia_km, valor_pago, municipio=None, config=None):
+    """DRE de uma corrida (Regras de Negócio do Alessandro)."""
+    config = _config_obrigatoria(municipio, config)
+    custo_transacao = valor_pago * (config.custo_gateway_percentual / 100)
+    comissao_bruta_tkx = valor_pago * TAXA_COMISSAO
+    custos_fixos = config.seguro_app_fixo + config.manutencao_app_fixo
+
+    lucro_liquido_tkx = comissao_bruta_tkx - custo_transacao - custos_fixos
+    repasse_motorista = valor_pago - comissao_bruta_tkx
+    return ResultadoDRE(distancia_km, valor_pago, custo_transacao, comissao_bruta_tkx,
+                        custos_fixos, lucro_liquido_tkx, repasse_motorista)
+
+
+def calcular_lote(distancias_km, valores_pagos, municipio=None, config=None):
+    """DRE de várias corridas de uma vez. Com NumPy devolve arrays; sem NumPy, listas."""
+    config = _config_obrigatoria(municipio, config)
+    gateway = config.custo_gateway_percentual / 100
+    fixos = config.seguro_app_fixo + config.manutencao_app_fixo
+
+    if np is None:
+        valores = [float(v) for v in valores_pagos]
+        comissao = [v * TAXA_COMISSAO for v in valores]
+        custo_transacao = [v * gateway for v in valores]
+        return ResultadoDRE(
+            list(distancias_km), valores, custo_transacao, comissao, [fixos] * len(valores),
+            [c - t - fixos for c, t in zip(comissao, custo_transacao)],
+            [v - c for v, c in zip(valores, comissao)],
+        )
+
+    valores = np.asarray(valores_pagos, dtype=np.float64)
+    comissao = valores * TAXA_COMISSAO
+    custo_transacao = valores * gateway
+    return ResultadoDRE(
+        np.asarray(distancias_km, dtype=np.float64),
+        valores,
+        custo_transacao,
+        comissao,
+        np.full_like(valores, fixos),
+        comissao - custo_transacao - fixos,
+        valores - comissao,
+    )
+
+
+def reprecificar_periodo(inicio, fim, municipio=None, config=None, conn=None):
+    """Recalcula o DRE das corridas entre duas datas (AAAA-MM-DD) com a configuração informada.
+
+    Útil para análises "e se": passe um ConfigMunicipio alterado em `config`.
+    """
+    conn = conn or banco_tkx.conectar_municipio(municipio)
+    cursor = conn.execute(f"""
+        SELECT COALESCE(km_distancia, 0), COALESCE(valor_total_pago, 0) FROM {banco_tkx.fonte_corridas(conn, inicio, fim, ("km_distancia", "valor_total_pago", "data_cadastro"))}
+        WHERE data_cadastro >= ? AND data_cadastro < date(?, '+1 day')
+    """, (inicio, fim))
+    linhas = cursor.fetchall()
+    distancias = [l[0] for l in linhas]
+    valores = [l[1] for l in linhas]
+    return calcular_lote(distancias, valores, municipio, config)
+
+
+def calcular_corrida(distancia_km, valor_pago_slider, municipio=None):
+    municipio = municipio or banco_tkx.municipio_atual()
+    try:
+        dre = calcular_dre(distancia_km, valor_pago_slider, municipio)
+    except LookupError:
+        print(f"Configuração não encontrada para {municipio}.")
+        return
+
+    gateway_perc = carregar_configuracao(municipio).custo_gateway_percentual
+
+    # Exibe o resultado no console
+    print(f"--- RELATÓRIO DE CORRIDA ({municipio.upper()}) ---")
+    print(f"Distância: {distancia_km}km | Pago pelo Passageiro: R$ {valor_pago_slider:.2f}")
+    print(f"-------------------------------------")
+    print(f"Repasse p/ Motorista: R$ {dre.repasse_motorista:.2f}")
+    print(f"Custo Gateway ({gateway_perc:g}%): R$ {dre.custo_gateway:.2f}")
+    print(f"Custos Fixos (Seguro/Manut): R$ {dre.custos_fixos:.2f}")
+    print(f"LUCRO LÍQUIDO TKX: R$ {dre.lucro_liquido_tkx:.2f}")
+
+def calcular_corrida_franca(distancia_km, valor_pago_slider):
+    calcular_corrida(distancia_km, valor_pago_slider, 'Franca')
 
 # TESTE: Uma corrida de 5km onde o passageiro pagou R$ 25.00 no Slider
 if __name__ == "__main__":
-    calcular_corrida_franca(5, 25.00)
\ No newline at end of file
+    calcular_corrida(5, 25.00)
@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+# Teste de carga da api_tkx: N conexões keep-alive disparando requisições em sequência
+# durante alguns segundos, com requisições/s e latências (p50/p90/p99/máx) por rota.
+#
+#   python carga_api.py --servidor                      sobe uma API local numa porta livre
+#   python carga_api.py --url http://127.0.0.1:8080 --conexoes 64 --segundos 30
+#   python carga_api.py --servidor --etag               revalida com If-None-Match (304)
+#
+# O cliente é um laço asyncio só: acima de alguns milhares de req/s ele mesmo vira o
+# gargalo, e o relatório mostra isso como CPU do cliente perto de 100%.
+
+ROTAS_PADRAO = [
+    "/cotacao?km=7.5&hora=18:30",
+    "/dre",
+    "/dre?mes=2026-01",
+    "/turnos",
+    "/motoristas/1/extrato",
+]
+CORPO_LOTE = json.dumps({"corridas": [{"km": 2.0 + (i % 40) * 0.5, "hora": f"{i % 24:02d}:{(i * 7) % 60:02d}"}
+                                      for i in range(100)]}).encode()
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+async def _requisitar(leitor, escritor, host, metodo, rota, corpo, etag):
+    cabecalhos = [f"{metodo} {rota} HTTP/1.1", f"Host: {host}"]
+    if etag:
+        cabecalhos.append(f"If-None-Match: {etag}")
+    if corpo:
+        cabecalhos += ["Content-Type: application/json", f"Content-Length: {len(corpo)}"]
+    escritor.write(("\r\n".join(cabecalhos) + "\r\n\r\n").encode() + (corpo or b""))
+    await escritor.drain()
+
+    status = int((await leitor.readline()).split()[1])
+    tamanho, novo_etag, fechar = 0, None, False
+    while True:
+        linha = await leitor.readline()
+        if linha in (b"\r\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        nome, valor = nome.strip().lower(), valor.strip()
+        if nome == "content-length":
+            tamanho = int(valor)
+        elif nome == "etag":
+            novo_etag = valor
+        elif nome == "connection":
+            fechar = valor.lower() == "close"
+    if tamanho:
+        await leitor.readexactly(tamanho)
+    return status, novo_etag, fechar
+
+
+async def _cliente(host, porta, rotas, deslocamento, ate, usar_etag, latencias, status):
+    etags = {}
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    i = deslocamento
+    try:
+        while time.perf_counter() < ate:
+            metodo, rota, corpo = rotas[i % len(rotas)]
+            i += 1
+            inicio = time.perf_counter()
+            codigo, etag, fechar = await _requisitar(leitor, escritor, host, metodo, rota, corpo,
+                                                     etags.get(rota) if usar_etag else None)
+            latencias.setdefault(rota, []).append((time.perf_counter() - inicio) * 1000)
+            status[codigo] += 1
+            if etag:
+                etags[rota] = etag
+            if fechar:
+                escritor.close()
+                leitor, escritor = await asyncio.open_connection(host, porta)
+    finally:
+        escritor.close()
+
+
+async def executar_carga(url, rotas=ROTAS_PADRAO, conexoes=32, segundos=10.0, usar_etag=False, lote=False):
+    """Dispara a carga e devolve o resumo (dict) com req/s e latências em ms por rota."""
+    partes = urlsplit(url)
+    host, porta = partes.hostname, partes.port or 80
+    lista = [("GET", rota, None) for rota in rotas] + ([("POST", "/cotacoes", CORPO_LOTE)] if lote else [])
+    latencias, status = {}, Counter()
+    cpu_inicio, inicio = time.process_time(), time.perf_counter()
+    ate = inicio + segundos
+    await asyncio.gather(*(_cliente(host, porta, lista, i, ate, usar_etag, latencias, status) for i in range(conexoes)))
+    duracao = time.perf_counter() - inicio
+
+    def resumo(valores):
+        ordenados = sorted(valores)
+        return {"requisicoes": len(ordenados), "req_s": len(ordenados) / duracao,
+                "p50_ms": _percentil(ordenados, 50), "p90_ms": _percentil(ordenados, 90),
+                "p99_ms": _percentil(ordenados, 99), "max_ms": ordenados[-1] if ordenados else 0.0}
+
+    return {
+        "url": url, "conexoes": conexoes, "segundos": duracao, "etag": usar_etag,
+        "cpu_cliente": (time.process_time() - cpu_inicio) / duracao,
+        "status": dict(status),
+        "total": resumo([v for valores in latencias.values() for v in valores]),
+        "rotas": {rota: resumo(valores) for rota, valores in latencias.items()},
+    }
+
+
+def exibir_resumo(resultado):
+    print(f"\n{resultado['url']} | {resultado['conexoes']} conexões | {resultado['segundos']:.1f}s"
+          f" | ETag: {'sim' if resultado['etag'] else 'não'} | CPU do cliente: {resultado['cpu_cliente']:.0%}")
+    print(f"Status: {', '.join(f'{s}: {n:,}' for s, n in sorted(resultado['status'].items()))}")
+    print(f"\n{'ROTA':<32}{'REQ':>9}{'REQ/S':>10}{'P50':>9}{'P90':>9}{'P99':>9}{'MÁX':>9}  (ms)")
+    for rota, r in list(resultado["rotas"].items()) + [("TOTAL", resultado["total"])]:
+        print(f"{rota[:31]:<32}{r['requisicoes']:>9,}{r['req_s']:>10,.0f}{r['p50_ms']:>9.2f}{r['p90_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}")
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _subir_servidor(threads):
+    """Sobe api_tkx.py num subprocesso (mesmo banco: TKX_DB_PATH/TKX_MUNICIPIO herdados)."""
+    porta = _porta_livre()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_tkx.py")
+    processo = subprocess.Popen([sys.executable, script, "--porta", str(porta), "--threads", str(threads)],
+                                stdout=subprocess.DEVNULL)
+    limite = time.monotonic() + 30  # a primeira abertura pode rodar migrações
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"a API saiu com código {processo.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", porta), timeout=0.2):
+                return processo, f"http://127.0.0.1:{porta}"
+        except OSError:
+            time.sleep(0.1)
+    processo.kill()
+    raise RuntimeError("a API não respondeu em 30s")
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Teste de carga da API TKX.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--servidor", action="store_true", help="sobe uma API local para o teste")
+    parser.add_argument("--threads", type=int, default=4, help="threads da API subida com --servidor")
+    parser.add_argument("--conexoes", type=int, default=32)
+    parser.add_argument("--segundos", type=float, default=10.0)
+    parser.add_argument("--etag", action="store_true", help="revalida com If-None-Match")
+    parser.add_argument("--lote", action="store_true", help="inclui POST /cotacoes com 100 corridas")
+    parser.add_argument("--rotas", nargs="*", default=ROTAS_PADRAO)
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    processo = None
+    url = args.url
+    if args.servidor:
+        processo, url = _subir_servidor(args.threads)
+    try:
+        resultado = asyncio.run(executar_carga(url, args.rotas, args.conexoes, args.segundos, args.etag, args.lote))
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+    exibir_resumo(resultado)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
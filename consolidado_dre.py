@@ -0,0 +1,115 @@
+import sys
+from collections import namedtuple
+
+import banco_tkx
+import cache_consultas
+from migracoes import (CONSOLIDADOS_DRE, JANELAS_METRICAS, SQL_CORTE_JANELAS, TABELAS_PLACARES,
+                       sql_recalculo_consolidado, sql_recalculo_esbocos, sql_recalculo_janelas,
+                       sql_recalculo_placares, sql_recalculo_totais_clientes)
+
+# Leitura dos consolidados do DRE (dre_diario, dre_mensal, dre_turno, dre_motorista).
+# Os gatilhos da migração 3 mantêm as tabelas em dia a cada corrida inserida, alterada
+# ou apagada; aqui ficam a reconstrução (backfill) e as consultas por período.
+# A reconstrução refaz também os placares top-K da migração 9 (lidos em rankings_bi) e os
+# esboços de preços da migração 12 (lidos em distribuicao_precos); as janelas móveis e os
+# totais dos clientes da migração 13 (lidos em janelas_metricas) se refazem sempre inteiros.
+
+class TotaisDRE(namedtuple("TotaisDRE", "corridas bruto comissao gateway fixos")):
+    @property
+    def lucro_liquido(self):
+        return self.comissao - self.gateway - self.fixos
+
+
+_SOMAS = "COALESCE(SUM(corridas), 0), COALESCE(SUM(bruto), 0), COALESCE(SUM(comissao), 0), COALESCE(SUM(gateway), 0), COALESCE(SUM(fixos), 0)"
+
+
+def reconstruir_consolidados(mes=None, conn=None):
+    """Recalcula consolidados, placares, esboços de preços e janelas móveis a partir do histórico.
+
+    Com mes='AAAA-MM', só aquele mês (as janelas e os totais dos clientes, sempre inteiros).
+    """
+    conn = conn or banco_tkx.conectar()
+    fonte = banco_tkx.fonte_corridas(conn, mes, mes)  # com as partições dos meses fechados
+    # As janelas só precisam dos últimos DIAS_ANEL dias até hoje; a corrida mais recente está no histórico vivo
+    corte = conn.execute(SQL_CORTE_JANELAS).fetchone()[0]
+    fonte_janelas = banco_tkx.fonte_corridas(conn, corte)
+    fonte_clientes = fonte if mes is None else banco_tkx.fonte_corridas(conn)
+    with banco_tkx.transacao(conn):
+        for tabela, chaves, expressoes in CONSOLIDADOS_DRE:
+            if mes is None:
+                conn.execute(f"DELETE FROM {tabela}")
+                conn.execute(sql_recalculo_consolidado(tabela, chaves, expressoes, fonte=fonte))
+            else:
+                coluna_tempo = "dia" if "dia" in chaves else "mes"
+                conn.execute(f"DELETE FROM {tabela} WHERE substr({coluna_tempo}, 1, 7) = ?", (mes,))
+                filtro = "WHERE strftime('%Y-%m', data_cadastro) = ?"
+                conn.execute(sql_recalculo_consolidado(tabela, chaves, expressoes, filtro, fonte), (mes,))
+        for tabela in TABELAS_PLACARES:
+            conn.execute(f"DELETE FROM {tabela}" + (" WHERE mes = ?" if mes else ""), (mes,) if mes else ())
+        filtro, params = ("AND strftime('%Y-%m', data_cadastro) = ?", (mes,)) if mes else ("", ())
+        for sql in sql_recalculo_placares(filtro, fonte):
+            conn.execute(sql, params)
+        conn.execute("DELETE FROM esboco_precos" + (" WHERE mes = ?" if mes else ""), params)
+        for sql in sql_recalculo_esbocos(filtro, fonte):
+            conn.execute(sql, params)
+        for tabela, _ in JANELAS_METRICAS:
+            conn.execute(f"DELETE FROM {tabela}")
+        for sql in sql_recalculo_janelas(fonte_janelas):
+            conn.execute(sql, {"corte": corte or "0000-00-00"})
+        for sql in sql_recalculo_totais_clientes(fonte_clientes):
+            conn.execute(sql)
+        # Os consolidados mudaram sem passar pelos gatilhos (ex.: carga rápida do popular_bi):
+        # o contador do histórico invalida os resultados em cache
+        conn.execute("UPDATE versoes_tabelas SET versao = versao + 1 WHERE tabela = 'historico_corridas'")
+
+
+@cache_consultas.em_cache("historico_corridas")
+def totais_periodo(inicio=None, fim=None, conn=None):
+    """Totais entre duas datas AAAA-MM-DD (inclusivas). Sem datas, o histórico inteiro."""
+    conn = conn or banco_tkx.conectar()
+    if inicio is None and fim is None:
+        linha = conn.execute(f"SELECT {_SOMAS} FROM dre_mensal").fetchone()
+    else:
+        linha = conn.execute(
+            f"SELECT {_SOMAS} FROM dre_diario WHERE dia BETWEEN ? AND ?",
+            (inicio or "0000-00-01", fim or "9999-12-31"),
+        ).fetchone()
+    return TotaisDRE._make(linha)
+
+
+@cache_consultas.em_cache("historico_corridas")
+def totais_mes(mes, conn=None):
+    """Totais de um mês AAAA-MM."""
+    conn = conn or banco_tkx.conectar()
+    return TotaisDRE._make(conn.execute(f"SELECT {_SOMAS} FROM dre_mensal WHERE mes = ?", (mes,)).fetchone())
+
+
+@cache_consultas.em_cache("historico_corridas", "turnos")
+def totais_por_turno(mes=None, conn=None):
+    """[(Turno, TotaisDRE)] dos turnos configurados, de um mês ou de todo o histórico.
+
+    Corridas sem horário ou fora dos turnos ficam de fora, como no bi_operacional.ranking_turnos.
+    """
+    conn = conn or banco_tkx.conectar()
+    filtro, params = ("WHERE mes = ?", (mes,)) if mes else ("", ())
+    cursor = conn.execute(f"SELECT turno_id, {_SOMAS} FROM dre_turno {filtro} GROUP BY turno_id", params)
+    totais = {linha[0]: TotaisDRE._make(linha[1:]) for linha in cursor}
+    return [(turno, totais.get(turno.id, TotaisDRE(0, 0, 0, 0, 0))) for turno in banco_tkx.listar_turnos(conn)]
+
+
+@cache_consultas.em_cache("historico_corridas")
+def totais_por_motorista(mes=None, conn=None):
+    """{motorista_id: TotaisDRE} de um mês ou de todo o histórico."""
+    conn = conn or banco_tkx.conectar()
+    filtro, params = ("WHERE mes = ?", (mes,)) if mes else ("", ())
+    cursor = conn.execute(f"SELECT motorista_id, {_SOMAS} FROM dre_motorista {filtro} GROUP BY motorista_id", params)
+    return {linha[0]: TotaisDRE._make(linha[1:]) for linha in cursor}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--reconstruir":
+        mes = sys.argv[2] if len(sys.argv) > 2 else None
+        reconstruir_consolidados(mes)
+        print(f"✅ Consolidados do DRE reconstruídos ({mes or 'histórico completo'}).")
+    else:
+        print("Uso: python consolidado_dre.py --reconstruir [AAAA-MM]")
@@ -1,33 +1,42 @@
-import sqlite3
+import banco_tkx
+import busca_cadastros
+
+def dados_cadastros(conn=None, limite=busca_cadastros.LIMITE):
+    """Totais e a primeira página (por nome) de motoristas e clientes, sem imprimir nada."""
+    conn = conn or banco_tkx.conectar()
+    return {
+        "totais": busca_cadastros.contagens(conn),
+        "motoristas": busca_cadastros.buscar(tipo="motorista", limite=limite, conn=conn).cadastros,
+        "clientes": busca_cadastros.buscar(tipo="cliente", limite=limite, conn=conn).cadastros,
+    }
 
 def conferir_cadastros():
-    conn = sqlite3.connect('tkx_franca.db')
-    cursor = conn.cursor()
+    dados = dados_cadastros()
+    totais = dados["totais"]
 
     print("\n" + "="*40)
     print("      RELATÓRIO DE CADASTRADOS TKX")
     print("="*40)
 
     # Consulta Motoristas
-    print("\n>>> MOTORISTAS:")
-    cursor.execute("SELECT id, nome, placa, status FROM motoristas_cadastro")
-    motoristas = cursor.fetchall()
+    por_status = " | ".join(f"{status}: {n:,}" for status, n in sorted(totais["motoristas"].items()))
+    print(f"\n>>> MOTORISTAS ({sum(totais['motoristas'].values()):,} — {por_status or 'nenhum'}):")
+    motoristas = dados["motoristas"]
     if not motoristas:
         print("Nenhum motorista encontrado.")
     for m in motoristas:
-        print(f"ID: {m[0]} | Nome: {m[1]} | Placa: {m[2]} | Status: {m[3]}")
+        print(f"ID: {m.id} | Nome: {m.nome} | Placa: {m.documento} | Status: {m.status}")
 
     # Consulta Clientes
-    print("\n>>> CLIENTES:")
-    cursor.execute("SELECT id, nome, telefone FROM clientes")
-    clientes = cursor.fetchall()
+    print(f"\n>>> CLIENTES ({totais['clientes']:,}):")
+    clientes = dados["clientes"]
     if not clientes:
         print("Nenhum cliente encontrado.")
     for c in clientes:
-        print(f"ID: {c[0]} | Nome: {c[1]} | Tel: {c[2]}")
+        print(f"ID: {c.id} | Nome: {c.nome} | Tel: {c.telefone}")
     
-    print("\n" + "="*40)
-    conn.close()
+    print(f"\n(primeiros {busca_cadastros.LIMITE} por nome; busca e demais páginas: python busca_cadastros.py)")
+    print("="*40)
 
 if __name__ == "__main__":
-    conferir_cadastros()
\ No newline at end of file
+    conferir_cadastros()
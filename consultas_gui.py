@@ -0,0 +1,36 @@
+import banco_tkx
+import bi_estrategico
+import bi_operacional
+import busca_cadastros
+import cache_consultas
+import consolidado_dre
+import distribuicao_precos
+import rankings_bi
+
+# Consultas das abas do AppTKX, separadas da interface para poderem rodar
+# sem customtkinter (benchmarks, testes manuais, threads de fundo).
+
+LIMITE_CADASTROS = 30  # linhas por página na aba de cadastros
+
+def consultar_financeiro(conn=None):
+    """(faturamento bruto, comissão TKX) do histórico inteiro."""
+    totais = consolidado_dre.totais_periodo(conn=conn)
+    return totais.bruto, totais.comissao
+
+def consultar_operacional(conn=None):
+    """[(Turno, [(nome, corridas), ...]), ...]: top 10 de cada turno configurado, numa consulta só."""
+    return [(turno, [(nome, qtd) for nome, qtd, _ in ranking])
+            for turno, ranking in bi_operacional.ranking_turnos(10, "corridas", conn)]
+
+@cache_consultas.em_cache("historico_corridas", "turnos")
+def consultar_estrategico(conn=None):
+    """((média paga, média concorrente), top 5 corridas por lucro TKX, distribuicao_precos.dados_distribuicao)."""
+    conn = conn or banco_tkx.conectar()
+    cursor = conn.cursor()
+    cursor.execute(bi_estrategico.SQL_MERCADO.format(partes=banco_tkx.sql_por_particao(bi_estrategico.SQL_MERCADO_PARTE, conn)))
+    precos = cursor.fetchone()
+    return precos, rankings_bi.top_corridas_lucro(5, conn=conn), distribuicao_precos.dados_distribuicao(conn=conn)
+
+def consultar_cadastros(texto=None, tipo=None, status=None, apos=None, conn=None):
+    """Página da aba de cadastros: busca (ou listagem) por nome, a partir do cursor `apos`."""
+    return busca_cadastros.buscar(texto, tipo, status, apos, LIMITE_CADASTROS, conn)
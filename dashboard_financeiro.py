@@ -1,41 +1,32 @@
-import sqlite3
+import consolidado_dre
 
-def exibir_resumo_mensal():
+def exibir_resumo_mensal(mes=None):
+    """Resumo do DRE de um mês (AAAA-MM) ou, sem mês, de todo o histórico."""
     try:
-        conn = sqlite3.connect('tkx_franca.db')
-        cursor = conn.cursor()
-
-        # Sua Query original (está perfeita!)
-        query = """
-        SELECT 
-            COUNT(id) as total_viagens,
-            SUM(valor_total_pago) as faturamento_bruto,
-            SUM(taxa_app_valor) as comissao_tkx,
-            SUM(custo_gateway) as gateway,
-            SUM(custos_fixos_totais) as operacao
-        FROM historico_corridas;
-        """
-        
-        cursor.execute(query)
-        dados = cursor.fetchone()
+        # Lê os consolidados mantidos pelos gatilhos (custa o nº de meses, não o nº de corridas)
+        if mes:
+            dados = consolidado_dre.totais_mes(mes)
+        else:
+            dados = consolidado_dre.totais_periodo()
         
         print("\n================================")
         print("      SISTEMA DE GESTÃO TKX     ")
         print("================================")
+        print(f"Período: {mes or 'Histórico completo'}")
 
-        # O segredo está aqui: se o banco retornar vazio, usamos 0 ou 0.0
-        total = dados[0] if dados[0] else 0
-        bruto = dados[1] if dados[1] else 0.0
-        comissao = dados[2] if dados[2] else 0.0
-        gate = dados[3] if dados[3] else 0.0
-        oper = dados[4] if dados[4] else 0.0
+        # Os consolidados já devolvem 0 quando não há corridas no período
+        total = dados.corridas
+        bruto = dados.bruto
+        comissao = dados.comissao
+        gate = dados.gateway
+        oper = dados.fixos
 
         if total == 0:
             print("Status: Banco conectado.")
             print("Aviso: Nenhuma corrida registrada ainda no sistema.")
         else:
             # Cálculo do Lucro Líquido Real (Sua lógica de DRE)
-            lucro_liquido = comissao - gate - oper
+            lucro_liquido = dados.lucro_liquido
             
             print(f"Total de Corridas: {total}")
             print(f"Faturamento Bruto: R$ {bruto:.2f}")
@@ -45,11 +36,17 @@ def exibir_resumo_mensal():
             print(f"(-) Custos Fixos:  R$ {oper:.2f}")
             print(f"--------------------------------")
             print(f"LUCRO LÍQUIDO REAL: R$ {lucro_liquido:.2f}")
+            print(f"--------------------------------")
+            for turno, totais in consolidado_dre.totais_por_turno(mes):
+                print(f"{turno.nome[:12]:<12} ({turno.hora_inicio}-{turno.hora_fim}): {totais.corridas} corridas | Lucro: R$ {totais.lucro_liquido:.2f}")
         
         print("================================\n")
-        conn.close()
     except Exception as e:
         print(f"Erro ao acessar o banco: {e}")
 
+def main():
+    mes = input("Mês (AAAA-MM) ou Enter para todo o histórico: ").strip()
+    exibir_resumo_mensal(mes or None)
+
 if __name__ == "__main__":
-    exibir_resumo_mensal()
\ No newline at end of file
+    main()
@@ -0,0 +1,219 @@
+import argparse
+import sys
+from collections import Counter
+
+import banco_tkx
+import cache_consultas
+from migracoes import ALFA_ESBOCO, ESCALAS_ESBOCO, FAIXAS_KM, GAMA_ESBOCO, METRICAS_ESBOCO
+
+# Distribuição da tarifa, do preço do concorrente e da razão entre eles, lida dos esboços
+# que os gatilhos mantêm por (mês, turno, faixa de km) desde a migração 19.
+#
+#   esboço     {balde: corridas}; o balde i representa os valores em (GAMA^(i-1), GAMA^i]
+#   recorte    soma dos esboços de um período em meses, de turnos e de faixas de km
+#   quantil    percorre os baldes em ordem: erro relativo de no máximo ALFA_ESBOCO (1%), ou
+#              seja, cerca de 1 ponto na diferença para o concorrente
+#
+# Juntar recortes (ou municípios, ver municipios_tkx) é somar contagens: nenhum percentil
+# relê corridas. Cada mês ocupa no máximo turnos x 6 faixas x baldes ocupados linhas por
+# métrica (perto de mil na prática), então o custo cresce com os meses pedidos, não com as
+# corridas: com 15 mil corridas por mês são umas 850 linhas por mês para as três métricas.
+#
+#   python distribuicao_precos.py --inicio 2026-07 --fim 2026-09
+#   python distribuicao_precos.py --turno NOTURNO --faixa 2 --metrica tarifa --histograma
+
+QUANTIS = (0.1, 0.5, 0.9)
+METRICAS = {nome: codigo for codigo, nome, _ in METRICAS_ESBOCO}
+ROTULOS_FAIXAS = ([f"até {FAIXAS_KM[0]} km"]
+                  + [f"{a}-{b} km" for a, b in zip(FAIXAS_KM, FAIXAS_KM[1:])]
+                  + [f"{FAIXAS_KM[-1]}+ km"])
+
+SQL_CONTAGENS = """
+    SELECT metrica, turno_id, faixa_km, balde, SUM(n)
+    FROM esboco_precos WHERE mes BETWEEN ? AND ?
+    GROUP BY metrica, turno_id, faixa_km, balde HAVING SUM(n) > 0
+"""
+
+
+def gama(metrica):
+    """GAMA dos baldes da métrica."""
+    return ESCALAS_ESBOCO[METRICAS[metrica]][1]
+
+
+def valor_balde(balde, gama=GAMA_ESBOCO):
+    """Valor que representa o balde: erro relativo de no máximo ALFA da escala para todo o balde."""
+    return 2 * gama ** balde / (gama + 1)
+
+
+def combinar(esbocos):
+    """Soma de vários esboços {balde: n} (recortes, períodos ou municípios)."""
+    total = Counter()
+    for esboco in esbocos:
+        total.update(esboco)
+    return dict(total)
+
+
+def quantil(esboco, q, gama=GAMA_ESBOCO):
+    """Valor no quantil q (0 a 1) do esboço; None se vazio."""
+    total = sum(esboco.values())
+    if total <= 0:
+        return None
+    posicao = q * (total - 1)
+    acumulado = 0
+    for balde in sorted(esboco):
+        acumulado += esboco[balde]
+        if acumulado > posicao:
+            return valor_balde(balde, gama)
+    return valor_balde(max(esboco), gama)
+
+
+def resumo(esboco, quantis=QUANTIS, gama=GAMA_ESBOCO):
+    """{'n': corridas, 'p10': ..., 'p50': ..., 'p90': ...} (percentis None sem corridas)."""
+    dados = {"n": sum(esboco.values())}
+    for q in quantis:
+        dados[f"p{round(q * 100)}"] = quantil(esboco, q, gama)
+    return dados
+
+
+def diferenca_percentual(razao):
+    """Razão tarifa/concorrente -> % acima (+) ou abaixo (-) do concorrente."""
+    return None if razao is None else (razao - 1) * 100
+
+
+def resumo_diferenca(esboco_razao, quantis=QUANTIS):
+    """Como resumo(), mas dos percentis da diferença (%) para o concorrente."""
+    return {chave: (valor if chave == "n" else diferenca_percentual(valor))
+            for chave, valor in resumo(esboco_razao, quantis, gama("razao")).items()}
+
+
+def histograma(esboco, barras=10, gama=GAMA_ESBOCO):
+    """[(de, até, corridas)]: os baldes agrupados em até `barras` faixas de mesma largura em log."""
+    if not esboco:
+        return []
+    menor, maior = min(esboco), max(esboco)
+    largura = -(-(maior - menor + 1) // barras)
+    grupos = Counter()
+    for balde, n in esboco.items():
+        grupos[(balde - menor) // largura] += n
+    return [(gama ** (menor + g * largura - 1), gama ** (menor + (g + 1) * largura - 1), grupos[g])
+            for g in range(max(grupos) + 1)]
+
+
+@cache_consultas.em_cache("historico_corridas")
+def contagens(inicio=None, fim=None, conn=None):
+    """{(métrica, turno_id, faixa_km): {balde: n}} somados entre dois meses AAAA-MM (inclusivos)."""
+    conn = conn or banco_tkx.conectar()
+    esbocos = {}
+    for metrica, turno_id, faixa, balde, n in conn.execute(SQL_CONTAGENS, (inicio or "0000-00", fim or "9999-12")):
+        esbocos.setdefault((metrica, turno_id, faixa), {})[balde] = n
+    return esbocos
+
+
+def recorte(esbocos, metrica="razao", turnos=None, faixas=None):
+    """Esboço de uma métrica nos turnos (ids) e faixas pedidos (None: todos) a partir de contagens()."""
+    codigo = METRICAS[metrica]
+    return combinar(e for (m, t, f), e in esbocos.items()
+                    if m == codigo and (turnos is None or t in turnos) and (faixas is None or f in faixas))
+
+
+def buscar_turno(nome, conn=None):
+    """Turno configurado com esse nome (sem diferenciar maiúsculas); None se não houver."""
+    return next((t for t in banco_tkx.listar_turnos(conn) if t.nome.upper() == nome.upper()), None)
+
+
+@cache_consultas.em_cache("historico_corridas", "turnos")
+def dados_distribuicao(inicio=None, fim=None, conn=None):
+    """Percentis de cada métrica e da diferença para o concorrente, no total, por turno e por faixa de km."""
+    conn = conn or banco_tkx.conectar()
+    esbocos = contagens(inicio, fim, conn=conn)
+    razao = recorte(esbocos)
+    return {
+        "metricas": {nome: resumo(recorte(esbocos, nome), gama=gama(nome)) for nome in METRICAS},
+        "diferenca": resumo_diferenca(razao),
+        "turnos": [(turno, resumo_diferenca(recorte(esbocos, turnos={turno.id})))
+                   for turno in banco_tkx.listar_turnos(conn)],
+        "faixas": [(rotulo, resumo_diferenca(recorte(esbocos, faixas={i})))
+                   for i, rotulo in enumerate(ROTULOS_FAIXAS)],
+        "histograma_diferenca": [(diferenca_percentual(de), diferenca_percentual(ate), n)
+                                 for de, ate, n in histograma(razao, gama=gama("razao"))],
+    }
+
+
+def _percentis(dados, formato):
+    if not dados["n"]:
+        return "sem corridas"
+    valores = " | ".join(f"{chave.upper()} {formato(valor)}" for chave, valor in dados.items() if chave != "n")
+    return f"{valores} ({dados['n']:,} corridas)"
+
+
+def _barras(faixas, formato, largura=40):
+    maior = max((n for _, _, n in faixas), default=0) or 1
+    for de, ate, n in faixas:
+        print(f"{formato(de):>9} a {formato(ate):>9} | {'█' * round(n * largura / maior):<{largura}} {n:,}")
+
+
+def _porcentagem(valor):
+    return f"{valor:+.1f}%"
+
+
+def _reais(valor):
+    return f"R$ {valor:.2f}"
+
+
+def exibir_distribuicao(dados):
+    print("\n" + "=" * 60)
+    print("      DISTRIBUIÇÃO DE PREÇOS VS CONCORRÊNCIA")
+    print("=" * 60)
+    print(f"Tarifa TKX:     {_percentis(dados['metricas']['tarifa'], _reais)}")
+    print(f"Concorrente:    {_percentis(dados['metricas']['concorrente'], _reais)}")
+    print(f"Diferença:      {_percentis(dados['diferenca'], _porcentagem)}")
+    print(f"(percentis com erro relativo de até {ALFA_ESBOCO:.0%}: cerca de {ALFA_ESBOCO * 100:.0f} ponto na diferença)")
+
+    print("\n🕒 DIFERENÇA POR TURNO:")
+    for turno, resumo_turno in dados["turnos"]:
+        print(f"{turno.nome[:12]:<12} ({turno.hora_inicio}-{turno.hora_fim}) | {_percentis(resumo_turno, _porcentagem)}")
+    print("\n📏 DIFERENÇA POR DISTÂNCIA:")
+    for rotulo, resumo_faixa in dados["faixas"]:
+        print(f"{rotulo:<20} | {_percentis(resumo_faixa, _porcentagem)}")
+
+    if dados["histograma_diferenca"]:
+        print("\n📊 HISTOGRAMA DA DIFERENÇA:")
+        _barras(dados["histograma_diferenca"], _porcentagem)
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Percentis e histogramas de preço vs concorrência.")
+    parser.add_argument("--inicio", help="primeiro mês (AAAA-MM)")
+    parser.add_argument("--fim", help="último mês (AAAA-MM)")
+    parser.add_argument("--turno", help="só este turno (nome)")
+    parser.add_argument("--faixa", type=int, choices=range(len(ROTULOS_FAIXAS)),
+                        help="só esta faixa de km: " + ", ".join(f"{i}={r}" for i, r in enumerate(ROTULOS_FAIXAS)))
+    parser.add_argument("--metrica", choices=list(METRICAS), default="razao")
+    parser.add_argument("--histograma", action="store_true", help="mostra o histograma do recorte")
+    args = parser.parse_args(argv)
+
+    if args.turno is None and args.faixa is None and args.metrica == "razao" and not args.histograma:
+        exibir_distribuicao(dados_distribuicao(args.inicio, args.fim))
+        return
+
+    turnos = None
+    if args.turno:
+        turno = buscar_turno(args.turno)
+        if turno is None:
+            parser.error(f"turno {args.turno!r} não configurado")
+        turnos = {turno.id}
+    faixas = None if args.faixa is None else {args.faixa}
+    esboco = recorte(contagens(args.inicio, args.fim), args.metrica, turnos, faixas)
+    if args.metrica == "razao":
+        print(f"Diferença vs concorrente: {_percentis(resumo_diferenca(esboco), _porcentagem)}")
+        if args.histograma:
+            _barras([(diferenca_percentual(de), diferenca_percentual(ate), n)
+                     for de, ate, n in histograma(esboco, gama=gama("razao"))], _porcentagem)
+    else:
+        print(f"{args.metrica.capitalize()}: {_percentis(resumo(esboco, gama=gama(args.metrica)), _reais)}")
+        if args.histograma:
+            _barras(histograma(esboco, gama=gama(args.metrica)), _reais)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,106 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import banco_tkx
+import rastreamento_sql
+
+# Execução das consultas da GUI fora da thread do Tk.
+# As threads de trabalho nunca tocam nos widgets: o resultado vai para uma fila que a
+# própria interface esvazia com after(), como o Tkinter exige.
+
+INTERVALO_DRENAGEM_MS = 50
+
+
+class ExecutorConsultas:
+    """Pool de threads para as consultas das abas, com uma requisição viva por chave.
+
+    Uma nova submissão para a mesma chave (ex.: a mesma aba) substitui a anterior: se ela
+    ainda não começou é cancelada, se já está rodando o SQLite é interrompido, e qualquer
+    resultado atrasado é descartado.
+    """
+
+    def __init__(self, widget, max_threads=2, intervalo_ms=INTERVALO_DRENAGEM_MS):
+        self.widget = widget
+        self.intervalo_ms = intervalo_ms
+        self._pool = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="tkx-consulta")
+        self._resultados = queue.Queue()
+        self._trava = threading.Lock()
+        self._geracao = {}      # chave -> geração da requisição mais recente
+        self._futuros = {}      # chave -> Future ainda não concluído
+        self._em_execucao = {}  # chave -> (geração, conexão) enquanto o SQL roda
+        self._ativo = True
+        self.widget.after(self.intervalo_ms, self._drenar)
+
+    def submeter(self, chave, consulta, ao_concluir, ao_falhar=None):
+        """Roda `consulta()` numa thread e chama `ao_concluir(resultado)` na thread do Tk."""
+        with self._trava:
+            geracao = self._geracao.get(chave, 0) + 1
+            self._geracao[chave] = geracao
+            anterior = self._futuros.pop(chave, None)
+            if anterior is not None:
+                anterior.cancel()
+            rodando = self._em_execucao.get(chave)
+            if rodando is not None:
+                rodando[1].interrupt()
+            origem = rastreamento_sql.origem_atual()  # ex.: AppTKX.atualizar_operacional
+            self._futuros[chave] = self._pool.submit(self._rodar, chave, geracao, consulta, ao_concluir, ao_falhar, origem)
+        return geracao
+
+    def pendente(self, chave):
+        with self._trava:
+            return chave in self._futuros
+
+    def _rodar(self, chave, geracao, consulta, ao_concluir, ao_falhar, origem=None):
+        with self._trava:
+            if self._geracao.get(chave) != geracao:
+                return
+            self._em_execucao[chave] = (geracao, banco_tkx.conectar())
+        try:
+            with rastreamento_sql.origem(origem):
+                resultado, erro = consulta(), None
+        except Exception as e:  # inclui o "interrupted" de uma requisição substituída
+            resultado, erro = None, e
+        finally:
+            with self._trava:
+                if self._em_execucao.get(chave, (None,))[0] == geracao:
+                    del self._em_execucao[chave]
+        self._resultados.put((chave, geracao, resultado, erro, ao_concluir, ao_falhar))
+
+    def _drenar(self):
+        while True:
+            try:
+                chave, geracao, resultado, erro, ao_concluir, ao_falhar = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            with self._trava:
+                if self._geracao.get(chave) != geracao:
+                    continue  # substituída por uma requisição mais nova
+                self._futuros.pop(chave, None)
+            if erro is None:
+                ao_concluir(resultado)
+            elif ao_falhar is not None:
+                ao_falhar(erro)
+        if self._ativo:
+            self.widget.after(self.intervalo_ms, self._drenar)
+
+    def encerrar(self):
+        self._ativo = False
+        with self._trava:
+            for _, conn in self._em_execucao.values():
+                conn.interrupt()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class MonitorAlteracoes:
+    """Detecta commits feitos por outras conexões/processos com PRAGMA data_version."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho
+        self._versao = None
+
+    def mudou(self):
+        """True se o banco mudou desde a última chamada (a primeira chamada só registra)."""
+        versao = banco_tkx.conectar(self.caminho).execute("PRAGMA data_version").fetchone()[0]
+        anterior, self._versao = self._versao, versao
+        return anterior is not None and versao != anterior
@@ -1,56 +1,218 @@
-import sqlite3
+import argparse
+import os
+import string
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-def gerar_recibo_detalhado():
-    conn = sqlite3.connect('tkx_franca.db')
-    cursor = conn.cursor()
+import banco_tkx
+import calculadora_tkx
 
-    print("\n--- EMISSÃO DE RECIBO TKX ---")
-    m_id = input("ID do Motorista: ")
-    partida = input("Local de Partida: ")
-    h_partida = input("Horário de Partida (HH:MM): ")
-    chegada = input("Local de Chegada: ")
-    h_chegada = input("Horário de Chegada (HH:MM): ")
-    km = input("KM Percorrido: ")
-    tempo = input("Tempo Total (ex: 15 min): ")
-    valor = float(input("Valor Total (R$): "))
-
-    # Busca dados do motorista
-    cursor.execute("SELECT nome, veiculo_modelo, placa FROM motoristas_cadastro WHERE id = ?", (m_id,))
-    motorista = cursor.fetchone()
-    nome_m, carro, placa = motorista if motorista else ("Motorista TKX", "Veículo", "---")
-
-    data_atual = datetime.now().strftime('%d/%m/%Y')
-
-    recibo_texto = f"""
+# Modelo compilado uma vez; cada recibo é só um substitute() com os campos já formatados
+TEMPLATE_RECIBO = string.Template("""
 ========================================
          RECIBO DE VIAGEM - TKX
 ========================================
-DATA: {data_atual}
+DATA: $data
+RECIBO Nº: $numero
 ----------------------------------------
-PARTIDA: {h_partida} - {partida}
-CHEGADA: {h_chegada} - {chegada}
+PARTIDA: $h_partida - $partida
+CHEGADA: $h_chegada - $chegada
 ----------------------------------------
-TEMPO TOTAL: {tempo}
-DISTÂNCIA:   {km} KM
+TEMPO TOTAL: $tempo
+DISTÂNCIA:   $km KM
 ----------------------------------------
-MOTORISTA: {nome_m}
-VEÍCULO:   {carro} ({placa})
+MOTORISTA: $motorista
+VEÍCULO:   $carro ($placa)
 ----------------------------------------
-VALOR TOTAL: R$ {valor:.2f}
+VALOR TOTAL: R$$ $valor
 ----------------------------------------
    Obrigado por viajar com a TKX!
 ========================================
+""")
+
+# Corrida + motorista numa consulta só (sem uma busca de motorista por recibo)
+SQL_RECIBOS = """
+    SELECT h.id, h.data_cadastro, h.local_partida, h.hora_partida, h.local_chegada, h.hora_chegada,
+           h.tempo_total, h.km_distancia, h.valor_total_pago, m.nome, m.veiculo_modelo, m.placa
+    FROM {fonte} h
+    LEFT JOIN motoristas_cadastro m ON m.id = h.motorista_id
+"""
+
+PASTA_RECIBOS = "recibos"
+MINIMO_PARALELO = 5_000  # abaixo disso abrir processos custa mais do que renderizar
+TAMANHO_BLOCO = 2_000
+
+
+def selecionar_corridas(data=None, motorista_id=None, ids=None, conn=None):
+    """Linhas de SQL_RECIBOS filtradas por dia (AAAA-MM-DD), motorista e/ou lista de ids."""
+    conn = conn or banco_tkx.conectar()
+    filtros, params = [], []
+    if data:
+        filtros.append("h.data_cadastro >= ? AND h.data_cadastro < date(?, '+1 day')")
+        params += [data, data]
+    if motorista_id is not None:
+        filtros.append("h.motorista_id = ?")
+        params.append(motorista_id)
+    if ids:
+        filtros.append(f"h.id IN ({', '.join('?' * len(ids))})")
+        params += list(ids)
+    # Com data, só as partições daquele mês; por id, o histórico inteiro
+    sql = SQL_RECIBOS.format(fonte=banco_tkx.fonte_corridas(conn, data, data)) + (" WHERE " + " AND ".join(filtros) if filtros else "") + " ORDER BY h.id"
+    return conn.execute(sql, params).fetchall()
+
+
+def dia_da_corrida(data_cadastro):
+    return (data_cadastro or "")[:10] or "sem-data"
+
+
+def nome_recibo(corrida_id):
+    """Nome único por corrida: dois recibos nunca disputam o mesmo arquivo."""
+    return f"recibo_{corrida_id:08d}.txt"
+
+
+def renderizar_recibo(linha):
+    (corrida_id, data_cadastro, partida, h_partida, chegada, h_chegada,
+     tempo, km, valor, nome_m, carro, placa) = linha
+    try:
+        data = datetime.strptime(data_cadastro[:10], "%Y-%m-%d").strftime("%d/%m/%Y")
+    except (TypeError, ValueError):
+        data = data_cadastro or "---"
+    return TEMPLATE_RECIBO.substitute(
+        data=data,
+        numero=f"{corrida_id:08d}",
+        h_partida=h_partida or "--:--",
+        partida=partida or "---",
+        h_chegada=h_chegada or "--:--",
+        chegada=chegada or "---",
+        tempo=tempo or "---",
+        km=f"{km:g}" if km is not None else "---",
+        motorista=nome_m or "Motorista TKX",
+        carro=carro or "Veículo",
+        placa=placa or "---",
+        valor=f"{valor or 0:.2f}",
+    )
+
+
+def _renderizar_bloco(linhas):
+    """Roda nos processos do pool: devolve (id, dia, texto) de cada corrida."""
+    return [(linha[0], dia_da_corrida(linha[1]), renderizar_recibo(linha)) for linha in linhas]
+
+
+def _renderizar(linhas, processos):
+    if processos == 1 or len(linhas) < MINIMO_PARALELO:
+        yield from _renderizar_bloco(linhas)
+        return
+    blocos = [linhas[i:i + TAMANHO_BLOCO] for i in range(0, len(linhas), TAMANHO_BLOCO)]
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        for resultado in pool.map(_renderizar_bloco, blocos):
+            yield from resultado
+
+
+def emitir_recibos(data=None, motorista_id=None, ids=None, pasta=PASTA_RECIBOS, zip_diario=False,
+                   processos=None, conn=None):
+    """Emite os recibos das corridas selecionadas. Retorna (emitidos, ja_existentes, segundos).
+
+    Os recibos vão para pasta/AAAA-MM-DD/recibo_<id>.txt ou, com zip_diario=True, para
+    pasta/recibos_AAAA-MM-DD.zip (aberto em modo de acréscimo). Recibos que já existem
+    não são refeitos, então rodar de novo a mesma seleção não duplica nada.
     """
-    
-    # Salva em arquivo
-    nome_arq = f"recibo_{datetime.now().strftime('%H%M%S')}.txt"
-    with open(nome_arq, "w", encoding="utf-8") as f:
-        f.write(recibo_texto)
-    
-    print(recibo_texto)
+    t0 = time.perf_counter()
+    linhas = selecionar_corridas(data, motorista_id, ids, conn)
+    os.makedirs(pasta, exist_ok=True)
+
+    # Idempotência: descarta antes de renderizar o que já foi emitido
+    zips, existentes = {}, {}
+    def ja_emitido(linha):
+        dia, nome = dia_da_corrida(linha[1]), nome_recibo(linha[0])
+        if zip_diario:
+            if dia not in existentes:
+                caminho = os.path.join(pasta, f"recibos_{dia}.zip")
+                existentes[dia] = set(zipfile.ZipFile(caminho).namelist()) if os.path.exists(caminho) else set()
+            return nome in existentes[dia]
+        return os.path.exists(os.path.join(pasta, dia, nome))
+
+    pendentes = [linha for linha in linhas if not ja_emitido(linha)]
+    emitidos = 0
+    try:
+        for corrida_id, dia, texto in _renderizar(pendentes, processos):
+            nome = nome_recibo(corrida_id)
+            if zip_diario:
+                if dia not in zips:
+                    zips[dia] = zipfile.ZipFile(os.path.join(pasta, f"recibos_{dia}.zip"), "a", zipfile.ZIP_DEFLATED)
+                zips[dia].writestr(nome, texto)
+            else:
+                os.makedirs(os.path.join(pasta, dia), exist_ok=True)
+                destino = os.path.join(pasta, dia, nome)
+                # Grava num temporário e renomeia: uma execução interrompida não deixa recibo pela metade
+                with open(destino + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(texto)
+                os.replace(destino + ".tmp", destino)
+            emitidos += 1
+    finally:
+        for arquivo in zips.values():
+            arquivo.close()
+    return emitidos, len(linhas) - len(pendentes), time.perf_counter() - t0
+
+
+def calcular_dre_ou_vazio(km, valor):
+    try:
+        return calculadora_tkx.calcular_dre(km, valor)
+    except LookupError:
+        return calculadora_tkx.ResultadoDRE(km, valor, None, None, None, None, None)
+
+
+def gerar_recibo_detalhado():
+    print("\n--- EMISSÃO DE RECIBO TKX ---")
+    m_id = input("ID do Motorista: ")
+    partida = input("Local de Partida: ")
+    h_partida = input("Horário de Partida (HH:MM): ")
+    chegada = input("Local de Chegada: ")
+    h_chegada = input("Horário de Chegada (HH:MM): ")
+    km = float(input("KM Percorrido: ").replace(",", "."))
+    tempo = input("Tempo Total (ex: 15 min): ")
+    valor = float(input("Valor Total (R$): "))
+
+    # A corrida passa a ficar no histórico (e nos relatórios); o recibo sai dela
+    dre = calcular_dre_ou_vazio(km, valor)
+    conn = banco_tkx.conectar()
+    with banco_tkx.transacao(conn):
+        corrida_id = conn.execute("""
+            INSERT INTO historico_corridas (motorista_id, valor_total_pago, km_distancia, taxa_app_valor,
+                custo_gateway, custos_fixos_totais, local_partida, hora_partida, local_chegada,
+                hora_chegada, tempo_total)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (m_id, valor, km, dre.comissao_tkx, dre.custo_gateway, dre.custos_fixos,
+              partida, h_partida, chegada, h_chegada, tempo)).lastrowid
+
+    linha = selecionar_corridas(ids=[corrida_id], conn=conn)[0]
+    emitir_recibos(ids=[corrida_id], conn=conn)
+    nome_arq = os.path.join(PASTA_RECIBOS, dia_da_corrida(linha[1]), nome_recibo(corrida_id))
+
+    print(renderizar_recibo(linha))
     print(f"✅ Recibo salvo: {nome_arq}")
-    conn.close()
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Recibo interativo ou emissão de recibos em lote.")
+    parser.add_argument("--data", help="emite os recibos das corridas do dia AAAA-MM-DD")
+    parser.add_argument("--motorista", type=int, help="só as corridas deste motorista")
+    parser.add_argument("--ids", type=int, nargs="+", help="ids específicos de corridas")
+    parser.add_argument("--pasta", default=PASTA_RECIBOS)
+    parser.add_argument("--zip", action="store_true", help="um arquivo .zip por dia em vez de um .txt por corrida")
+    parser.add_argument("--processos", type=int, default=None, help="processos de renderização (padrão: nº de CPUs)")
+    args = parser.parse_args(argv)
+
+    if args.data or args.motorista is not None or args.ids:
+        emitidos, existentes, segundos = emitir_recibos(args.data, args.motorista, args.ids, args.pasta,
+                                                        args.zip, args.processos)
+        print(f"✅ {emitidos:,} recibos emitidos ({emitidos / max(segundos, 1e-9):,.0f}/s), "
+              f"{existentes:,} já existiam.")
+    else:
+        gerar_recibo_detalhado()
+
 
 if __name__ == "__main__":
-    gerar_recibo_detalhado()
\ No newline at end of file
+    main(sys.argv[1:])
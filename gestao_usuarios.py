@@ -1,20 +1,14 @@
-import sqlite3
+import busca_cadastros
 
 def listar_cadastros():
-    conn = sqlite3.connect('tkx_franca.db')
-    cursor = conn.cursor()
-    
-    print("\n=== MOTORISTAS CADASTRADOS ===")
-    cursor.execute("SELECT nome, placa, status FROM motoristas_cadastro")
-    for m in cursor.fetchall():
-        print(f"Nome: {m[0]} | Placa: {m[1]} | Status: {m[2]}")
-        
-    print("\n=== CLIENTES CADASTRADOS ===")
-    cursor.execute("SELECT nome, telefone FROM clientes")
-    for c in cursor.fetchall():
-        print(f"Nome: {c[0]} | Tel: {c[1]}")
-    
-    conn.close()
+    print("\n=== CADASTROS TKX ===")
+    texto = input("Buscar (nome, placa, CPF ou telefone; vazio = todos): ")
+    status = input("Status dos motoristas [ativo/pendente/bloqueado] (vazio = todos): ").strip().lower() or None
+
+    try:
+        busca_cadastros.navegar(texto, status=status)
+    except ValueError as e:
+        print(f"❌ {e}")
 
 if __name__ == "__main__":
-    listar_cadastros()
\ No newline at end of file
+    listar_cadastros()
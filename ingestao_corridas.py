@@ -0,0 +1,531 @@
+import argparse
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import banco_tkx
+import cache_consultas
+import calculadora_tkx
+import resolvedor_tarifas
+
+# Gravação em tempo real das corridas concluídas, vindas de vários produtores (threads,
+# API, importação de arquivos).
+#
+#   registrar()  valida a corrida, calcula o DRE (15% de comissão, gateway e custos fixos
+#                do município), acrescenta a linha ao spool e põe na fila. Com a fila cheia
+#                o produtor espera (até `espera_maxima`): a contrapressão segura quem está
+#                gerando mais rápido do que o banco grava.
+#   escritor     uma thread só junta a fila em lotes (até `lote` corridas ou `latencia_ms`
+#                desde a primeira) e grava cada lote numa transação. No mesmo COMMIT vai a
+#                posição do spool já gravada (tabela ingestao_spool).
+#
+# O spool (JSON por linha, uma corrida já calculada) é a garantia contra queda: cada linha
+# chega ao sistema operacional antes de registrar() voltar e leva fsync antes do lote
+# ser gravado. Ao abrir, o que está depois da posição gravada volta para a fila. Reenvios
+# não duplicam: chave_ingestao é única no histórico (migração 10) e, quando o produtor não
+# manda uma, sai do conteúdo da corrida (chave_conteudo).
+#
+# Leitores não disputam com o escritor (WAL). Um spool pertence a um ingestor só.
+#
+# registrar() também recusa motorista ou cliente sem cadastro e corridas de meses já
+# particionados (ver particionar_corridas) ou do futuro. Os cadastros e os meses ficam em
+# memória e só são relidos quando versoes_tabelas muda.
+
+LOTE = 2000                    # cada COMMIT custa caro (checkpoint do WAL, gatilhos): lotes grandes rendem mais
+LATENCIA_MS = 50
+CAPACIDADE = 20_000            # corridas aceitas e ainda não gravadas
+ESPERA_MAXIMA = 10.0           # segundos que registrar() espera por vaga na fila
+PASTA_SPOOL = "spool"
+TAMANHO_ROTACAO = 64 * 1024 * 1024  # o spool é zerado quando tudo foi gravado e passou disso
+TOLERANCIA_RELOGIO = timedelta(minutes=5)  # data_cadastro à frente do relógio local aceita
+
+# Ordem das colunas no spool e no INSERT (minuto_dia por último); turno_id entra na gravação
+COLUNAS_SPOOL = (
+    "chave_ingestao", "motorista_id", "cliente_id", "valor_total_pago", "km_distancia", "taxa_app_valor",
+    "custo_gateway", "custos_fixos_totais", "data_cadastro", "local_partida", "hora_partida", "local_chegada",
+    "hora_chegada", "tempo_total", "preco_concorrente", "avaliacao_motorista", "minuto_dia",
+)
+SQL_INSERCAO = f"""
+    INSERT INTO historico_corridas ({', '.join(COLUNAS_SPOOL)}, turno_id) VALUES ({', '.join('?' * (len(COLUNAS_SPOOL) + 1))})
+    ON CONFLICT (chave_ingestao) WHERE chave_ingestao IS NOT NULL DO NOTHING
+"""
+
+# Campo aceito -> (conversão, obrigatório)
+CAMPOS = {
+    "chave_ingestao": (str, False),
+    "motorista_id": (int, True),
+    "cliente_id": (int, False),
+    "valor_total_pago": (float, True),
+    "km_distancia": (float, True),
+    "data_cadastro": (str, False),
+    "local_partida": (str, False),
+    "hora_partida": (str, False),
+    "local_chegada": (str, False),
+    "hora_chegada": (str, False),
+    "tempo_total": (str, False),
+    "preco_concorrente": (float, False),
+    "avaliacao_motorista": (int, False),
+}
+
+
+# ids cadastrados e meses AAAA-MM que não aceitam mais corridas
+Referencias = namedtuple("Referencias", "motoristas clientes meses_fechados")
+TABELAS_REFERENCIAS = ("motoristas_cadastro", "clientes", "particoes_corridas")
+
+
+class IngestaoSobrecarregada(Exception):
+    """A fila ficou cheia por mais de `espera_maxima`: o escritor não está dando conta."""
+
+
+def carregar_referencias(conn):
+    """Referencias do banco: meses com partição (movendo ou fechada) já saíram do histórico."""
+    return Referencias(
+        frozenset(l[0] for l in conn.execute("SELECT id FROM motoristas_cadastro")),
+        frozenset(l[0] for l in conn.execute("SELECT id FROM clientes")),
+        frozenset(l[0] for l in conn.execute("SELECT mes FROM particoes_corridas")),
+    )
+
+
+def _validar_hora(hora):
+    achou = re.fullmatch(r"(\d{1,2}):(\d{2})(?::(\d{2}))?", hora.strip())
+    if not achou or int(achou.group(1)) > 23 or int(achou.group(2)) > 59 or int(achou.group(3) or 0) > 59:
+        raise ValueError(f"hora_partida inválida: {hora!r} (esperado HH:MM)")
+
+
+def chave_conteudo(linha):
+    """chave_ingestao de uma corrida sem chave: hash do conteúdo (tupla de COLUNAS_SPOOL sem a chave).
+
+    O reenvio da mesma corrida gera a mesma chave e não duplica no histórico.
+    """
+    return hashlib.sha1(json.dumps(linha[1:], ensure_ascii=False).encode()).hexdigest()
+
+
+def validar_corrida(dados, config, referencias=None, agora=None):
+    """Tupla na ordem de COLUNAS_SPOOL a partir de um dict de corrida. ValueError se inválida.
+
+    Sem chave_ingestao a data_cadastro é obrigatória: a chave sai do conteúdo da corrida.
+    Com `referencias` (carregar_referencias) confere também os cadastros e o mês da corrida.
+    """
+    desconhecidos = set(dados) - set(CAMPOS)
+    if desconhecidos:
+        raise ValueError(f"campos desconhecidos: {', '.join(sorted(desconhecidos))}")
+    valores = {}
+    for campo, (tipo, obrigatorio) in CAMPOS.items():
+        valor = dados.get(campo)
+        if valor is None or valor == "":
+            if obrigatorio:
+                raise ValueError(f"campo obrigatório: {campo}")
+            valores[campo] = None
+            continue
+        try:
+            valores[campo] = tipo(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"{campo} inválido: {valor!r}") from None
+
+    if valores["motorista_id"] <= 0:
+        raise ValueError("motorista_id deve ser positivo")
+    if valores["valor_total_pago"] <= 0:
+        raise ValueError("valor_total_pago deve ser maior que zero")
+    if valores["km_distancia"] < 0:
+        raise ValueError("km_distancia não pode ser negativo")
+    if valores["avaliacao_motorista"] is not None and not 1 <= valores["avaliacao_motorista"] <= 5:
+        raise ValueError("avaliacao_motorista deve ir de 1 a 5")
+    if valores["preco_concorrente"] is not None and valores["preco_concorrente"] < 0:
+        raise ValueError("preco_concorrente não pode ser negativo")
+
+    if not valores["chave_ingestao"] and not valores["data_cadastro"]:
+        raise ValueError("sem chave_ingestao, data_cadastro é obrigatória (a chave sai do conteúdo da corrida)")
+    agora = agora or datetime.now()
+    try:
+        momento = datetime.fromisoformat(valores["data_cadastro"]) if valores["data_cadastro"] else agora
+    except ValueError:
+        raise ValueError(f"data_cadastro inválida: {valores['data_cadastro']!r}") from None
+    if momento.tzinfo is not None:
+        momento = momento.astimezone().replace(tzinfo=None)  # o histórico grava a hora local
+    if momento > agora + TOLERANCIA_RELOGIO:
+        raise ValueError(f"data_cadastro no futuro: {valores['data_cadastro']!r}")
+    if valores["hora_partida"]:
+        _validar_hora(valores["hora_partida"])
+    hora_partida = valores["hora_partida"] or momento.strftime("%H:%M")
+
+    if referencias is not None:
+        if valores["motorista_id"] not in referencias.motoristas:
+            raise ValueError(f"motorista_id {valores['motorista_id']} sem cadastro")
+        if valores["cliente_id"] is not None and valores["cliente_id"] not in referencias.clientes:
+            raise ValueError(f"cliente_id {valores['cliente_id']} sem cadastro")
+        if momento.strftime("%Y-%m") in referencias.meses_fechados:
+            raise ValueError(f"mês {momento:%Y-%m} já fechado (particionado): a corrida não entra mais")
+    minuto_dia = resolvedor_tarifas.minuto_do_dia(hora_partida)
+
+    # Mesmas regras (e centavos) do restante do sistema
+    dre = calculadora_tkx.calcular_dre(valores["km_distancia"], valores["valor_total_pago"], config=config)
+    linha = (
+        valores["chave_ingestao"],
+        valores["motorista_id"],
+        valores["cliente_id"],
+        round(valores["valor_total_pago"], 2),
+        valores["km_distancia"],
+        round(dre.comissao_tkx, 2),
+        round(dre.custo_gateway, 2),
+        round(dre.custos_fixos, 2),
+        momento.strftime("%Y-%m-%d %H:%M:%S"),
+        valores["local_partida"],
+        hora_partida,
+        valores["local_chegada"],
+        valores["hora_chegada"],
+        valores["tempo_total"],
+        valores["preco_concorrente"],
+        valores["avaliacao_motorista"],
+        minuto_dia,
+    )
+    return linha if linha[0] else (chave_conteudo(linha),) + linha[1:]
+
+
+class IngestorCorridas:
+    """Recebe corridas de qualquer thread e grava em lotes por uma thread escritora."""
+
+    def __init__(self, caminho=None, spool=None, lote=LOTE, latencia_ms=LATENCIA_MS, capacidade=CAPACIDADE,
+                 espera_maxima=ESPERA_MAXIMA, municipio=None, fsync=True):
+        self.caminho = banco_tkx.caminho_banco(caminho)
+        self.spool = os.path.abspath(spool or os.path.join(PASTA_SPOOL, os.path.basename(self.caminho) + ".spool"))
+        self.lote = lote
+        self.latencia = latencia_ms / 1000
+        self.espera_maxima = espera_maxima
+        self.fsync = fsync
+        self.config = calculadora_tkx.carregar_configuracao(municipio, banco_tkx.conectar(self.caminho))
+        if self.config is None:
+            raise LookupError(f"Configuração não encontrada para {municipio or banco_tkx.municipio_atual()}.")
+
+        self._referencias, self._versoes_referencias = None, None
+        self._fila = queue.SimpleQueue()           # (linha, posição do spool depois dela)
+        self._vagas = threading.Semaphore(capacidade)
+        self._trava = threading.Lock()              # ordem do spool = ordem da fila
+        self._gravadas = threading.Condition()
+        self.estatisticas = {"aceitas": 0, "gravadas": 0, "duplicadas": 0, "rejeitadas": 0, "lotes": 0, "maior_lote": 0}
+        self._ativo = True
+        self._erro = None
+
+        os.makedirs(os.path.dirname(self.spool), exist_ok=True)
+        self._arquivo = open(self.spool, "ab")
+        self._escritor = threading.Thread(target=self._escrever, name="tkx-ingestao", daemon=True)
+        self._escritor.start()
+        self._recuperar()
+
+    # --- Produtores ---
+
+    def registrar(self, dados):
+        """Valida e enfileira uma corrida (dict). Devolve a chave_ingestao."""
+        if not self._ativo:
+            raise RuntimeError("ingestor encerrado")
+        self._verificar_escritor()
+        linha = validar_corrida(dados, self.config, self._referencias_atuais())
+        if not self._vagas.acquire(timeout=self.espera_maxima):
+            self._verificar_escritor()
+            raise IngestaoSobrecarregada(f"fila cheia há {self.espera_maxima:g}s (escritor atrasado)")
+        texto = (json.dumps(linha, ensure_ascii=False) + "\n").encode()
+        with self._trava:
+            self._arquivo.write(texto)
+            self._arquivo.flush()  # no sistema operacional: sobrevive à queda do processo
+            self._fila.put((linha, self._arquivo.tell()))
+            self.estatisticas["aceitas"] += 1
+        return linha[0]
+
+    def _verificar_escritor(self):
+        """Recusa novas corridas se a thread escritora parou: nada mais seria gravado."""
+        if self._erro is not None or not self._escritor.is_alive():
+            raise RuntimeError("escritor da ingestão parou") from self._erro
+
+    def _referencias_atuais(self):
+        """Referencias do banco, relidas só quando cadastros ou partições mudam."""
+        conn = banco_tkx.conectar(self.caminho)
+        versoes = cache_consultas.versoes(TABELAS_REFERENCIAS, conn)
+        if versoes != self._versoes_referencias:
+            self._referencias, self._versoes_referencias = carregar_referencias(conn), versoes
+        return self._referencias
+
+    def registrar_varias(self, corridas):
+        return [self.registrar(dados) for dados in corridas]
+
+    def descarregar(self, timeout=None):
+        """Espera gravar tudo o que foi aceito até agora. False se o tempo acabar."""
+        alvo = self.estatisticas["aceitas"]
+        with self._gravadas:
+            ok = self._gravadas.wait_for(lambda: self._erro or self._processadas() >= alvo, timeout)
+        if self._erro:
+            raise RuntimeError("escritor da ingestão parou") from self._erro
+        return ok
+
+    def fechar(self, timeout=None):
+        self._ativo = False
+        self._escritor.join(timeout)
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _processadas(self):
+        e = self.estatisticas
+        return e["gravadas"] + e["duplicadas"] + e["rejeitadas"]
+
+    # --- Recuperação ---
+
+    def _recuperar(self):
+        """Devolve à fila as linhas do spool depois da última posição gravada."""
+        with self._trava:  # a rotação do spool espera a recuperação
+            conn = banco_tkx.conectar(self.caminho)
+            linha = conn.execute("SELECT posicao FROM ingestao_spool WHERE arquivo = ?", (self.spool,)).fetchone()
+            posicao = linha[0] if linha else 0
+            tamanho = os.path.getsize(self.spool)
+            if posicao > tamanho:
+                posicao = 0  # spool zerado depois do último COMMIT: as chaves evitam duplicar
+            with open(self.spool, "rb") as f:
+                f.seek(posicao)
+                for texto in f:
+                    if not texto.endswith(b"\n"):
+                        break  # linha cortada por uma queda no meio da escrita
+                    posicao += len(texto)
+                    self._vagas.acquire()  # o escritor já está rodando e libera as vagas
+                    self._fila.put((tuple(json.loads(texto)), posicao))
+                    self.estatisticas["aceitas"] += 1
+            if posicao < tamanho:
+                self._arquivo.truncate(posicao)
+
+    # --- Escritor ---
+
+    def _proximo_lote(self):
+        try:
+            primeiro = self._fila.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        itens = [primeiro]
+        limite = time.monotonic() + self.latencia
+        while len(itens) < self.lote:
+            restante = limite - time.monotonic()
+            try:
+                itens.append(self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return itens
+
+    def _escrever(self):
+        conn = banco_tkx.conectar(self.caminho)
+        turnos, versao_turnos = None, None
+        try:
+            while self._ativo or not self._fila.empty():
+                itens = self._proximo_lote()
+                if not itens:
+                    self._rotacionar(conn)
+                    continue
+                if self.fsync:
+                    os.fsync(self._arquivo.fileno())
+                # turno_id pela configuração de turnos atual (relida só quando ela muda)
+                _, versao = cache_consultas.versoes(("turnos",), conn)
+                if versao != versao_turnos:
+                    turnos, versao_turnos = banco_tkx.turnos_por_minuto(conn), versao
+                linhas = [linha + (turnos[linha[-1]],) for linha, _ in itens]
+                gravadas, rejeitadas = self._gravar(conn, linhas, itens[-1][1])
+                self._vagas.release(len(itens))
+                with self._gravadas:
+                    e = self.estatisticas
+                    e["gravadas"] += gravadas
+                    e["rejeitadas"] += rejeitadas
+                    e["duplicadas"] += len(itens) - gravadas - rejeitadas
+                    e["lotes"] += 1
+                    e["maior_lote"] = max(e["maior_lote"], len(itens))
+                    self._gravadas.notify_all()
+        except BaseException as erro:
+            with self._gravadas:
+                self._erro = erro
+                self._gravadas.notify_all()
+            raise
+
+    def _gravar(self, conn, linhas, posicao):
+        """Um lote numa transação, com a posição do spool. Devolve (gravadas, rejeitadas)."""
+        while True:
+            try:
+                try:
+                    with banco_tkx.transacao(conn):
+                        # rowcount não conta o que os gatilhos mexem nem as chaves repetidas
+                        gravadas = conn.executemany(SQL_INSERCAO, linhas).rowcount
+                        self._gravar_posicao(conn, posicao)
+                    return gravadas, 0
+                except sqlite3.IntegrityError:
+                    # Alguma linha viola o schema: o lote inteiro já voltou (ROLLBACK da
+                    # transação) e é refeito linha a linha, separando as rejeitadas
+                    with banco_tkx.transacao(conn):
+                        gravadas, rejeitadas = self._gravar_uma_a_uma(conn, linhas)
+                        self._gravar_posicao(conn, posicao)
+                    return gravadas, rejeitadas
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                time.sleep(0.05)  # outro escritor segurou o banco além do busy_timeout: tenta o lote de novo
+
+    def _gravar_posicao(self, conn, posicao):
+        conn.execute("""
+            INSERT INTO ingestao_spool (arquivo, posicao) VALUES (?, ?)
+            ON CONFLICT (arquivo) DO UPDATE SET posicao = excluded.posicao
+        """, (self.spool, posicao))
+
+    def _gravar_uma_a_uma(self, conn, linhas):
+        gravadas, rejeitadas = 0, []
+        for linha in linhas:
+            conn.execute("SAVEPOINT linha")
+            try:
+                gravadas += conn.execute(SQL_INSERCAO, linha).rowcount
+                conn.execute("RELEASE linha")
+            except sqlite3.IntegrityError as e:
+                conn.execute("ROLLBACK TO linha")
+                conn.execute("RELEASE linha")
+                rejeitadas.append({"linha": list(linha), "erro": str(e)})
+        if rejeitadas:
+            with open(self.spool + ".rejeitadas", "a", encoding="utf-8") as f:
+                for r in rejeitadas:
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        return gravadas, len(rejeitadas)
+
+    def _rotacionar(self, conn):
+        """Zera o spool grande quando tudo o que ele tem já foi gravado."""
+        if self._arquivo.tell() < TAMANHO_ROTACAO:
+            return
+        with self._trava:
+            if not self._fila.empty() or self._processadas() < self.estatisticas["aceitas"]:
+                return
+            with banco_tkx.transacao(conn):
+                conn.execute("UPDATE ingestao_spool SET posicao = 0 WHERE arquivo = ?", (self.spool,))
+            self._arquivo.truncate(0)
+            self._arquivo.seek(0)
+
+
+# --- Linha de comando ---
+
+def _ler_jsonl(arquivo):
+    for numero, texto in enumerate(arquivo, 1):
+        texto = texto.strip()
+        if texto:
+            yield numero, json.loads(texto)
+
+
+def importar(arquivo, ingestor):
+    """Registra as corridas de um JSONL (uma por linha). Devolve [(linha, erro)] das recusadas."""
+    recusadas = []
+    for numero, dados in _ler_jsonl(arquivo):
+        try:
+            ingestor.registrar(dados)
+        except ValueError as e:
+            recusadas.append((numero, str(e)))
+    ingestor.descarregar()
+    return recusadas
+
+
+def _corridas_sinteticas(total, conn, semente):
+    import popular_bi
+    motoristas = [l[0] for l in conn.execute("SELECT id FROM motoristas_cadastro")]
+    clientes = [l[0] for l in conn.execute("SELECT id FROM clientes")] or [None]
+    campos = ("motorista_id", "cliente_id", "valor_total_pago", "km_distancia")
+    # Corridas de ontem: as de hoje cairiam em parte no futuro
+    ontem = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    for linha in popular_bi.gerar_corridas(total, motoristas, clientes, dias=1, semente=semente, fim=ontem):
+        dados = dict(zip(campos, linha[:4]))
+        dados.update(data_cadastro=linha[7], hora_partida=linha[8], hora_chegada=linha[9], tempo_total=linha[10],
+                     preco_concorrente=linha[11], avaliacao_motorista=linha[12])
+        yield dados
+
+
+def benchmark(total=50_000, produtores=8, leitores=2, **opcoes):
+    """Grava `total` corridas sintéticas vindas de `produtores` threads, com leitores consultando o DRE."""
+    import consolidado_dre
+    with IngestorCorridas(**opcoes) as ingestor:
+        conn = banco_tkx.conectar(ingestor.caminho)
+        if not conn.execute("SELECT 1 FROM motoristas_cadastro LIMIT 1").fetchone():
+            raise LookupError("O benchmark precisa de motoristas cadastrados.")
+        partes = [list(_corridas_sinteticas(total // produtores, conn, semente=i)) for i in range(produtores)]
+        consultas = [0] * leitores
+        parar = threading.Event()
+
+        def produzir(corridas):
+            for dados in corridas:
+                ingestor.registrar(dados)
+
+        def ler(i):
+            conn_leitura = banco_tkx.conectar(ingestor.caminho)
+            while not parar.is_set():
+                consolidado_dre.totais_periodo.sem_cache(conn=conn_leitura)
+                consultas[i] += 1
+                time.sleep(0.001)
+
+        threads_leitura = [threading.Thread(target=ler, args=(i,)) for i in range(leitores)]
+        threads = [threading.Thread(target=produzir, args=(p,)) for p in partes]
+        for t in threads_leitura:
+            t.start()
+        inicio = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        ingestor.descarregar()
+        segundos = time.perf_counter() - inicio
+        parar.set()
+        for t in threads_leitura:
+            t.join()
+        return dict(ingestor.estatisticas, segundos=segundos, consultas=sum(consultas))
+
+
+def exibir_estatisticas(estatisticas, segundos=None):
+    e = estatisticas
+    print(f"Aceitas: {e['aceitas']:,} | Gravadas: {e['gravadas']:,} | Duplicadas: {e['duplicadas']:,}"
+          f" | Rejeitadas: {e['rejeitadas']:,}")
+    if e["lotes"]:
+        print(f"Lotes: {e['lotes']:,} (média {e['aceitas'] / e['lotes']:.0f}, maior {e['maior_lote']})")
+    if segundos:
+        print(f"{e['gravadas'] / segundos:,.0f} corridas/s em {segundos:.2f}s")
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Grava corridas concluídas em lotes, com spool contra queda.")
+    parser.add_argument("arquivo", nargs="?", help="JSONL com uma corrida por linha (padrão: entrada padrão)")
+    parser.add_argument("--spool", help="arquivo do spool (padrão: spool/<banco>.spool)")
+    parser.add_argument("--lote", type=int, default=LOTE, help="máximo de corridas por transação")
+    parser.add_argument("--latencia-ms", type=float, default=LATENCIA_MS, help="espera máxima para juntar um lote")
+    parser.add_argument("--capacidade", type=int, default=CAPACIDADE, help="corridas aceitas e ainda não gravadas")
+    parser.add_argument("--sem-fsync", action="store_true", help="não força o spool para o disco antes de cada lote")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="grava N corridas sintéticas e mede a vazão")
+    parser.add_argument("--produtores", type=int, default=8)
+    parser.add_argument("--leitores", type=int, default=2)
+    args = parser.parse_args(argv)
+    opcoes = dict(spool=args.spool, lote=args.lote, latencia_ms=args.latencia_ms, capacidade=args.capacidade,
+                  fsync=not args.sem_fsync)
+
+    try:
+        if args.benchmark:
+            resultado = benchmark(args.benchmark, args.produtores, args.leitores, **opcoes)
+            exibir_estatisticas(resultado, resultado["segundos"])
+            print(f"Consultas de leitura no período: {resultado['consultas']:,}")
+            return
+        t0 = time.perf_counter()
+        with IngestorCorridas(**opcoes) as ingestor:
+            if args.arquivo:
+                with open(args.arquivo, encoding="utf-8") as f:
+                    recusadas = importar(f, ingestor)
+            else:
+                recusadas = importar(sys.stdin, ingestor)
+            exibir_estatisticas(ingestor.estatisticas, time.perf_counter() - t0)
+        for numero, erro in recusadas:
+            print(f"❌ Linha {numero}: {erro}")
+    except (LookupError, IngestaoSobrecarregada) as e:
+        print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,157 @@
+import argparse
+import sys
+from collections import namedtuple
+from datetime import date
+
+import banco_tkx
+from migracoes import DIAS_ANEL
+
+# Métricas em janelas móveis de 7, 30 e 90 dias por motorista e por cliente, lidas dos
+# baldes diários em anel da migração 13 (janela_motoristas, janela_clientes).
+#
+#   metricas("motorista", 7)      corridas, bruto, comissão, nota média e tendência de cada um
+#   metricas_de("cliente", 42)    as três janelas de um cliente (até DIAS_ANEL linhas)
+#   alertas_nota()                motoristas com a nota dos últimos 7 dias abaixo do limite
+#
+# Os gatilhos somam cada corrida ao balde do seu dia e o dia que sai do anel é sobrescrito
+# pelo que entra: nenhuma consulta aqui lê o histórico. Uma janela de N dias lê no máximo N
+# baldes por entidade ativa, então os alertas custam O(motoristas), não O(corridas).
+#
+#   python janelas_metricas.py motorista 12
+#   python janelas_metricas.py top cliente --janela 30 --ordem bruto
+#   python janelas_metricas.py alertas --limite 4.5
+
+JANELAS = (7, 30, 90)
+NOTA_ALERTA = 4.5
+MINIMO_AVALIACOES_ALERTA = 5  # com menos avaliações na janela a média não dispara alerta
+
+# (tabela do anel, coluna da entidade, cadastro)
+ENTIDADES = {
+    "motorista": ("janela_motoristas", "motorista_id", "motoristas_cadastro"),
+    "cliente": ("janela_clientes", "cliente_id", "clientes"),
+}
+ORDENS = {"corridas": "corridas", "bruto": "bruto", "comissao": "comissao", "media": "media"}
+
+# tendencia: inclinação da reta de mínimos quadrados das notas pelo dia, em pontos por semana
+Metricas = namedtuple("Metricas", "id nome corridas bruto comissao avaliacoes media tendencia")
+
+SQL_METRICAS = """
+    SELECT j.{entidade}, c.nome, SUM(j.corridas) AS corridas, SUM(j.bruto) AS bruto,
+           SUM(j.comissao) AS comissao, SUM(j.avaliacoes) AS avaliacoes,
+           SUM(j.soma_notas) * 1.0 / NULLIF(SUM(j.avaliacoes), 0) AS media,
+           7.0 * (SUM(j.avaliacoes) * SUM(j.soma_notas * j.x) - SUM(j.avaliacoes * j.x) * SUM(j.soma_notas))
+               / NULLIF(SUM(j.avaliacoes) * SUM(j.avaliacoes * j.x * j.x) - SUM(j.avaliacoes * j.x) * SUM(j.avaliacoes * j.x), 0)
+    FROM (
+        SELECT *, julianday(dia) - julianday(:hoje) AS x FROM {tabela}
+        WHERE dia > date(:hoje, :inicio) AND dia <= :hoje{filtro}
+    ) j
+    LEFT JOIN {cadastro} c ON c.id = j.{entidade}
+    GROUP BY j.{entidade}
+    HAVING SUM(j.corridas) > 0{condicao}
+    ORDER BY {ordem} DESC, j.{entidade}
+    LIMIT :limite
+"""
+
+
+def _hoje(hoje):
+    return hoje or date.today().isoformat()
+
+
+def metricas(entidade="motorista", janela=30, ordem="comissao", limite=None, ids=None, hoje=None,
+             condicao="", parametros=None, conn=None):
+    """[Metricas] da janela dos últimos `janela` dias até `hoje` (AAAA-MM-DD, padrão: hoje).
+
+    `ids` restringe às entidades informadas; `condicao` (começa com AND) filtra os agregados.
+    """
+    if entidade not in ENTIDADES:
+        raise ValueError(f"entidade deve ser {' ou '.join(ENTIDADES)}")
+    if not 1 <= janela <= DIAS_ANEL:
+        raise ValueError(f"a janela vai de 1 a {DIAS_ANEL} dias")
+    if ordem not in ORDENS:
+        raise ValueError(f"ordem deve ser uma de {sorted(ORDENS)}")
+    conn = conn or banco_tkx.conectar()
+    tabela, coluna, cadastro = ENTIDADES[entidade]
+    filtro = f" AND {coluna} IN ({', '.join(str(int(i)) for i in ids)})" if ids is not None else ""
+    sql = SQL_METRICAS.format(entidade=coluna, tabela=tabela, cadastro=cadastro, filtro=filtro,
+                              condicao=condicao, ordem=ORDENS[ordem])
+    params = {"hoje": _hoje(hoje), "inicio": f"-{janela} days", "limite": -1 if limite is None else limite,
+              **(parametros or {})}
+    return [Metricas._make(linha) for linha in conn.execute(sql, params)]
+
+
+def metricas_de(entidade, entidade_id, hoje=None, conn=None):
+    """{janela: Metricas ou None} de um motorista ou cliente nas janelas de JANELAS."""
+    return {janela: next(iter(metricas(entidade, janela, ids=[entidade_id], hoje=hoje, conn=conn)), None)
+            for janela in JANELAS}
+
+
+def alertas_nota(limite=NOTA_ALERTA, janela=7, minimo=MINIMO_AVALIACOES_ALERTA, hoje=None, conn=None):
+    """[Metricas] dos motoristas com média abaixo de `limite` na janela, da pior nota para a melhor."""
+    alertas = metricas("motorista", janela, "media", hoje=hoje, conn=conn,
+                       condicao=" AND SUM(j.soma_notas) * 1.0 / SUM(j.avaliacoes) < :nota AND SUM(j.avaliacoes) >= :minimo",
+                       parametros={"nota": limite, "minimo": minimo})
+    return alertas[::-1]
+
+
+def resumo_frota(hoje=None, conn=None):
+    """{janela: (corridas, bruto, comissão, avaliações, nota média)} das corridas com motorista."""
+    conn = conn or banco_tkx.conectar()
+    resumo = {}
+    for janela in JANELAS:
+        resumo[janela] = conn.execute("""
+            SELECT COALESCE(SUM(corridas), 0), COALESCE(SUM(bruto), 0), COALESCE(SUM(comissao), 0),
+                   COALESCE(SUM(avaliacoes), 0), SUM(soma_notas) * 1.0 / NULLIF(SUM(avaliacoes), 0)
+            FROM janela_motoristas WHERE dia > date(:hoje, :inicio) AND dia <= :hoje
+        """, {"hoje": _hoje(hoje), "inicio": f"-{janela} days"}).fetchone()
+    return resumo
+
+
+def formatar_metricas(m):
+    nota = f"{m.media:.2f}" if m.media is not None else "-"
+    tendencia = f"{m.tendencia:+.2f}/sem" if m.tendencia is not None else "-"
+    return (f"#{m.id:<6} {(m.nome or '?')[:20]:<20} | Corridas: {m.corridas:5d} | Bruto: R$ {m.bruto:10.2f} "
+            f"| TKX: R$ {m.comissao:9.2f} | Nota: {nota} ({m.avaliacoes}) | Tendência: {tendencia}")
+
+
+def exibir_entidade(entidade, entidade_id, hoje=None):
+    print(f"\n--- {entidade.upper()} #{entidade_id} ---")
+    for janela, m in metricas_de(entidade, entidade_id, hoje).items():
+        print(f"{janela:>2} dias: " + (formatar_metricas(m) if m else "sem corridas"))
+
+
+def exibir_alertas(limite=NOTA_ALERTA, janela=7, hoje=None):
+    alertas = alertas_nota(limite, janela, hoje=hoje)
+    print(f"\n⚠️ MOTORISTAS COM NOTA ABAIXO DE {limite:.1f} NOS ÚLTIMOS {janela} DIAS: {len(alertas)}")
+    for m in alertas:
+        print(formatar_metricas(m))
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Métricas em janelas móveis por motorista e cliente.")
+    parser.add_argument("--hoje", help="último dia das janelas (AAAA-MM-DD, padrão: hoje)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    for entidade in ENTIDADES:
+        um = sub.add_parser(entidade, help=f"as janelas de um {entidade}")
+        um.add_argument("id", type=int)
+    top = sub.add_parser("top", help="ranking de uma janela")
+    top.add_argument("entidade", choices=list(ENTIDADES))
+    top.add_argument("--janela", type=int, choices=JANELAS, default=30)
+    top.add_argument("--ordem", choices=sorted(ORDENS), default="comissao")
+    top.add_argument("--limite", type=int, default=10)
+    alertas = sub.add_parser("alertas", help="motoristas com nota abaixo do limite")
+    alertas.add_argument("--limite", type=float, default=NOTA_ALERTA)
+    alertas.add_argument("--janela", type=int, choices=JANELAS, default=7)
+    args = parser.parse_args(argv)
+
+    if args.comando in ENTIDADES:
+        exibir_entidade(args.comando, args.id, args.hoje)
+    elif args.comando == "top":
+        print(f"\n🏆 TOP {args.limite} {args.entidade.upper()}S - ÚLTIMOS {args.janela} DIAS ({args.ordem}):")
+        for m in metricas(args.entidade, args.janela, args.ordem, args.limite, hoje=args.hoje):
+            print(formatar_metricas(m))
+    else:
+        exibir_alertas(args.limite, args.janela, args.hoje)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
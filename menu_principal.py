@@ -1,55 +1,129 @@
+import time
+
+_INICIO = time.perf_counter()
+
+import argparse
+import importlib
+import json
 import os
 import sys
-import subprocess
 
-def executar_script(nome_arquivo):
+import banco_tkx
+
+# Cada opção roda no próprio processo: o módulo é importado na primeira vez que é escolhido
+# e todos usam a mesma conexão de banco_tkx, já aberta (e migrada) na inicialização.
+# opção -> (rótulo, módulo, função de entrada)
+COMANDOS = {
+    '1': ("Cadastrar Motorista/Cliente", "cadastro_tkx", "main"),
+    '2': ("Consultar Base (Quem está cadastrado)", "consultar_base", "conferir_cadastros"),
+    '3': ("Simular Preço de Corrida (Dinâmicas)", "simulador_preco", "main"),
+    '4': ("Relatório de Repasse (Pagamento)", "relatorio_repasse", "main"),
+    '5': ("Dashboard Financeiro (Lucro Líquido)", "dashboard_financeiro", "main"),
+    '6': ("Gerar Recibo de Corrida", "gerar_recibo", "main"),
+    '7': ("BI OPERACIONAL (Performance por Turno)", "bi_operacional", "bi_operacional"),
+    '8': ("BI ESTRATÉGICO (RX de Lucro, Mercado e Clientes)", "bi_estrategico", "bi_estrategico"),
+}
+
+# Relatórios não interativos (cron): nome -> (módulo, função de dados, função que imprime)
+RELATORIOS = {
+    "bi-operacional": ("bi_operacional", "dados_bi_operacional", "bi_operacional"),
+    "bi-estrategico": ("bi_estrategico", "dados_bi_estrategico", "bi_estrategico"),
+    "dashboard-financeiro": ("consolidado_dre", "totais_periodo", "dashboard_financeiro.exibir_resumo_mensal"),
+    "cadastros": ("consultar_base", "dados_cadastros", "conferir_cadastros"),
+    "distribuicao-precos": ("distribuicao_precos", "dados_distribuicao", "main"),
+}
+
+
+def carregar(modulo, funcao):
+    """Importa o módulo só quando for usado e devolve a função pedida ("mod.func" também vale)."""
+    if "." in funcao:
+        modulo, funcao = funcao.rsplit(".", 1)
+    return getattr(importlib.import_module(modulo), funcao)
+
+
+def executar_comando(opcao):
+    """Roda a opção do menu e devolve o tempo gasto em ms."""
+    _, modulo, funcao = COMANDOS[opcao]
+    inicio = time.perf_counter()
     try:
-        subprocess.run([sys.executable, nome_arquivo])
-        input("\nTarefa concluída. Pressione ENTER para retornar...")
+        carregar(modulo, funcao)()
     except Exception as e:
-        print(f"\n❌ Erro ao abrir {nome_arquivo}: {e}")
-        input("Pressione ENTER...")
+        print(f"\n❌ Erro ao executar {modulo}: {e}")
+    return (time.perf_counter() - inicio) * 1000
+
+
+def _para_json(obj):
+    """namedtuples viram objetos; o resto segue como o json já sabe tratar."""
+    if hasattr(obj, "_asdict"):
+        dados = {k: _para_json(v) for k, v in obj._asdict().items()}
+        if hasattr(obj, "lucro_liquido"):
+            dados["lucro_liquido"] = obj.lucro_liquido
+        return dados
+    if isinstance(obj, dict):
+        return {k: _para_json(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_para_json(v) for v in obj]
+    return obj
+
+
+def relatorio(nome, como_json=False):
+    """Modo não interativo: imprime o relatório (ou os dados em JSON) e sai."""
+    modulo, dados, texto = RELATORIOS[nome]
+    inicio = time.perf_counter()
+    if como_json:
+        print(json.dumps(_para_json(carregar(modulo, dados)()), ensure_ascii=False, indent=2))
+    else:
+        carregar(modulo, texto)()
+    # Tempos no stderr para não misturar com o JSON
+    print(f"⏱️ inicialização {(inicio - _INICIO) * 1000:.0f} ms | {nome} {(time.perf_counter() - inicio) * 1000:.1f} ms",
+          file=sys.stderr)
+
+
+def limpar_tela():
+    if os.name == 'nt':
+        os.system('cls')
+    else:
+        print("\033[2J\033[H", end="")
+
 
 def exibir_menu():
+    banco_tkx.conectar()  # conexão aquecida para todos os comandos
+    tempo_inicio = (time.perf_counter() - _INICIO) * 1000
+    ultimo = None
     while True:
-        os.system('cls' if os.name == 'nt' else 'clear')
+        limpar_tela()
         print("\n" + "="*60)
         print("      SISTEMA DE GESTÃO TKX - FRANCA (BI ATIVADO)")
         print("="*60)
-        print("[1] Cadastrar Motorista/Cliente")
-        print("[2] Consultar Base (Quem está cadastrado)")
-        print("[3] Simular Preço de Corrida (Dinâmicas)")
-        print("[4] Relatório de Repasse (Pagamento)")
-        print("[5] Dashboard Financeiro (Lucro Líquido)")
-        print("[6] Gerar Recibo de Corrida")
-        print("-" * 60)
-        print("[7] BI OPERACIONAL (Performance 06h-18h / 18h-06h)")
-        print("[8] BI ESTRATÉGICO (RX de Lucro, Mercado e Clientes)")
-        print("-" * 60)
+        for opcao, (rotulo, _, _) in COMANDOS.items():
+            print(f"[{opcao}] {rotulo}")
+            if opcao in ('6', '8'):
+                print("-" * 60)
         print("[0] Sair")
         print("="*60)
-        
-        opcao = input("Escolha uma opção: ")
+        print(f"⏱️ Inicialização: {tempo_inicio:.0f} ms" + (f" | último comando: {ultimo:.1f} ms" if ultimo is not None else ""))
 
-        scripts = {
-            '1': 'cadastro_tkx.py', '2': 'consultar_base.py',
-            '3': 'simulador_preco.py', '4': 'relatorio_repasse.py',
-            '5': 'dashboard_financeiro.py', '6': 'gerar_recibo.py',
-            '7': 'bi_operacional.py', '8': 'bi_estrategico.py'
-        }
+        opcao = input("Escolha uma opção: ")
 
         if opcao == '0':
             print("Saindo... TKX operando com sucesso!")
             break
-        elif opcao in scripts:
-            if os.path.exists(scripts[opcao]):
-                executar_script(scripts[opcao])
-            else:
-                print(f"\n❌ Arquivo {scripts[opcao]} não encontrado!")
-                input("Pressione ENTER...")
+        elif opcao in COMANDOS:
+            ultimo = executar_comando(opcao)
+            input(f"\nTarefa concluída em {ultimo:.1f} ms. Pressione ENTER para retornar...")
         else:
             print("⚠️ Opção inválida!")
             input("Pressione ENTER...")
 
+
 if __name__ == "__main__":
-    exibir_menu()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        parser = argparse.ArgumentParser(description="Relatórios TKX sem o menu interativo (ex.: para o cron).")
+        sub = parser.add_subparsers(dest="comando", required=True)
+        rel = sub.add_parser("report", help="gera um relatório e sai")
+        rel.add_argument("nome", choices=sorted(RELATORIOS))
+        rel.add_argument("--json", action="store_true", help="saída em JSON")
+        args = parser.parse_args()
+        relatorio(args.nome, args.json)
+    else:
+        exibir_menu()
@@ -0,0 +1,1081 @@
+import math
+import os
+import re
+import sqlite3
+import sys
+
+# Cada migração roda uma única vez, na ordem, e grava seu número em PRAGMA user_version.
+# Para mudar o schema: adicione uma função _mNNN e registre em MIGRACOES. Nunca edite
+# uma migração que já foi aplicada em produção.
+
+CAMINHO_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+# Colunas que o historico_corridas ganhou depois do schema.sql original
+COLUNAS_HISTORICO = [
+    ("data_cadastro", "DATETIME"),
+    ("local_partida", "TEXT"),
+    ("local_chegada", "TEXT"),
+    ("hora_partida", "TEXT"),
+    ("hora_chegada", "TEXT"),
+    ("tempo_total", "TEXT"),
+    ("preco_concorrente", "REAL"),
+    ("avaliacao_motorista", "INTEGER"),
+    ("cliente_id", "INTEGER"),
+]
+
+
+def _tabela_existe(cursor, tabela):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,))
+    return cursor.fetchone() is not None
+
+
+def _colunas(cursor, tabela):
+    return {linha[1] for linha in cursor.execute(f"PRAGMA table_info({tabela})")}
+
+
+def _instrucoes_schema():
+    """Quebra o schema.sql em instruções completas (sem executescript, que faz COMMIT)."""
+    with open(CAMINHO_SCHEMA, encoding="utf-8") as f:
+        linhas = [l for l in f.read().splitlines() if not l.strip().startswith("--")]
+    instrucoes, atual = [], ""
+    for linha in linhas:
+        atual += linha + "\n"
+        if sqlite3.complete_statement(atual):
+            instrucoes.append(atual.strip())
+            atual = ""
+    return instrucoes
+
+
+def _m001_schema_base(cursor):
+    """Reconcilia o schema.sql com o banco que já está em uso (tabelas que divergiram)."""
+    instrucoes = _instrucoes_schema()
+    criacoes = [i for i in instrucoes if i.upper().startswith("CREATE")]
+    cargas = [i for i in instrucoes if not i.upper().startswith("CREATE")]
+
+    for sql in criacoes:
+        cursor.execute(sql)
+
+    # Bancos criados com o schema.sql antigo não têm as colunas novas do histórico
+    existentes = _colunas(cursor, "historico_corridas")
+    for nome, tipo in COLUNAS_HISTORICO:
+        if nome not in existentes:
+            cursor.execute(f"ALTER TABLE historico_corridas ADD COLUMN {nome} {tipo}")
+    if "data_corrida" in existentes and "data_cadastro" not in existentes:
+        cursor.execute("UPDATE historico_corridas SET data_cadastro = data_corrida WHERE data_cadastro IS NULL")
+
+    # Legado: grade_horarios -> tarifas_dinamicas (só se a nova ainda estiver vazia)
+    cursor.execute("SELECT COUNT(*) FROM tarifas_dinamicas")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("""
+            INSERT INTO tarifas_dinamicas (periodo, hora_inicio, hora_fim, multiplicador)
+            SELECT periodo, hora_inicio, hora_fim, multiplicador FROM grade_horarios ORDER BY id
+        """)
+
+    # Legado: clientes_cadastro -> clientes (mantém o id para não quebrar historico_corridas.cliente_id)
+    if _tabela_existe(cursor, "clientes_cadastro"):
+        cursor.execute("""
+            INSERT OR IGNORE INTO clientes (id, nome, telefone, email)
+            SELECT id, nome, telefone, email FROM clientes_cadastro
+            WHERE nome IS NOT NULL AND telefone IS NOT NULL
+        """)
+
+    # Legado: motoristas não tem CPF (obrigatório em motoristas_cadastro), então só é mantida.
+
+    for sql in cargas:
+        cursor.execute(sql)
+
+
+def _m002_indices_bi(cursor):
+    """Índices para BI operacional/estratégico, repasse e fidelidade."""
+    # Repasse (WHERE motorista_id = ?) e ranking de turnos: cobre motorista + hora + comissão
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_motorista ON historico_corridas (motorista_id, hora_partida, taxa_app_valor)")
+    # Fidelidade de clientes
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_cliente ON historico_corridas (cliente_id)")
+    # Comparativo de mercado (WHERE preco_concorrente IS NOT NULL)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_concorrente ON historico_corridas (preco_concorrente, valor_total_pago)")
+    # Top corridas por margem líquida (ORDER BY lucro DESC LIMIT 5)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_lucro ON historico_corridas ((taxa_app_valor - custo_gateway - custos_fixos_totais))")
+    # Nota média da frota
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_avaliacao ON historico_corridas (avaliacao_motorista)")
+    # Filtros por período (extratos, DRE mensal)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_data ON historico_corridas (data_cadastro)")
+
+
+# Consolidados do DRE: (tabela, colunas-chave, expressões da chave sobre a linha da corrida)
+# A palavra LINHA é trocada por NEW/OLD nos gatilhos e removida no recálculo completo.
+CHAVE_DIA = "COALESCE(date(LINHA.data_cadastro), '0000-00-00')"
+CHAVE_MES = "COALESCE(strftime('%Y-%m', LINHA.data_cadastro), '0000-00')"
+# Turno configurado (turnos.id) da corrida; -1 sem horário ou fora dos turnos
+CHAVE_TURNO_ID = "COALESCE(LINHA.turno_id, -1)"
+CONSOLIDADOS_DRE = [
+    ("dre_diario", ["dia"], [CHAVE_DIA]),
+    ("dre_mensal", ["mes"], [CHAVE_MES]),
+    ("dre_turno", ["mes", "turno_id"], [CHAVE_MES, CHAVE_TURNO_ID]),
+    ("dre_motorista", ["mes", "motorista_id"], [CHAVE_MES, "COALESCE(LINHA.motorista_id, 0)"]),
+]
+METRICAS_DRE = [
+    ("corridas", "1"),
+    ("bruto", "COALESCE(LINHA.valor_total_pago, 0)"),
+    ("comissao", "COALESCE(LINHA.taxa_app_valor, 0)"),
+    ("gateway", "COALESCE(LINHA.custo_gateway, 0)"),
+    ("fixos", "COALESCE(LINHA.custos_fixos_totais, 0)"),
+]
+# turno_id: o gatilho de turno o preenche depois da inserção e banco_tkx.configurar_turnos o reescreve
+COLUNAS_GATILHO_DRE = "valor_total_pago, taxa_app_valor, custo_gateway, custos_fixos_totais, data_cadastro, turno_id, motorista_id"
+# Até a migração 20 o dre_turno era por DIURNO/NOTURNO fixos (06h-18h), de antes do
+# turno_id: é o que as migrações 3 e 8 criam, e a 20 troca pelos de cima
+CHAVE_TURNO_FIXO = ("CASE WHEN LINHA.hora_partida IS NULL THEN 'SEM HORARIO' "
+                    "WHEN LINHA.hora_partida >= '06:00' AND LINHA.hora_partida < '18:00' THEN 'DIURNO' "
+                    "ELSE 'NOTURNO' END")
+CONSOLIDADOS_DRE_M003 = [(t, ["mes", "turno"], [CHAVE_MES, CHAVE_TURNO_FIXO]) if t == "dre_turno" else (t, c, e)
+                         for t, c, e in CONSOLIDADOS_DRE]
+COLUNAS_GATILHO_DRE_M003 = COLUNAS_GATILHO_DRE.replace("turno_id", "hora_partida")
+
+
+def _upsert_consolidado(tabela, chaves, expressoes, linha, sinal):
+    """INSERT ... ON CONFLICT que soma (sinal=+1) ou desconta (sinal=-1) uma corrida do consolidado."""
+    colunas = chaves + [m for m, _ in METRICAS_DRE]
+    valores = [e.replace("LINHA", linha) for e in expressoes]
+    valores += [f"{'-' if sinal < 0 else ''}{e.replace('LINHA', linha)}" for _, e in METRICAS_DRE]
+    atualizacoes = ", ".join(f"{m} = {m} + excluded.{m}" for m, _ in METRICAS_DRE)
+    return (f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join(valores)}) "
+            f"ON CONFLICT({', '.join(chaves)}) DO UPDATE SET {atualizacoes};")
+
+
+def sql_recalculo_consolidado(tabela, chaves, expressoes, filtro="", fonte="historico_corridas"):
+    """INSERT ... SELECT que recalcula um consolidado inteiro a partir do histórico (ou de `fonte`)."""
+    exprs = [e.replace("LINHA.", "") for e in expressoes]
+    metricas = [("COUNT(*)" if m == "corridas" else f"SUM({e.replace('LINHA.', '')})") for m, e in METRICAS_DRE]
+    colunas = chaves + [m for m, _ in METRICAS_DRE]
+    return (f"INSERT INTO {tabela} ({', '.join(colunas)}) "
+            f"SELECT {', '.join(exprs + metricas)} FROM {fonte} {filtro} "
+            f"GROUP BY {', '.join(exprs)}")
+
+
+def _m003_consolidados_dre(cursor):
+    """Tabelas de consolidação do DRE (dia, mês, turno, motorista) mantidas por gatilhos."""
+    for tabela, chaves, expressoes in CONSOLIDADOS_DRE_M003:
+        colunas_chave = ", ".join(f"{c} {'INTEGER' if c.endswith('_id') else 'TEXT'} NOT NULL" for c in chaves)
+        colunas_metricas = ", ".join(f"{m} {'INTEGER' if m == 'corridas' else 'REAL'} NOT NULL DEFAULT 0" for m, _ in METRICAS_DRE)
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {tabela} ({colunas_chave}, {colunas_metricas}, PRIMARY KEY ({', '.join(chaves)})) WITHOUT ROWID")
+
+    insercao = "\n".join(_upsert_consolidado(t, c, e, "NEW", +1) for t, c, e in CONSOLIDADOS_DRE_M003)
+    remocao = "\n".join(_upsert_consolidado(t, c, e, "OLD", -1) for t, c, e in CONSOLIDADOS_DRE_M003)
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_dre_insercao AFTER INSERT ON historico_corridas BEGIN\n{insercao}\nEND")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_dre_remocao AFTER DELETE ON historico_corridas BEGIN\n{remocao}\nEND")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_dre_alteracao AFTER UPDATE OF {COLUNAS_GATILHO_DRE_M003} ON historico_corridas BEGIN\n{remocao}\n{insercao}\nEND")
+
+    # Carga inicial com o que já existe no histórico
+    for tabela, chaves, expressoes in CONSOLIDADOS_DRE_M003:
+        cursor.execute(f"DELETE FROM {tabela}")
+        cursor.execute(sql_recalculo_consolidado(tabela, chaves, expressoes))
+
+
+def criar_contador_alteracoes(cursor, tabela):
+    """Gatilhos que incrementam versoes_tabelas.versao a cada escrita na tabela."""
+    cursor.execute("INSERT OR IGNORE INTO versoes_tabelas (tabela, versao) VALUES (?, 0)", (tabela,))
+    for evento in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_versao_{tabela}_{evento.lower()} AFTER {evento} ON {tabela}
+            BEGIN UPDATE versoes_tabelas SET versao = versao + 1 WHERE tabela = '{tabela}'; END
+        """)
+
+
+def _m004_versoes_tabelas(cursor):
+    """Contador de alterações por tabela (invalida caches como a grade de tarifas)."""
+    cursor.execute("CREATE TABLE IF NOT EXISTS versoes_tabelas (tabela TEXT PRIMARY KEY, versao INTEGER NOT NULL DEFAULT 0)")
+    for tabela in ("tarifas_dinamicas", "grade_horarios"):
+        criar_contador_alteracoes(cursor, tabela)
+
+
+def _m005_repasses(cursor):
+    """Execuções de repasse semanal e marcação das corridas já pagas."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS repasses_execucoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            inicio TEXT NOT NULL,
+            fim TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'em_andamento', -- em_andamento, concluido, falhou
+            executado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            motoristas INTEGER DEFAULT 0,
+            corridas INTEGER DEFAULT 0,
+            total_repasse REAL DEFAULT 0,
+            arquivo TEXT
+        )
+    """)
+    if "repasse_id" not in _colunas(cursor, "historico_corridas"):
+        cursor.execute("ALTER TABLE historico_corridas ADD COLUMN repasse_id INTEGER REFERENCES repasses_execucoes(id)")
+    # Só as corridas ainda não pagas, já na ordem em que o repasse as percorre
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_a_repassar ON historico_corridas (motorista_id, data_cadastro) WHERE repasse_id IS NULL")
+
+
+# Minuto do dia (0..1439) a partir de hora_partida 'HH:MM'; LINHA como nos consolidados
+EXPR_MINUTO_DIA = ("(CAST(substr(LINHA.hora_partida, 1, 2) AS INTEGER) * 60 "
+                   "+ CAST(substr(LINHA.hora_partida, 4, 2) AS INTEGER))")
+
+# Tabela minuto -> turno recompilada a partir de turnos. Fim exclusivo; início maior que o
+# fim atravessa a meia-noite; sobreposição fica com o turno de menor id.
+SQL_COMPILAR_TURNOS = """
+    INSERT INTO turnos_minutos (minuto, turno_id)
+    WITH RECURSIVE minutos(m) AS (SELECT 0 UNION ALL SELECT m + 1 FROM minutos WHERE m < 1439),
+    faixas AS (
+        SELECT id,
+               CAST(substr(hora_inicio, 1, 2) AS INTEGER) * 60 + CAST(substr(hora_inicio, 4, 2) AS INTEGER) AS ini,
+               CAST(substr(hora_fim, 1, 2) AS INTEGER) * 60 + CAST(substr(hora_fim, 4, 2) AS INTEGER) AS fim
+        FROM turnos
+    )
+    SELECT m, (SELECT id FROM faixas
+               WHERE CASE WHEN ini < fim THEN m >= ini AND m < fim
+                          WHEN ini > fim THEN m >= ini OR m < fim
+                          ELSE 1 END
+               ORDER BY id LIMIT 1)
+    FROM minutos
+"""
+
+
+def sql_preencher_turnos(filtro=""):
+    """UPDATE que (re)calcula minuto_dia e turno_id das corridas já gravadas."""
+    minuto = EXPR_MINUTO_DIA.replace("LINHA.", "")
+    return (f"UPDATE historico_corridas SET minuto_dia = {minuto}, "
+            f"turno_id = (SELECT turno_id FROM turnos_minutos WHERE minuto = {minuto}) "
+            f"WHERE hora_partida IS NOT NULL {filtro}")
+
+
+def _m006_turnos(cursor):
+    """Turnos configuráveis e minuto do dia/turno gravados em cada corrida."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS turnos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL UNIQUE,
+            hora_inicio TEXT NOT NULL, -- HH:MM (inclusive)
+            hora_fim TEXT NOT NULL     -- HH:MM (exclusive)
+        )
+    """)
+    cursor.execute("CREATE TABLE IF NOT EXISTS turnos_minutos (minuto INTEGER PRIMARY KEY, turno_id INTEGER) WITHOUT ROWID")
+    cursor.execute("SELECT COUNT(*) FROM turnos")
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany("INSERT INTO turnos (nome, hora_inicio, hora_fim) VALUES (?, ?, ?)",
+                           [("DIURNO", "06:00", "18:00"), ("NOTURNO", "18:00", "06:00")])
+    cursor.execute("DELETE FROM turnos_minutos")
+    cursor.execute(SQL_COMPILAR_TURNOS)
+
+    existentes = _colunas(cursor, "historico_corridas")
+    for coluna in ("minuto_dia", "turno_id"):
+        if coluna not in existentes:
+            cursor.execute(f"ALTER TABLE historico_corridas ADD COLUMN {coluna} INTEGER")
+
+    # Derivados na gravação: quem já informa minuto_dia e turno_id não paga o UPDATE extra
+    minuto = EXPR_MINUTO_DIA.replace("LINHA", "NEW")
+    for nome, evento, condicao in (
+        ("trg_turno_insercao", "INSERT", "NEW.hora_partida IS NOT NULL AND (NEW.minuto_dia IS NULL OR NEW.turno_id IS NULL)"),
+        ("trg_turno_alteracao", "UPDATE OF hora_partida", "NEW.hora_partida IS NOT OLD.hora_partida"),
+    ):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {nome} AFTER {evento} ON historico_corridas
+            WHEN {condicao}
+            BEGIN
+                UPDATE historico_corridas SET minuto_dia = {minuto},
+                    turno_id = (SELECT turno_id FROM turnos_minutos WHERE minuto = {minuto})
+                WHERE id = NEW.id;
+            END
+        """)
+
+    cursor.execute(sql_preencher_turnos())
+    # Ranking por turno numa varredura só do índice (turno, motorista, comissão)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_turno ON historico_corridas (turno_id, motorista_id, taxa_app_valor)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_minuto ON historico_corridas (minuto_dia)")
+
+
+def _m007_contadores_relatorios(cursor):
+    """Contador de alterações das tabelas lidas pelos relatórios (invalida o cache de resultados)."""
+    for tabela in ("historico_corridas", "motoristas_cadastro", "clientes", "turnos"):
+        criar_contador_alteracoes(cursor, tabela)
+
+
+def _m008_particoes_corridas(cursor):
+    """Registro das partições mensais do histórico (meses fechados) e trava do arquivamento."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS particoes_corridas (
+            mes TEXT PRIMARY KEY,                 -- AAAA-MM
+            esquema TEXT NOT NULL DEFAULT 'main', -- main ou arquivo (banco anexado)
+            tabela TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'movendo', -- movendo, fechada
+            corridas INTEGER NOT NULL DEFAULT 0,
+            primeiro_id INTEGER,
+            ultimo_id INTEGER,
+            versao_turnos INTEGER,                -- versoes_tabelas dos turnos quando o turno_id foi gravado
+            fechada_em DATETIME
+        )
+    """)
+    criar_contador_alteracoes(cursor, "particoes_corridas")
+    # Com uma linha aqui (só dentro da transação do particionamento), apagar do histórico
+    # é mover para a partição: os consolidados do DRE não descontam a corrida
+    cursor.execute("CREATE TABLE IF NOT EXISTS arquivamento_em_curso (mes TEXT PRIMARY KEY)")
+    remocao = "\n".join(_upsert_consolidado(t, c, e, "OLD", -1) for t, c, e in CONSOLIDADOS_DRE_M003)
+    cursor.execute("DROP TRIGGER IF EXISTS trg_dre_remocao")
+    cursor.execute(f"""
+        CREATE TRIGGER trg_dre_remocao AFTER DELETE ON historico_corridas
+        WHEN NOT EXISTS (SELECT 1 FROM arquivamento_em_curso)
+        BEGIN
+        {remocao}
+        END
+    """)
+
+
+# Lucro líquido da TKX por corrida, coluna gerada do historico_corridas desde a migração 9.
+# COLUNAS_GERADAS serve para ler partições fechadas antes de a coluna existir.
+EXPR_LUCRO_LIQUIDO = "taxa_app_valor - custo_gateway - custos_fixos_totais"
+COLUNAS_GERADAS = {"lucro_liquido": EXPR_LUCRO_LIQUIDO}
+
+# Placares (top-K por mês) mantidos pelos gatilhos, como os consolidados do DRE.
+# Agregados: uma linha por (mês, entidade); o índice (mes, coluna de ordem) entrega o top-K
+# de um mês lendo só K entradas. (tabela, entidade, condição, métricas, geradas, coluna de ordem)
+PLACARES_AGREGADOS = [
+    ("placar_clientes", "cliente_id", "LINHA.cliente_id IS NOT NULL",
+     [("corridas", "1")], [], "corridas"),
+    ("placar_avaliacoes", "motorista_id", "LINHA.motorista_id IS NOT NULL AND LINHA.avaliacao_motorista IS NOT NULL",
+     [("avaliacoes", "1"), ("soma_notas", "LINHA.avaliacao_motorista")],
+     [("media", "soma_notas * 1.0 / NULLIF(avaliacoes, 0)")], "media"),
+]
+COLUNAS_GATILHO_PLACARES = "cliente_id, motorista_id, avaliacao_motorista, data_cadastro"
+# Corridas mais lucrativas: só as K_PLACAR melhores de cada mês ficam em placar_corridas_lucro.
+# O top-K do histórico inteiro sai da união dos meses (toda corrida do top geral está no top do seu mês).
+K_PLACAR = 50
+COLUNAS_GATILHO_LUCRO = "taxa_app_valor, custo_gateway, custos_fixos_totais, data_cadastro"
+
+
+def _upsert_placar(tabela, entidade, condicao, metricas, linha, sinal):
+    colunas = ["mes", entidade] + [m for m, _ in metricas]
+    valores = [CHAVE_MES.replace("LINHA", linha), f"{linha}.{entidade}"]
+    valores += [f"{'-' if sinal < 0 else ''}{e.replace('LINHA', linha)}" for _, e in metricas]
+    atualizacoes = ", ".join(f"{m} = {m} + excluded.{m}" for m, _ in metricas)
+    return (f"INSERT INTO {tabela} ({', '.join(colunas)}) SELECT {', '.join(valores)} "
+            f"WHERE {condicao.replace('LINHA', linha)} "
+            f"ON CONFLICT(mes, {entidade}) DO UPDATE SET {atualizacoes};")
+
+
+def _sql_podar_lucro(mes):
+    """Deixa só as K_PLACAR melhores corridas do mês no placar."""
+    return (f"DELETE FROM placar_corridas_lucro WHERE mes = {mes} AND corrida_id IN ("
+            f"SELECT corrida_id FROM placar_corridas_lucro WHERE mes = {mes} "
+            f"ORDER BY lucro DESC, corrida_id LIMIT -1 OFFSET {K_PLACAR});")
+
+
+def _sql_candidata_lucro():
+    """NEW entra no placar do seu mês se supera a K-ésima (ou se o mês ainda tem menos de K)."""
+    mes = CHAVE_MES.replace("LINHA", "NEW")
+    return (f"INSERT OR IGNORE INTO placar_corridas_lucro (mes, corrida_id, lucro) "
+            f"SELECT {mes}, NEW.id, NEW.lucro_liquido WHERE NEW.lucro_liquido IS NOT NULL "
+            f"AND NEW.lucro_liquido > COALESCE((SELECT lucro FROM placar_corridas_lucro WHERE mes = {mes} "
+            f"ORDER BY lucro DESC LIMIT 1 OFFSET {K_PLACAR - 1}), -1e308);\n" + _sql_podar_lucro(mes))
+
+
+def _sql_saida_lucro():
+    """OLD sai do placar e a vaga é preenchida de novo a partir das corridas do mês."""
+    mes = CHAVE_MES.replace("LINHA", "OLD")
+    return (f"DELETE FROM placar_corridas_lucro WHERE mes = {mes} AND corrida_id = OLD.id;\n"
+            f"INSERT OR IGNORE INTO placar_corridas_lucro (mes, corrida_id, lucro) "
+            f"SELECT {mes}, id, lucro_liquido FROM historico_corridas "
+            f"WHERE data_cadastro >= {mes} || '-01' AND data_cadastro < date({mes} || '-01', '+1 month') "
+            f"AND lucro_liquido IS NOT NULL ORDER BY lucro_liquido DESC LIMIT {K_PLACAR};\n" + _sql_podar_lucro(mes))
+
+
+def sql_recalculo_placares(filtro="", fonte="historico_corridas"):
+    """INSERT ... SELECT de cada placar a partir do histórico (ou de `fonte`); `filtro` começa com AND."""
+    mes = CHAVE_MES.replace("LINHA.", "")
+    instrucoes = []
+    for tabela, entidade, condicao, metricas, _, _ in PLACARES_AGREGADOS:
+        somas = [f"SUM({e.replace('LINHA.', '')})" for _, e in metricas]
+        instrucoes.append(
+            f"INSERT INTO {tabela} (mes, {entidade}, {', '.join(m for m, _ in metricas)}) "
+            f"SELECT {mes}, {entidade}, {', '.join(somas)} FROM {fonte} "
+            f"WHERE {condicao.replace('LINHA.', '')} {filtro} GROUP BY 1, 2")
+    instrucoes.append(
+        f"INSERT INTO placar_corridas_lucro (mes, corrida_id, lucro) "
+        f"SELECT mes, id, lucro_liquido FROM ("
+        f"SELECT {mes} AS mes, id, lucro_liquido, "
+        f"ROW_NUMBER() OVER (PARTITION BY {mes} ORDER BY lucro_liquido DESC, id) AS posicao "
+        f"FROM {fonte} WHERE lucro_liquido IS NOT NULL {filtro}) WHERE posicao <= {K_PLACAR}")
+    return instrucoes
+
+
+TABELAS_PLACARES = [t for t, *_ in PLACARES_AGREGADOS] + ["placar_corridas_lucro"]
+
+
+def _m009_lucro_e_placares(cursor):
+    """Lucro líquido como coluna gerada indexada e placares top-K por mês."""
+    if "lucro_liquido" not in {l[1] for l in cursor.execute("PRAGMA table_xinfo(historico_corridas)")}:
+        # ADD COLUMN só aceita coluna gerada VIRTUAL; o índice guarda o valor calculado
+        cursor.execute(f"ALTER TABLE historico_corridas ADD COLUMN lucro_liquido REAL "
+                       f"GENERATED ALWAYS AS ({EXPR_LUCRO_LIQUIDO}) VIRTUAL")
+    cursor.execute("DROP INDEX IF EXISTS idx_corridas_lucro")  # a expressão virou a coluna
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_corridas_lucro_liquido ON historico_corridas (lucro_liquido)")
+    # Ranking de motoristas por comissão: o dre_motorista já é o placar, falta a ordem
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dre_motorista_comissao ON dre_motorista (mes, comissao)")
+
+    for tabela, entidade, _, metricas, geradas, ordem in PLACARES_AGREGADOS:
+        colunas = [f"{m} {'REAL' if m.startswith('soma') else 'INTEGER'} NOT NULL DEFAULT 0" for m, _ in metricas]
+        colunas += [f"{g} REAL GENERATED ALWAYS AS ({e}) VIRTUAL" for g, e in geradas]
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {tabela} (mes TEXT NOT NULL, {entidade} INTEGER NOT NULL, "
+                       f"{', '.join(colunas)}, PRIMARY KEY (mes, {entidade})) WITHOUT ROWID")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_{ordem} ON {tabela} (mes, {ordem})")
+    cursor.execute("CREATE TABLE IF NOT EXISTS placar_corridas_lucro (mes TEXT NOT NULL, corrida_id INTEGER NOT NULL, "
+                   "lucro REAL NOT NULL, PRIMARY KEY (mes, corrida_id)) WITHOUT ROWID")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_placar_corridas_lucro ON placar_corridas_lucro (mes, lucro)")
+
+    insercao = "\n".join(_upsert_placar(t, e, c, m, "NEW", +1) for t, e, c, m, _, _ in PLACARES_AGREGADOS)
+    remocao = "\n".join(_upsert_placar(t, e, c, m, "OLD", -1) for t, e, c, m, _, _ in PLACARES_AGREGADOS)
+    fora_do_arquivamento = "NOT EXISTS (SELECT 1 FROM arquivamento_em_curso)"
+    no_placar = ("EXISTS (SELECT 1 FROM placar_corridas_lucro WHERE mes = "
+                 f"{CHAVE_MES.replace('LINHA', 'OLD')} AND corrida_id = OLD.id)")
+    for nome, evento, condicao, corpo in (
+        ("trg_placares_insercao", "INSERT", "1", insercao + "\n" + _sql_candidata_lucro()),
+        ("trg_placares_remocao", "DELETE", fora_do_arquivamento, remocao),
+        ("trg_placares_alteracao", f"UPDATE OF {COLUNAS_GATILHO_PLACARES}", "1", remocao + "\n" + insercao),
+        # Corrida do placar apagada ou alterada: sai e a vaga é reabastecida pelo histórico do mês
+        ("trg_placar_lucro_remocao", "DELETE", f"{fora_do_arquivamento} AND {no_placar}", _sql_saida_lucro()),
+        ("trg_placar_lucro_saida", f"UPDATE OF {COLUNAS_GATILHO_LUCRO}", no_placar, _sql_saida_lucro()),
+        ("trg_placar_lucro_entrada", f"UPDATE OF {COLUNAS_GATILHO_LUCRO}", "1", _sql_candidata_lucro()),
+    ):
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {nome} AFTER {evento} ON historico_corridas "
+                       f"WHEN {condicao}\nBEGIN\n{corpo}\nEND")
+
+    # Carga inicial: histórico vivo e partições no banco principal (meses já levados ao
+    # arquivo entram no próximo consolidado_dre.reconstruir_consolidados)
+    colunas = "id, data_cadastro, cliente_id, motorista_id, avaliacao_motorista"
+    partes = [f"SELECT {colunas}, lucro_liquido FROM historico_corridas"]
+    if _tabela_existe(cursor, "particoes_corridas"):
+        for (tabela,) in cursor.execute("SELECT tabela FROM particoes_corridas WHERE esquema = 'main'").fetchall():
+            partes.append(f"SELECT {colunas}, {EXPR_LUCRO_LIQUIDO} FROM {tabela}")
+    for tabela in TABELAS_PLACARES:
+        cursor.execute(f"DELETE FROM {tabela}")
+    for sql in sql_recalculo_placares(fonte=f"({' UNION ALL '.join(partes)})"):
+        cursor.execute(sql)
+
+
+def _m010_ingestao(cursor):
+    """Chave de idempotência das corridas ingeridas e posição já gravada de cada spool."""
+    if "chave_ingestao" not in _colunas(cursor, "historico_corridas"):
+        cursor.execute("ALTER TABLE historico_corridas ADD COLUMN chave_ingestao TEXT")
+    # Parcial: corridas de outras origens (popular_bi, legado) não têm chave
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_corridas_chave_ingestao
+        ON historico_corridas (chave_ingestao) WHERE chave_ingestao IS NOT NULL
+    """)
+    cursor.execute("CREATE TABLE IF NOT EXISTS ingestao_spool (arquivo TEXT PRIMARY KEY, posicao INTEGER NOT NULL DEFAULT 0)")
+
+
+# Busca de cadastros: um índice FTS5 com motoristas (rowid 2*id) e clientes (rowid 2*id + 1).
+# remove_diacritics: "joao" acha "João"; prefix: índices prontos para buscas de 2 e 3 letras.
+# Documentos (CPF, placa, telefone) entram sem pontuação, como busca_cadastros monta os
+# termos com dígitos: "123.456.789-09" é indexado e buscado como 12345678909.
+PONTUACAO_DOCUMENTOS = ".-()/ "
+
+
+def _sem_pontuacao(expressao):
+    for caractere in PONTUACAO_DOCUMENTOS:
+        expressao = f"replace({expressao}, '{caractere}', '')"
+    return expressao
+
+
+DOCUMENTOS_BUSCA = {
+    "motoristas_cadastro": " || ' ' || ".join([
+        _sem_pontuacao("coalesce({l}.cpf, '')"), _sem_pontuacao("coalesce({l}.placa, '')"),
+        _sem_pontuacao("coalesce({l}.telefone, '')"), "substr(" + _sem_pontuacao("coalesce({l}.telefone, '')") + ", 3)"]),
+    "clientes": " || ' ' || ".join([
+        _sem_pontuacao("coalesce({l}.telefone, '')"), "substr(" + _sem_pontuacao("coalesce({l}.telefone, '')") + ", 3)",
+        "coalesce({l}.email, '')"]),
+}
+ROWID_BUSCA = {"motoristas_cadastro": "2 * {l}.id", "clientes": "2 * {l}.id + 1"}
+COLUNAS_BUSCA = {"motoristas_cadastro": "nome, cpf, placa, telefone", "clientes": "nome, telefone, email"}
+
+
+def _gatilhos_e_carga_busca(cursor):
+    """(Re)cria os gatilhos que mantêm o índice de busca e o recarrega a partir dos cadastros."""
+    for tabela, documentos in DOCUMENTOS_BUSCA.items():
+        rowid = ROWID_BUSCA[tabela]
+        inserir = (f"INSERT INTO busca_cadastros (rowid, nome, documentos) "
+                   f"VALUES ({rowid.format(l='NEW')}, NEW.nome, {documentos.format(l='NEW')});")
+        remover = f"DELETE FROM busca_cadastros WHERE rowid = {rowid.format(l='OLD')};"
+        for nome, evento, corpo in (("insercao", "INSERT", inserir), ("remocao", "DELETE", remover),
+                                    ("alteracao", f"UPDATE OF id, {COLUNAS_BUSCA[tabela]}", remover + "\n" + inserir)):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_busca_{tabela}_{nome}")
+            cursor.execute(f"CREATE TRIGGER trg_busca_{tabela}_{nome} AFTER {evento} ON {tabela} BEGIN {corpo} END")
+        cursor.execute(f"DELETE FROM busca_cadastros WHERE rowid % 2 = {0 if tabela == 'motoristas_cadastro' else 1}")
+        cursor.execute(f"INSERT INTO busca_cadastros (rowid, nome, documentos) "
+                       f"SELECT {rowid.format(l='t')}, t.nome, {documentos.format(l='t')} FROM {tabela} t")
+
+
+def _m011_busca_cadastros(cursor):
+    """Índice de busca (FTS5) dos cadastros, mantido por gatilhos, e índices da listagem paginada."""
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS busca_cadastros USING fts5(
+            nome, documentos, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    """)
+    _gatilhos_e_carga_busca(cursor)
+    # Listagem por nome (keyset: WHERE (nome, id) > (?, ?)); o id já vai junto em todo índice
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_motoristas_nome ON motoristas_cadastro (nome)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_motoristas_status_nome ON motoristas_cadastro (status, nome)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_nome ON clientes (nome)")
+
+
+# Distribuição de preços (tarifa paga, preço do concorrente e a razão entre eles) em esboços
+# de baldes logarítmicos (no estilo do DDSketch): o balde i cobre (GAMA^(i-1), GAMA^i] e
+# representa qualquer valor dele com erro relativo de no máximo ALFA_ESBOCO. Um esboço é só
+# uma contagem por balde: somar contagens junta meses, turnos, faixas ou municípios sem reler
+# corridas. Os gatilhos mantêm as contagens por (mês, turno, faixa de km): cada mês tem no
+# máximo turnos x faixas x baldes ocupados linhas, seja qual for o volume de corridas.
+ALFA_ESBOCO = 0.01
+GAMA_ESBOCO = (1 + ALFA_ESBOCO) / (1 - ALFA_ESBOCO)
+BALDES_ESBOCO = range(math.floor(math.log(1e-3, GAMA_ESBOCO)), math.ceil(math.log(1e5, GAMA_ESBOCO)) + 1)
+FAIXAS_KM = (3, 6, 10, 20)  # faixa 0: até 3 km, ..., 4: 20 km ou mais; -1: sem distância
+# (código, nome, valor sobre a linha da corrida); só valores positivos entram no esboço
+METRICAS_ESBOCO = [
+    (1, "tarifa", "LINHA.valor_total_pago"),
+    (2, "concorrente", "LINHA.preco_concorrente"),
+    (3, "razao", "LINHA.valor_total_pago * 1.0 / LINHA.preco_concorrente"),
+]
+# Código da métrica -> (tabela de limites, GAMA, baldes). A razão usa a mesma escala de 1%
+# (cerca de 1 ponto na diferença para o concorrente): baldes mais finos voltavam a dar
+# quase uma linha de esboço por corrida
+ESCALAS_ESBOCO = {
+    1: ("esboco_baldes", GAMA_ESBOCO, BALDES_ESBOCO),
+    2: ("esboco_baldes", GAMA_ESBOCO, BALDES_ESBOCO),
+    3: ("esboco_baldes", GAMA_ESBOCO, BALDES_ESBOCO),
+}
+CHAVE_FAIXA_KM = ("CASE WHEN LINHA.km_distancia IS NULL THEN -1 "
+                  + " ".join(f"WHEN LINHA.km_distancia < {k} THEN {i}" for i, k in enumerate(FAIXAS_KM))
+                  + f" ELSE {len(FAIXAS_KM)} END")
+CHAVES_ESBOCO = [("mes", CHAVE_MES), ("turno_id", CHAVE_TURNO_ID), ("faixa_km", CHAVE_FAIXA_KM)]
+# turno_id entra porque o gatilho de turno o preenche depois da inserção e
+# banco_tkx.configurar_turnos o reescreve: a corrida muda de turno no esboço junto
+COLUNAS_GATILHO_ESBOCO = "valor_total_pago, preco_concorrente, km_distancia, data_cadastro, turno_id"
+
+
+def _expr_balde(valor, codigo):
+    """Balde do valor pela tabela de limites da métrica (sem ln(), que nem todo SQLite compila)."""
+    tabela, _, baldes = ESCALAS_ESBOCO[codigo]
+    return (f"COALESCE((SELECT balde FROM {tabela} WHERE limite >= {valor} ORDER BY limite LIMIT 1), "
+            f"{baldes[-1]})")
+
+
+def _upsert_esboco(codigo, valor, linha, sinal):
+    valor = valor.replace("LINHA", linha)
+    chaves = [e.replace("LINHA", linha) for _, e in CHAVES_ESBOCO]
+    return (f"INSERT INTO esboco_precos (mes, turno_id, faixa_km, metrica, balde, n) "
+            f"SELECT {', '.join(chaves)}, {codigo}, {_expr_balde(valor, codigo)}, {sinal} WHERE {valor} > 0 "
+            f"ON CONFLICT(mes, metrica, turno_id, faixa_km, balde) DO UPDATE SET n = n + excluded.n;")
+
+
+def sql_recalculo_esbocos(filtro="", fonte="historico_corridas", metricas=None):
+    """INSERT ... SELECT de cada métrica dos esboços a partir do histórico (ou de `fonte`); `filtro` começa com AND.
+
+    `metricas` restringe aos códigos informados.
+    """
+    chaves = ", ".join(e.replace("LINHA.", "") for _, e in CHAVES_ESBOCO)
+    instrucoes = []
+    for codigo, _, valor in METRICAS_ESBOCO:
+        if metricas is not None and codigo not in metricas:
+            continue
+        valor = valor.replace("LINHA.", "")
+        instrucoes.append(
+            f"INSERT INTO esboco_precos (mes, turno_id, faixa_km, metrica, balde, n) "
+            f"SELECT {chaves}, {codigo}, {_expr_balde(valor, codigo)}, COUNT(*) FROM {fonte} "
+            f"WHERE {valor} > 0 {filtro} GROUP BY 1, 2, 3, 5")
+    return instrucoes
+
+
+def _baldes_esbocos(cursor):
+    """Tabelas de limites dos baldes, uma por escala de ESCALAS_ESBOCO."""
+    for tabela, gama, baldes in set(ESCALAS_ESBOCO.values()):
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {tabela} (limite REAL PRIMARY KEY, balde INTEGER NOT NULL) WITHOUT ROWID")
+        cursor.execute(f"DELETE FROM {tabela}")
+        cursor.executemany(f"INSERT INTO {tabela} (limite, balde) VALUES (?, ?)", [(gama ** i, i) for i in baldes])
+
+
+def _gatilhos_e_carga_esbocos(cursor, metricas=None):
+    """(Re)cria os gatilhos dos esboços e recalcula as contagens das `metricas` (None: todas)."""
+    insercao = "\n".join(_upsert_esboco(c, v, "NEW", 1) for c, _, v in METRICAS_ESBOCO)
+    remocao = "\n".join(_upsert_esboco(c, v, "OLD", -1) for c, _, v in METRICAS_ESBOCO)
+    for nome, evento, condicao, corpo in (
+        ("trg_esbocos_insercao", "INSERT", "1", insercao),
+        # Mover para a partição não tira a corrida da distribuição (como no DRE)
+        ("trg_esbocos_remocao", "DELETE", "NOT EXISTS (SELECT 1 FROM arquivamento_em_curso)", remocao),
+        ("trg_esbocos_alteracao", f"UPDATE OF {COLUNAS_GATILHO_ESBOCO}", "1", remocao + "\n" + insercao),
+    ):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {nome}")
+        cursor.execute(f"CREATE TRIGGER {nome} AFTER {evento} ON historico_corridas "
+                       f"WHEN {condicao}\nBEGIN\n{corpo}\nEND")
+
+    # Carga inicial: histórico vivo e partições no banco principal (meses já levados ao
+    # arquivo entram no próximo consolidado_dre.reconstruir_consolidados). A partição guarda o
+    # turno de quando fechou: o turno sai da configuração atual pelo minuto do dia
+    colunas = "data_cadastro, km_distancia, valor_total_pago, preco_concorrente"
+    partes = [f"SELECT {colunas}, turno_id FROM historico_corridas"]
+    if _tabela_existe(cursor, "particoes_corridas"):
+        for (tabela,) in cursor.execute("SELECT tabela FROM particoes_corridas WHERE esquema = 'main'").fetchall():
+            partes.append(f"SELECT {colunas}, (SELECT turno_id FROM turnos_minutos WHERE minuto = {tabela}.minuto_dia) "
+                          f"AS turno_id FROM {tabela}")
+    if metricas is None:
+        cursor.execute("DELETE FROM esboco_precos")
+    else:
+        cursor.execute(f"DELETE FROM esboco_precos WHERE metrica IN ({', '.join(map(str, metricas))})")
+    for sql in sql_recalculo_esbocos(fonte=f"({' UNION ALL '.join(partes)})", metricas=metricas):
+        cursor.execute(sql)
+
+
+def _tabela_esbocos(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS esboco_precos (
+            mes TEXT NOT NULL,
+            turno_id INTEGER NOT NULL,  -- turnos.id, -1 sem horário ou fora dos turnos
+            faixa_km INTEGER NOT NULL,  -- índice em FAIXAS_KM, -1 sem distância
+            metrica INTEGER NOT NULL,   -- código em METRICAS_ESBOCO
+            balde INTEGER NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, metrica, turno_id, faixa_km, balde)
+        ) WITHOUT ROWID
+    """)
+
+
+def _m012_esbocos_precos(cursor):
+    """Esboços da distribuição de tarifa, preço do concorrente e razão, mantidos por gatilhos."""
+    _baldes_esbocos(cursor)
+    _tabela_esbocos(cursor)
+    _gatilhos_e_carga_esbocos(cursor)
+
+
+# Janelas móveis (7, 30 e 90 dias) por motorista e por cliente: um anel de DIAS_ANEL baldes
+# diários por entidade, posição = dia juliano % DIAS_ANEL. A corrida de um dia novo encontra
+# na sua posição o balde de DIAS_ANEL dias atrás e o sobrescreve: o dia velho expira sem
+# varredura nem DELETE, e cada entidade ocupa no máximo DIAS_ANEL linhas.
+# (tabela, entidade); as métricas valem para as duas
+DIAS_ANEL = 90
+JANELAS_METRICAS = [("janela_motoristas", "motorista_id"), ("janela_clientes", "cliente_id")]
+METRICAS_JANELA = [
+    ("corridas", "1"),
+    ("bruto", "COALESCE(LINHA.valor_total_pago, 0)"),
+    ("comissao", "COALESCE(LINHA.taxa_app_valor, 0)"),
+    ("avaliacoes", "(LINHA.avaliacao_motorista IS NOT NULL)"),
+    ("soma_notas", "COALESCE(LINHA.avaliacao_motorista, 0)"),
+]
+POSICAO_ANEL = f"CAST(julianday(date(LINHA.data_cadastro)) AS INTEGER) % {DIAS_ANEL}"
+COLUNAS_GATILHO_JANELAS = "motorista_id, cliente_id, valor_total_pago, taxa_app_valor, avaliacao_motorista, data_cadastro"
+# Totais do cliente no cadastro (histórico inteiro): nota_media é a média das notas dadas
+# nas corridas dele, 5.0 enquanto não houver nenhuma
+METRICAS_CLIENTE = [
+    ("total_corridas", "1"),
+    ("avaliacoes", "(LINHA.avaliacao_motorista IS NOT NULL)"),
+    ("soma_notas", "COALESCE(LINHA.avaliacao_motorista, 0)"),
+]
+
+
+def _upsert_janela(tabela, entidade, linha):
+    """Soma a corrida ao balde do seu dia; balde de um dia mais antigo na posição é substituído."""
+    dia = f"date({linha}.data_cadastro)"
+    colunas = [entidade, "posicao", "dia"] + [m for m, _ in METRICAS_JANELA]
+    valores = [f"{linha}.{entidade}", POSICAO_ANEL.replace("LINHA", linha), dia]
+    valores += [e.replace("LINHA", linha) for _, e in METRICAS_JANELA]
+    atualizacoes = ", ".join(f"{m} = CASE WHEN dia = excluded.dia THEN {m} + excluded.{m} ELSE excluded.{m} END"
+                             for m, _ in METRICAS_JANELA)
+    # Corrida mais velha que o balde da posição já saiu de todas as janelas: não entra
+    return (f"INSERT INTO {tabela} ({', '.join(colunas)}) SELECT {', '.join(valores)} "
+            f"WHERE {linha}.{entidade} IS NOT NULL AND {dia} IS NOT NULL "
+            f"ON CONFLICT({entidade}, posicao) DO UPDATE SET {atualizacoes}, dia = excluded.dia "
+            f"WHERE excluded.dia >= dia;")
+
+
+def _desconto_janela(tabela, entidade, linha):
+    """Tira a corrida do balde do seu dia, se o balde ainda for daquele dia."""
+    atualizacoes = ", ".join(f"{m} = {m} - {e.replace('LINHA', linha)}" for m, e in METRICAS_JANELA)
+    return (f"UPDATE {tabela} SET {atualizacoes} WHERE {entidade} = {linha}.{entidade} "
+            f"AND posicao = {POSICAO_ANEL.replace('LINHA', linha)} AND dia = date({linha}.data_cadastro);")
+
+
+def _totais_cliente(linha, sinal):
+    """UPDATE dos totais do cliente no cadastro (sinal=+1 soma, -1 desconta a corrida)."""
+    sinal = "+" if sinal > 0 else "-"
+    deltas = {m: f"{m} {sinal} {e.replace('LINHA', linha)}" for m, e in METRICAS_CLIENTE}
+    atualizacoes = ", ".join(f"{m} = {d}" for m, d in deltas.items())
+    return (f"UPDATE clientes SET {atualizacoes}, "
+            f"nota_media = COALESCE(({deltas['soma_notas']}) * 1.0 / NULLIF({deltas['avaliacoes']}, 0), 5.0) "
+            f"WHERE id = {linha}.cliente_id;")
+
+
+# Primeiro dia do anel no recálculo: DIAS_ANEL - 1 dias antes da última corrida ou de hoje,
+# o que vier antes (uma corrida com data no futuro não empurra o anel para frente)
+SQL_CORTE_JANELAS = (f"SELECT date(MIN(date('now', 'localtime'), MAX(data_cadastro)), '-{DIAS_ANEL - 1} days') "
+                     f"FROM historico_corridas")
+
+
+def sql_recalculo_janelas(fonte="historico_corridas"):
+    """INSERT ... SELECT dos baldes de cada janela com as corridas dos DIAS_ANEL dias a partir de :corte (AAAA-MM-DD).
+
+    Com :corte de SQL_CORTE_JANELAS cada posição do anel recebe um dia só.
+    """
+    instrucoes = []
+    for tabela, entidade in JANELAS_METRICAS:
+        colunas = [entidade, "posicao", "dia"] + [m for m, _ in METRICAS_JANELA]
+        somas = [f"SUM({e.replace('LINHA.', '')})" for _, e in METRICAS_JANELA]
+        instrucoes.append(
+            f"INSERT INTO {tabela} ({', '.join(colunas)}) "
+            f"SELECT {entidade}, {POSICAO_ANEL.replace('LINHA.', '')}, date(data_cadastro), {', '.join(somas)} "
+            f"FROM {fonte} WHERE {entidade} IS NOT NULL AND data_cadastro >= :corte "
+            f"AND date(data_cadastro) < date(:corte, '+{DIAS_ANEL} days') "
+            f"GROUP BY {entidade}, date(data_cadastro)")
+    return instrucoes
+
+
+def sql_recalculo_totais_clientes(fonte="historico_corridas"):
+    """Zera e recalcula os totais de todos os clientes a partir do histórico (ou de `fonte`)."""
+    somas = ", ".join(f"SUM({e.replace('LINHA.', '')}) AS {m}" for m, e in METRICAS_CLIENTE)
+    return [
+        "UPDATE clientes SET total_corridas = 0, avaliacoes = 0, soma_notas = 0, nota_media = 5.0",
+        f"UPDATE clientes SET total_corridas = t.total_corridas, avaliacoes = t.avaliacoes, soma_notas = t.soma_notas, "
+        f"nota_media = COALESCE(t.soma_notas * 1.0 / NULLIF(t.avaliacoes, 0), 5.0) "
+        f"FROM (SELECT cliente_id, {somas} FROM {fonte} WHERE cliente_id IS NOT NULL GROUP BY cliente_id) t "
+        f"WHERE clientes.id = t.cliente_id",
+    ]
+
+
+def _m013_janelas_metricas(cursor):
+    """Baldes diários em anel por motorista e cliente e totais do cliente mantidos por gatilhos."""
+    for tabela, entidade in JANELAS_METRICAS:
+        metricas = ", ".join(f"{m} {'REAL' if m in ('bruto', 'comissao', 'soma_notas') else 'INTEGER'} NOT NULL DEFAULT 0"
+                             for m, _ in METRICAS_JANELA)
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {tabela} ({entidade} INTEGER NOT NULL, posicao INTEGER NOT NULL, "
+                       f"dia TEXT NOT NULL, {metricas}, PRIMARY KEY ({entidade}, posicao)) WITHOUT ROWID")
+        # Janela de N dias: só os baldes dos últimos N dias, pelo índice (dia, entidade)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_dia ON {tabela} (dia, {entidade})")
+    existentes = _colunas(cursor, "clientes")
+    for coluna, tipo in (("avaliacoes", "INTEGER"), ("soma_notas", "REAL")):
+        if coluna not in existentes:
+            cursor.execute(f"ALTER TABLE clientes ADD COLUMN {coluna} {tipo} NOT NULL DEFAULT 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_total_corridas ON clientes (total_corridas)")
+    # Os totais mudam a cada corrida e o contador do histórico já invalida quem os lê:
+    # o contador dos clientes fica só com as colunas do cadastro
+    cursor.execute("DROP TRIGGER IF EXISTS trg_versao_clientes_update")
+    cursor.execute("""
+        CREATE TRIGGER trg_versao_clientes_update AFTER UPDATE OF id, nome, email, telefone, data_cadastro ON clientes
+        BEGIN UPDATE versoes_tabelas SET versao = versao + 1 WHERE tabela = 'clientes'; END
+    """)
+
+    insercao = "\n".join([_upsert_janela(t, e, "NEW") for t, e in JANELAS_METRICAS] + [_totais_cliente("NEW", 1)])
+    remocao = "\n".join([_desconto_janela(t, e, "OLD") for t, e in JANELAS_METRICAS] + [_totais_cliente("OLD", -1)])
+    for nome, evento, condicao, corpo in (
+        ("trg_janelas_insercao", "INSERT", "1", insercao),
+        ("trg_janelas_remocao", "DELETE", "NOT EXISTS (SELECT 1 FROM arquivamento_em_curso)", remocao),
+        ("trg_janelas_alteracao", f"UPDATE OF {COLUNAS_GATILHO_JANELAS}", "1", remocao + "\n" + insercao),
+    ):
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {nome} AFTER {evento} ON historico_corridas "
+                       f"WHEN {condicao}\nBEGIN\n{corpo}\nEND")
+
+    # Carga inicial: histórico vivo e partições no banco principal (meses já levados ao
+    # arquivo entram no próximo consolidado_dre.reconstruir_consolidados)
+    colunas = "data_cadastro, motorista_id, cliente_id, valor_total_pago, taxa_app_valor, avaliacao_motorista"
+    partes = [f"SELECT {colunas} FROM historico_corridas"]
+    if _tabela_existe(cursor, "particoes_corridas"):
+        for (tabela,) in cursor.execute("SELECT tabela FROM particoes_corridas WHERE esquema = 'main'").fetchall():
+            partes.append(f"SELECT {colunas} FROM {tabela}")
+    fonte = f"({' UNION ALL '.join(partes)})"
+    for tabela, _ in JANELAS_METRICAS:
+        cursor.execute(f"DELETE FROM {tabela}")
+    corte = cursor.execute(SQL_CORTE_JANELAS).fetchone()[0]
+    for sql in sql_recalculo_janelas(fonte):
+        cursor.execute(sql, {"corte": corte or "0000-00-00"})
+    for sql in sql_recalculo_totais_clientes(fonte):
+        cursor.execute(sql)
+
+
+# Colunas lidas pelo snapshot colunar (ver snapshot_colunar). minuto_dia e turno_id ficam de
+# fora: o primeiro muda com hora_partida, o segundo com os turnos (versoes_tabelas de turnos)
+# e o gatilho do turno os preenche logo depois de cada inserção.
+COLUNAS_EDICOES_CORRIDAS = ("id, motorista_id, cliente_id, valor_total_pago, taxa_app_valor, custo_gateway, "
+                            "custos_fixos_totais, preco_concorrente, avaliacao_motorista, data_cadastro, hora_partida")
+
+
+def _m014_contador_edicoes(cursor):
+    """Contador de edições de corridas já gravadas (alteração ou remoção, não inserção)."""
+    cursor.execute("INSERT OR IGNORE INTO versoes_tabelas (tabela, versao) VALUES ('historico_corridas_edicoes', 0)")
+    incremento = "UPDATE versoes_tabelas SET versao = versao + 1 WHERE tabela = 'historico_corridas_edicoes';"
+    for nome, evento, condicao in (
+        ("trg_edicoes_alteracao", f"UPDATE OF {COLUNAS_EDICOES_CORRIDAS}", "1"),
+        # Mover para a partição não muda o que o snapshot lê
+        ("trg_edicoes_remocao", "DELETE", "NOT EXISTS (SELECT 1 FROM arquivamento_em_curso)"),
+    ):
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {nome} AFTER {evento} ON historico_corridas "
+                       f"WHEN {condicao}\nBEGIN {incremento} END")
+
+
+def _m015_busca_documentos_sem_pontuacao(cursor):
+    """Índice de busca com CPF, placa e telefone sem pontuação (gatilhos novos e recarga)."""
+    _gatilhos_e_carga_busca(cursor)
+
+
+def _m016_contador_configuracoes(cursor):
+    """Contador de alterações da configuração do município (ETag da cotação com DRE)."""
+    criar_contador_alteracoes(cursor, "configuracoes_estrategicas")
+
+
+def _m017_remove_indices_agregacoes(cursor):
+    """Remove índices que só trocavam a varredura da tabela pela varredura do índice.
+
+    A nota média e o comparativo de mercado leem (quase) todas as corridas de qualquer
+    jeito; os dois índices custavam escrita em cada inserção sem poupar leitura.
+    """
+    cursor.execute("DROP INDEX IF EXISTS idx_corridas_avaliacao")
+    cursor.execute("DROP INDEX IF EXISTS idx_corridas_concorrente")
+
+
+def _m018_esboco_razao_fino(cursor):
+    """Baldes de 0,1% para a razão tarifa/concorrente (desfeito pela migração 19).
+
+    Bancos que ainda não passaram daqui vão direto para os esboços da migração 19.
+    """
+
+
+def _m019_esbocos_por_mes_e_turno(cursor):
+    """Esboços por (mês, turno, faixa de km) e razão em baldes de 1%.
+
+    Por (dia, hora) com a razão em 0,1% o esboço tinha quase uma linha por corrida e ler um
+    período custava mais que varrer o histórico. Tabela, gatilhos e contagens refeitos; as
+    de meses no banco de arquivo voltam no próximo consolidado_dre.reconstruir_consolidados.
+    """
+    cursor.execute("DROP TABLE IF EXISTS esboco_baldes_razao")
+    cursor.execute("DROP TABLE IF EXISTS esboco_precos")
+    _baldes_esbocos(cursor)
+    _tabela_esbocos(cursor)
+    _gatilhos_e_carga_esbocos(cursor)
+
+
+def _m020_dre_por_turno_configurado(cursor):
+    """dre_turno por turno_id (os turnos configurados) em vez de DIURNO/NOTURNO fixos.
+
+    Tabela e gatilhos do DRE refeitos; a carga lê o histórico vivo e as partições no banco
+    principal (meses no banco de arquivo voltam no próximo reconstruir_consolidados).
+    """
+    tabela, chaves, expressoes = next(c for c in CONSOLIDADOS_DRE if c[0] == "dre_turno")
+    colunas_metricas = ", ".join(f"{m} {'INTEGER' if m == 'corridas' else 'REAL'} NOT NULL DEFAULT 0" for m, _ in METRICAS_DRE)
+    cursor.execute(f"DROP TABLE IF EXISTS {tabela}")
+    cursor.execute(f"CREATE TABLE {tabela} (mes TEXT NOT NULL, turno_id INTEGER NOT NULL, {colunas_metricas}, "
+                   f"PRIMARY KEY ({', '.join(chaves)})) WITHOUT ROWID")
+    insercao = "\n".join(_upsert_consolidado(t, c, e, "NEW", +1) for t, c, e in CONSOLIDADOS_DRE)
+    remocao = "\n".join(_upsert_consolidado(t, c, e, "OLD", -1) for t, c, e in CONSOLIDADOS_DRE)
+    for nome, evento, condicao, corpo in (
+        ("trg_dre_insercao", "INSERT", "1", insercao),
+        ("trg_dre_remocao", "DELETE", "NOT EXISTS (SELECT 1 FROM arquivamento_em_curso)", remocao),
+        ("trg_dre_alteracao", f"UPDATE OF {COLUNAS_GATILHO_DRE}", "1", remocao + "\n" + insercao),
+    ):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {nome}")
+        cursor.execute(f"CREATE TRIGGER {nome} AFTER {evento} ON historico_corridas "
+                       f"WHEN {condicao}\nBEGIN\n{corpo}\nEND")
+
+    # Carga: a partição guarda o turno de quando fechou, o atual sai do minuto do dia
+    colunas = "data_cadastro, valor_total_pago, taxa_app_valor, custo_gateway, custos_fixos_totais"
+    partes = [f"SELECT {colunas}, turno_id FROM historico_corridas"]
+    for (particao,) in cursor.execute("SELECT tabela FROM particoes_corridas WHERE esquema = 'main'").fetchall():
+        partes.append(f"SELECT {colunas}, (SELECT turno_id FROM turnos_minutos WHERE minuto = {particao}.minuto_dia) "
+                      f"AS turno_id FROM {particao}")
+    cursor.execute(sql_recalculo_consolidado(tabela, chaves, expressoes, fonte=f"({' UNION ALL '.join(partes)})"))
+
+
+MIGRACOES = [
+    (1, "Schema base reconciliado com o banco em uso", _m001_schema_base),
+    (2, "Índices do BI, repasse e fidelidade", _m002_indices_bi),
+    (3, "Consolidados do DRE por dia, mês, turno e motorista", _m003_consolidados_dre),
+    (4, "Contador de alterações das tabelas de tarifas", _m004_versoes_tabelas),
+    (5, "Execuções de repasse e corridas já pagas", _m005_repasses),
+    (6, "Turnos configuráveis, minuto do dia e turno por corrida", _m006_turnos),
+    (7, "Contadores de alteração das tabelas dos relatórios", _m007_contadores_relatorios),
+    (8, "Partições mensais do histórico de corridas", _m008_particoes_corridas),
+    (9, "Lucro líquido gerado e placares top-K por mês", _m009_lucro_e_placares),
+    (10, "Ingestão de corridas: chave de idempotência e spools", _m010_ingestao),
+    (11, "Busca de cadastros (FTS5) e listagem paginada", _m011_busca_cadastros),
+    (12, "Esboços da distribuição de preços por faixa de km", _m012_esbocos_precos),
+    (13, "Janelas móveis por motorista e cliente e totais do cliente", _m013_janelas_metricas),
+    (14, "Contador de edições do histórico de corridas", _m014_contador_edicoes),
+    (15, "Busca de cadastros com documentos sem pontuação", _m015_busca_documentos_sem_pontuacao),
+    (16, "Contador de alterações da configuração estratégica", _m016_contador_configuracoes),
+    (17, "Remoção dos índices da nota média e do comparativo de mercado", _m017_remove_indices_agregacoes),
+    (18, "Esboço da razão tarifa/concorrente com baldes de 0,1%", _m018_esboco_razao_fino),
+    (19, "Esboços de preços por mês, turno e faixa de km", _m019_esbocos_por_mes_e_turno),
+    (20, "DRE por turno configurado", _m020_dre_por_turno_configurado),
+]
+
+
+def versao_atual(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def aplicar_migracoes(conn, verbose=False):
+    """Aplica, em ordem, todas as migrações acima da versão atual. Retorna a versão final."""
+    versao = versao_atual(conn)
+    for numero, descricao, funcao in MIGRACOES:
+        if numero <= versao:
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            funcao(cursor)
+            cursor.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        versao = numero
+        if verbose:
+            print(f"✅ Migração {numero:03d} aplicada: {descricao}")
+    conn.execute("PRAGMA optimize")
+    return versao
+
+
+# --- Verificação dos planos de execução ---
+
+# Consultas que os scripts executam sobre historico_corridas e, com a tabela no quinto
+# campo, as que leem os consolidados e placares no lugar dele (rankings_bi, consolidado_dre,
+# distribuicao_precos). É cópia do SQL de cada módulo, que importa este: ao mudar uma
+# consulta lá, mude aqui. consultas_gui e api_tkx não têm SQL próprio, só chamam as
+# funções desses módulos (o mercado da aba estratégica é o bi_estrategico.mercado).
+# (nome, sql, parâmetros de exemplo, varredura_permitida[, tabela])
+# varredura_permitida=True só para agregações que precisam ler a tabela inteira.
+CONSULTAS_MONITORADAS = [
+    ("bi_operacional.top_drivers", """
+        SELECT m.nome, COUNT(h.id), SUM(h.taxa_app_valor)
+        FROM motoristas_cadastro m
+        JOIN historico_corridas h ON m.id = h.motorista_id
+        WHERE (h.minuto_dia >= ? OR h.minuto_dia <= ?)
+        GROUP BY m.id
+        ORDER BY SUM(h.taxa_app_valor) DESC LIMIT ?
+    """, (1081, 359, 10), False),
+    ("bi_operacional.ranking_turnos", """
+        SELECT h.turno_id, h.motorista_id, COUNT(*) AS corridas, SUM(h.taxa_app_valor) AS comissao
+        FROM historico_corridas h
+        WHERE h.turno_id IS NOT NULL
+        GROUP BY h.turno_id, h.motorista_id
+    """, (), False),
+    ("bi_operacional.nota_media", "SELECT TOTAL(avaliacao_motorista) AS soma, COUNT(avaliacao_motorista) AS n FROM historico_corridas", (), True),
+    ("bi_estrategico.mercado", """
+        SELECT TOTAL(valor_total_pago) AS soma_pago, COUNT(valor_total_pago) AS n_pago,
+               TOTAL(preco_concorrente) AS soma_concorrente, COUNT(preco_concorrente) AS n_concorrente
+        FROM historico_corridas WHERE preco_concorrente IS NOT NULL
+    """, (), True),
+    ("migracoes.placar_corridas_lucro.reabastecer", f"""
+        SELECT id, lucro_liquido FROM historico_corridas
+        WHERE data_cadastro >= ? || '-01' AND data_cadastro < date(? || '-01', '+1 month')
+          AND lucro_liquido IS NOT NULL ORDER BY lucro_liquido DESC LIMIT {K_PLACAR}
+    """, ("2026-09", "2026-09"), False),
+    ("relatorio_repasse.gerar_extrato_motorista", """
+        SELECT valor_total_pago, taxa_app_valor, data_cadastro
+        FROM historico_corridas
+        WHERE motorista_id = ?
+    """, (1,), False),
+    ("relatorio_repasse.SQL_ITENS_REPASSE", """
+        SELECT h.motorista_id, m.nome, h.id, h.data_cadastro, h.valor_total_pago, h.taxa_app_valor
+        FROM historico_corridas h
+        LEFT JOIN motoristas_cadastro m ON m.id = h.motorista_id
+        WHERE h.repasse_id IS NULL AND h.id <= ?
+          AND h.data_cadastro >= ? AND h.data_cadastro < date(?, '+1 day')
+        ORDER BY h.motorista_id, h.data_cadastro
+    """, (1000, "2026-01-01", "2026-01-07"), False),
+    ("consolidado_dre.reconstruir_consolidados", sql_recalculo_consolidado(*CONSOLIDADOS_DRE[0]), (), True),
+    ("consolidado_dre.totais_periodo", """
+        SELECT COALESCE(SUM(corridas), 0), COALESCE(SUM(bruto), 0) FROM dre_diario WHERE dia BETWEEN ? AND ?
+    """, ("2026-09-01", "2026-09-30"), False, "dre_diario"),
+    ("rankings_bi.top_corridas_lucro", """
+        SELECT corrida_id, lucro FROM placar_corridas_lucro WHERE mes = ?
+        ORDER BY lucro DESC, corrida_id LIMIT ?
+    """, ("2026-09", 5), False, "placar_corridas_lucro"),
+    ("rankings_bi.top_motoristas_comissao", """
+        SELECT m.nome, d.corridas, d.comissao FROM dre_motorista d
+        JOIN motoristas_cadastro m ON m.id = d.motorista_id
+        WHERE d.mes = ? ORDER BY d.comissao DESC LIMIT ?
+    """, ("2026-09", 10), False, "dre_motorista"),
+    ("rankings_bi.top_motoristas_comissao (histórico)", """
+        SELECT m.nome, SUM(d.corridas), SUM(d.comissao) FROM dre_motorista d
+        JOIN motoristas_cadastro m ON m.id = d.motorista_id
+        GROUP BY d.motorista_id ORDER BY SUM(d.comissao) DESC LIMIT ?
+    """, (10,), True, "dre_motorista"),
+    ("rankings_bi.clientes_fieis", """
+        SELECT nome, total_corridas FROM clientes WHERE total_corridas > 0
+        ORDER BY total_corridas DESC LIMIT ?
+    """, (3,), False, "clientes"),
+    ("rankings_bi.clientes_fieis (mês)", """
+        SELECT c.nome, SUM(p.corridas) FROM placar_clientes p
+        JOIN clientes c ON c.id = p.cliente_id
+        WHERE p.mes = ?
+        GROUP BY c.nome ORDER BY SUM(p.corridas) DESC LIMIT ?
+    """, ("2026-09", 3), False, "placar_clientes"),
+    ("rankings_bi.motoristas_melhor_avaliados", """
+        SELECT m.nome, p.media, p.avaliacoes FROM placar_avaliacoes p
+        JOIN motoristas_cadastro m ON m.id = p.motorista_id
+        WHERE p.mes = ? AND p.avaliacoes >= ? ORDER BY p.media DESC LIMIT ?
+    """, ("2026-09", 20, 5), False, "placar_avaliacoes"),
+    ("rankings_bi.motoristas_melhor_avaliados (histórico)", """
+        SELECT m.nome, SUM(p.soma_notas) / SUM(p.avaliacoes), SUM(p.avaliacoes) FROM placar_avaliacoes p
+        JOIN motoristas_cadastro m ON m.id = p.motorista_id
+        GROUP BY p.motorista_id HAVING SUM(p.avaliacoes) >= ?
+        ORDER BY SUM(p.soma_notas) / SUM(p.avaliacoes) DESC LIMIT ?
+    """, (20, 5), True, "placar_avaliacoes"),
+    ("distribuicao_precos.contagens", """
+        SELECT metrica, turno_id, faixa_km, balde, SUM(n)
+        FROM esboco_precos WHERE mes BETWEEN ? AND ?
+        GROUP BY metrica, turno_id, faixa_km, balde HAVING SUM(n) > 0
+    """, ("2026-07", "2026-09"), False, "esboco_precos"),
+]
+
+
+def _apelidos(sql, tabela):
+    """Nomes pelos quais a tabela aparece no plano (ela mesma e seus aliases)."""
+    nomes = {tabela}
+    for apelido in re.findall(rf"\b{tabela}\s+(?:AS\s+)?(\w+)", sql, re.IGNORECASE):
+        if apelido.upper() not in ("ON", "WHERE", "JOIN", "GROUP", "ORDER", "LIMIT", "INNER", "LEFT"):
+            nomes.add(apelido)
+    return nomes
+
+
+def varreduras_completas(conn, sql, params=(), tabela="historico_corridas"):
+    """Linhas do EXPLAIN QUERY PLAN que percorrem a tabela inteira.
+
+    Percorrer um índice (USING INDEX / USING COVERING INDEX) ainda lê todas as linhas:
+    só um SEARCH conta como acesso por índice.
+    """
+    nomes = _apelidos(sql, tabela)
+    problemas = []
+    for linha in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+        detalhe = linha[-1]
+        m = re.match(r"SCAN (\w+)", detalhe)
+        if m and m.group(1) in nomes:
+            problemas.append(detalhe)
+    return problemas
+
+
+def verificar_planos(conn, verbose=True):
+    """Roda EXPLAIN QUERY PLAN em todas as consultas monitoradas. Retorna True se nenhuma faz varredura total."""
+    ok = True
+    for nome, sql, params, varredura_permitida, *tabela in CONSULTAS_MONITORADAS:
+        problemas = varreduras_completas(conn, sql, params, *tabela)
+        if problemas and not varredura_permitida:
+            ok = False
+            if verbose:
+                print(f"❌ {nome}: {'; '.join(problemas)}")
+        elif verbose:
+            aviso = " (agregação total permitida)" if problemas else ""
+            print(f"✅ {nome}{aviso}")
+    return ok
+
+
+if __name__ == "__main__":
+    import banco_tkx  # importa este módulo: só aqui, para não formar ciclo
+
+    # Mesmo banco que os scripts usam: argumento, TKX_DB_PATH ou o do município atual.
+    # conectar() já aplica as migrações pendentes (e anexa o arquivo, se houver)
+    caminho = banco_tkx.caminho_banco(next((a for a in sys.argv[1:] if not a.startswith("--")), None))
+    conn = banco_tkx.conectar(caminho)
+    print(f"Banco {caminho} na versão {versao_atual(conn)} do schema.")
+    if "--verificar" in sys.argv:
+        print("\n--- PLANOS DE EXECUÇÃO ---")
+        sucesso = verificar_planos(conn)
+        banco_tkx.fechar_conexoes()
+        sys.exit(0 if sucesso else 1)
+    banco_tkx.fechar_conexoes()
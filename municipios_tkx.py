@@ -0,0 +1,171 @@
+import argparse
+import heapq
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import banco_tkx
+import bi_estrategico
+import bi_operacional
+import calculadora_tkx
+import consolidado_dre
+import distribuicao_precos
+import rankings_bi
+
+# Um banco por município, listados no registro municipios.json (ver banco_tkx).
+#
+#   listar     municípios do registro, com o banco e o total de corridas de cada um
+#   adicionar  registra o banco de um município novo, cria o schema e grava a configuração
+#   relatorio  DRE, BI operacional e BI estratégico de todos os municípios juntos
+#
+# No relatório consolidado cada município roda num processo próprio (em paralelo: o tempo
+# total acompanha o maior banco, não a soma deles) e devolve parciais que se combinam sem
+# reler corridas: somas e contagens somam, médias saem de soma / contagem, os esboços de
+# preços somam balde a balde e cada top é o top dos tops (motoristas, clientes e corridas
+# de um município não aparecem em outro).
+
+TOP_MOTORISTAS = 10
+TOP_CORRIDAS = 5
+TOP_CLIENTES = 3
+
+
+def parciais_municipio(municipio):
+    """Roda no processo do município: parciais dos três relatórios, prontos para combinar."""
+    conn = banco_tkx.conectar(banco_tkx.caminho_municipio(municipio))
+    return {
+        "dre": tuple(consolidado_dre.totais_periodo(conn=conn)),
+        "mercado": tuple(bi_estrategico.parciais_mercado(conn)),
+        "esboco_razao": distribuicao_precos.recorte(distribuicao_precos.contagens(conn=conn)),
+        "notas": tuple(bi_operacional.parciais_notas(conn)),
+        "turnos": [(t.nome, t.hora_inicio, t.hora_fim, ranking)
+                   for t, ranking in bi_operacional.ranking_turnos(TOP_MOTORISTAS, conn=conn)],
+        "top_lucro": rankings_bi.top_corridas_lucro(TOP_CORRIDAS, conn=conn),
+        "clientes_fieis": rankings_bi.clientes_fieis(TOP_CLIENTES, conn=conn),
+    }
+
+
+def _somar(tuplas):
+    return [sum(valores) for valores in zip(*tuplas)]
+
+
+def combinar_parciais(parciais):
+    """Relatório consolidado a partir de {município: parciais_municipio(município)}."""
+    por_municipio = {m: consolidado_dre.TotaisDRE._make(p["dre"]) for m, p in parciais.items()}
+    soma_pago, n_pago, soma_concorrente, n_concorrente = _somar(p["mercado"] for p in parciais.values())
+    soma_notas, avaliacoes = _somar(p["notas"] for p in parciais.values())
+
+    # Turnos com o mesmo nome se juntam, mesmo que os horários variem entre municípios
+    turnos = {}
+    for municipio, p in parciais.items():
+        for nome, inicio, fim, ranking in p["turnos"]:
+            turno = turnos.setdefault(nome, [inicio, fim, []])
+            if (turno[0], turno[1]) != (inicio, fim):
+                turno[0] = turno[1] = None
+            turno[2] += [(municipio, motorista, corridas, comissao) for motorista, corridas, comissao in ranking]
+
+    return {
+        "por_municipio": por_municipio,
+        "dre": consolidado_dre.TotaisDRE._make(_somar(por_municipio.values())),
+        "diferenca_mercado": bi_estrategico.diferenca_mercado(soma_pago / n_pago if n_pago else None,
+                                                             soma_concorrente / n_concorrente if n_concorrente else None),
+        "distribuicao_mercado": distribuicao_precos.resumo_diferenca(
+            distribuicao_precos.combinar(p["esboco_razao"] for p in parciais.values())),
+        "nota_media": soma_notas / avaliacoes if avaliacoes else 0,
+        "turnos": [(nome, inicio, fim, heapq.nlargest(TOP_MOTORISTAS, ranking, key=lambda l: l[3]))
+                   for nome, (inicio, fim, ranking) in turnos.items()],
+        "top_lucro": heapq.nlargest(TOP_CORRIDAS, ((m, corrida, lucro) for m, p in parciais.items()
+                                                   for corrida, lucro in p["top_lucro"]), key=lambda l: l[2]),
+        "clientes_fieis": heapq.nlargest(TOP_CLIENTES, ((m, nome, viagens) for m, p in parciais.items()
+                                                        for nome, viagens in p["clientes_fieis"]), key=lambda l: l[2]),
+    }
+
+
+def relatorio_consolidado(municipios=None, processos=None):
+    """Relatório de todos os municípios do registro (ou dos informados), um processo por município."""
+    municipios = list(municipios or banco_tkx.listar_municipios())
+    processos = processos or min(len(municipios), os.cpu_count() or 1)
+    if processos <= 1 or len(municipios) == 1:
+        return combinar_parciais({m: parciais_municipio(m) for m in municipios})
+    # spawn: cada processo abre as próprias conexões (conexões SQLite não sobrevivem a um fork)
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as pool:
+        return combinar_parciais(dict(zip(municipios, pool.map(parciais_municipio, municipios))))
+
+
+def exibir_relatorio_consolidado(dados, segundos=None):
+    print("\n" + "=" * 60)
+    print(f"      TKX CONSOLIDADO - {len(dados['por_municipio'])} MUNICÍPIOS")
+    print("=" * 60)
+    print(f"{'MUNICÍPIO':<22}{'CORRIDAS':>10}{'BRUTO':>15}{'LUCRO LÍQ.':>13}")
+    for municipio, totais in list(dados["por_municipio"].items()) + [("TOTAL", dados["dre"])]:
+        print(f"{municipio[:21]:<22}{totais.corridas:>10,}{totais.bruto:>15,.2f}{totais.lucro_liquido:>13,.2f}")
+
+    diff = dados["diferenca_mercado"]
+    if diff is not None:
+        print(f"\nStatus vs Concorrência: {abs(diff):.1f}% {'MAIS CARO' if diff > 0 else 'MAIS BARATO'} que a média local")
+    d = dados["distribuicao_mercado"]
+    if d["n"]:
+        print(f"Diferença por corrida: P10 {d['p10']:+.1f}% | Mediana {d['p50']:+.1f}% | P90 {d['p90']:+.1f}%")
+    print(f"Nota Média da Frota: {dados['nota_media']:.1f} / 5.0")
+
+    for nome, inicio, fim, ranking in dados["turnos"]:
+        horario = f" ({inicio}h às {fim}h)" if inicio else ""
+        print(f"\n🏆 TOP {TOP_MOTORISTAS} DRIVERS - TURNO {nome}{horario}:")
+        for i, (municipio, motorista, qtd, valor) in enumerate(ranking, 1):
+            print(f"{i:2d}º | {motorista[:15]:<15} | {municipio[:12]:<12} | Corridas: {qtd:5d} | Lucro TKX: R$ {valor:.2f}")
+
+    print(f"\n💎 TOP {TOP_CORRIDAS} CORRIDAS MAIS LUCRATIVAS:")
+    for municipio, corrida, lucro in dados["top_lucro"]:
+        print(f"{municipio} - Corrida #{corrida} | Lucro Líquido: R$ {lucro:.2f}")
+    print(f"\n👥 CLIENTES MAIS FIÉIS (Top {TOP_CLIENTES}):")
+    for municipio, nome, viagens in dados["clientes_fieis"]:
+        print(f"Passageiro: {nome} ({municipio}) | Viagens: {viagens}")
+    if segundos is not None:
+        print(f"\n[{segundos:.2f}s]")
+
+
+def listar():
+    print(f"Registro: {banco_tkx.caminho_registro()}")
+    for municipio, caminho in banco_tkx.listar_municipios().items():
+        if os.path.exists(caminho):
+            corridas = consolidado_dre.totais_periodo(conn=banco_tkx.conectar(caminho)).corridas
+            print(f"{municipio:<22} {corridas:>10,} corridas  {caminho}")
+        else:
+            print(f"{municipio:<22} {'(sem banco)':>19}  {caminho}")
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Municípios da TKX, um banco por município.")
+    sub = parser.add_subparsers(dest="comando")
+    sub.add_parser("listar", help="municípios do registro")
+    adicionar = sub.add_parser("adicionar", help="registra o banco de um município")
+    adicionar.add_argument("municipio")
+    adicionar.add_argument("banco", help="arquivo do banco (relativo à pasta do registro)")
+    for campo in calculadora_tkx.CONFIG_PADRAO:
+        adicionar.add_argument(f"--{campo.replace('_', '-')}", dest=campo, type=float,
+                               help=f"padrão: {calculadora_tkx.CONFIG_PADRAO[campo]}")
+    relatorio = sub.add_parser("relatorio", help="relatório consolidado de todos os municípios")
+    relatorio.add_argument("municipios", nargs="*", help="padrão: todos os do registro")
+    relatorio.add_argument("--processos", type=int, help="padrão: um por município, até o nº de CPUs")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.comando == "adicionar":
+            banco_tkx.registrar_municipio(args.municipio, args.banco)
+            valores = {c: getattr(args, c) for c in calculadora_tkx.CONFIG_PADRAO if getattr(args, c) is not None}
+            calculadora_tkx.setup_database(args.municipio, **valores)
+            print(f"✅ {args.municipio} registrado em {banco_tkx.caminho_municipio(args.municipio)}")
+        elif args.comando == "relatorio":
+            t0 = time.perf_counter()
+            dados = relatorio_consolidado(args.municipios, args.processos)
+            exibir_relatorio_consolidado(dados, time.perf_counter() - t0)
+            return
+        listar()
+    except LookupError as e:
+        print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,204 @@
+import argparse
+import re
+import sys
+import time
+from datetime import date, timedelta
+
+import banco_tkx
+
+# Particionamento mensal do historico_corridas, feito com o sistema no ar.
+#
+#   fechar    move cada mês fechado para a tabela corridas_AAAA_MM em lotes curtos (cada
+#             lote é uma transação: quem grava corridas novas só espera um lote). A partição
+#             entra no registro antes do primeiro lote, então os relatórios nunca deixam de
+#             ver uma corrida. No fim ganha os índices (montados já cheios, compactos) e
+#             gatilhos que a tornam somente leitura.
+#   arquivar  copia partições fechadas para o banco de arquivo, troca o registro e apaga a
+#             cópia do banco principal; o arquivo é compactado com VACUUM.
+#
+# Mover não altera os consolidados do DRE: dentro do lote, arquivamento_em_curso desliga o
+# gatilho trg_dre_remocao. Um mês só fecha com todas as corridas já repassadas, porque a
+# partição não aceita mais a marcação de repasse.
+
+LOTE = 5_000
+FILTRO_MES = "data_cadastro >= ? AND data_cadastro < date(?, '+1 month')"
+
+
+def nome_tabela(mes):
+    return f"corridas_{mes.replace('-', '_')}"
+
+
+def mes_anterior(hoje=None):
+    return ((hoje or date.today()).replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+
+def meses_para_fechar(ate=None, conn=None):
+    """Meses com corridas, até `ate` (AAAA-MM, padrão: o mês passado), ainda não fechados."""
+    conn = conn or banco_tkx.conectar()
+    ate = ate or mes_anterior()
+    cursor = conn.execute("""
+        SELECT mes FROM dre_mensal
+        WHERE corridas > 0 AND mes <> '0000-00' AND mes <= ?
+          AND mes NOT IN (SELECT mes FROM particoes_corridas WHERE status = 'fechada')
+        ORDER BY mes
+    """, (ate,))
+    return [linha[0] for linha in cursor]
+
+
+def _criar_tabela(conn, esquema, tabela, modelo="historico_corridas"):
+    """Cria esquema.tabela com a mesma definição (colunas, tipos e ordem) do modelo no banco principal."""
+    sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (modelo,)).fetchone()[0]
+    sql = re.sub(r'^CREATE TABLE\s+(?:IF NOT EXISTS\s+)?(?:"?\w+"?\.)?"?\w+"?', f"CREATE TABLE IF NOT EXISTS {esquema}.{tabela}",
+                 sql, count=1, flags=re.IGNORECASE)
+    conn.execute(sql)
+
+
+def _indices_e_gatilhos(conn, esquema, tabela, mes):
+    """Índices do historico_corridas (menos os parciais de trabalho pendente) e gatilhos de somente leitura."""
+    sufixo = mes.replace("-", "_")
+    indices = conn.execute("""
+        SELECT name, sql FROM main.sqlite_master
+        WHERE type = 'index' AND tbl_name = 'historico_corridas' AND sql IS NOT NULL
+    """).fetchall()
+    for nome, sql in indices:
+        if re.search(r"\bWHERE\b", sql, re.IGNORECASE):
+            continue  # ex.: idx_corridas_a_repassar, vazio num mês fechado
+        colunas = sql[sql.index("("):]
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.{nome}_{sufixo} ON {tabela} {colunas}")
+    for evento in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {esquema}.trg_{tabela}_{evento.lower()} BEFORE {evento} ON {tabela}
+            BEGIN SELECT RAISE(ABORT, 'mês {mes} fechado: partição somente leitura'); END
+        """)
+
+
+def fechar_mes(mes, lote=LOTE, verbose=False, conn=None):
+    """Move as corridas do mês para a partição corridas_AAAA_MM. Retorna quantas foram movidas.
+
+    Pode ser interrompido e rodado de novo: continua de onde parou.
+    """
+    conn = conn or banco_tkx.conectar()
+    if mes >= date.today().strftime("%Y-%m"):
+        raise ValueError(f"{mes} ainda está aberto: só meses anteriores ao atual podem ser fechados")
+    status = conn.execute("SELECT status FROM particoes_corridas WHERE mes = ?", (mes,)).fetchone()
+    if status and status[0] == "fechada":
+        return 0
+    inicio_mes = f"{mes}-01"
+    pendentes = conn.execute(f"SELECT COUNT(*) FROM historico_corridas WHERE repasse_id IS NULL AND {FILTRO_MES}",
+                             (inicio_mes, inicio_mes)).fetchone()[0]
+    if pendentes:
+        raise ValueError(f"{mes}: {pendentes:,} corridas ainda sem repasse. Rode o repasse do período antes de fechar o mês.")
+
+    tabela = nome_tabela(mes)
+    with banco_tkx.transacao(conn):
+        _criar_tabela(conn, "main", tabela)
+        conn.execute("INSERT OR IGNORE INTO particoes_corridas (mes, esquema, tabela) VALUES (?, 'main', ?)", (mes, tabela))
+    colunas = ", ".join(banco_tkx.colunas_corridas(conn, gravaveis=True))
+
+    t0 = time.perf_counter()
+    movidas = 0
+    while True:
+        with banco_tkx.transacao(conn):
+            conn.execute("INSERT INTO arquivamento_em_curso (mes) VALUES (?)", (mes,))
+            ate_id = conn.execute(f"""
+                SELECT MAX(id) FROM (SELECT id FROM historico_corridas WHERE {FILTRO_MES} ORDER BY id LIMIT ?)
+            """, (inicio_mes, inicio_mes, lote)).fetchone()[0]
+            if ate_id is not None:
+                filtro, params = f"{FILTRO_MES} AND id <= ?", (inicio_mes, inicio_mes, ate_id)
+                conn.execute(f"INSERT INTO {tabela} ({colunas}) SELECT {colunas} FROM historico_corridas WHERE {filtro} ORDER BY id", params)
+                movidas += conn.execute(f"DELETE FROM historico_corridas WHERE {filtro}", params).rowcount
+            conn.execute("DELETE FROM arquivamento_em_curso")
+        if ate_id is None:
+            break
+        if verbose:
+            print(f"   {mes}: {movidas:>10,} corridas movidas")
+
+    with banco_tkx.transacao(conn):
+        _indices_e_gatilhos(conn, "main", tabela, mes)
+        conn.execute(f"ANALYZE main.{tabela}")
+        corridas, primeiro, ultimo = conn.execute(f"SELECT COUNT(*), MIN(id), MAX(id) FROM {tabela}").fetchone()
+        conn.execute("""
+            UPDATE particoes_corridas SET status = 'fechada', corridas = ?, primeiro_id = ?, ultimo_id = ?,
+                versao_turnos = (SELECT versao FROM versoes_tabelas WHERE tabela = 'turnos'), fechada_em = CURRENT_TIMESTAMP
+            WHERE mes = ?
+        """, (corridas, primeiro, ultimo, mes))
+    if verbose:
+        print(f"✅ {mes} fechado: {corridas:,} corridas em {tabela} [{time.perf_counter() - t0:.1f}s]")
+    return movidas
+
+
+def arquivar_mes(mes, verbose=False, conn=None):
+    """Leva a partição fechada do mês para o banco de arquivo. False se não havia o que arquivar."""
+    conn = conn or banco_tkx.conectar()
+    particao = next((p for p in banco_tkx.listar_particoes(conn) if p.mes == mes), None)
+    if particao is None or particao.status != "fechada":
+        raise ValueError(f"{mes} não tem partição fechada: rode 'fechar' antes")
+    if particao.esquema == banco_tkx.ESQUEMA_ARQUIVO:
+        return False
+
+    t0 = time.perf_counter()
+    banco_tkx.anexar_arquivo(conn, gravavel=True)
+    arquivo, tabela = banco_tkx.ESQUEMA_ARQUIVO, particao.tabela
+    colunas = ", ".join(banco_tkx.colunas_corridas(conn, "main", tabela, gravaveis=True))
+    # BEGIN simples: o banco principal é só lido, quem grava corridas não espera a cópia
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {arquivo}.{tabela}")  # sobra de uma cópia interrompida
+        _criar_tabela(conn, arquivo, tabela, modelo=tabela)
+        conn.execute(f"INSERT INTO {arquivo}.{tabela} ({colunas}) SELECT {colunas} FROM main.{tabela} ORDER BY id")
+        _indices_e_gatilhos(conn, arquivo, tabela, mes)
+        copiadas = conn.execute(f"SELECT COUNT(*) FROM {arquivo}.{tabela}").fetchone()[0]
+        if copiadas != particao.corridas:
+            raise RuntimeError(f"{mes}: {copiadas} corridas copiadas, mas a partição tem {particao.corridas}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    # Troca de lugar numa transação só: o registro passa a apontar para o arquivo
+    with banco_tkx.transacao(conn):
+        conn.execute("UPDATE particoes_corridas SET esquema = ? WHERE mes = ?", (arquivo, mes))
+        conn.execute(f"DROP TABLE main.{tabela}")
+    conn.execute(f"VACUUM {arquivo}")
+    if verbose:
+        print(f"📦 {mes} arquivado em {banco_tkx.caminho_arquivo(conn)} [{time.perf_counter() - t0:.1f}s]")
+    return True
+
+
+def exibir_particoes(conn=None):
+    particoes = banco_tkx.listar_particoes(conn)
+    vivas = (conn or banco_tkx.conectar()).execute("SELECT COUNT(*) FROM historico_corridas").fetchone()[0]
+    print(f"\n{'MÊS':<9}{'LOCAL':<10}{'STATUS':<10}{'CORRIDAS':>12}  IDS")
+    for p in particoes:
+        print(f"{p.mes:<9}{p.esquema:<10}{p.status:<10}{p.corridas:>12,}  {p.primeiro_id}..{p.ultimo_id}")
+    print(f"{'aberto':<9}{'main':<10}{'vivo':<10}{vivas:>12,}  historico_corridas")
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Partições mensais do histórico de corridas.")
+    sub = parser.add_subparsers(dest="comando")
+    fechar = sub.add_parser("fechar", help="move os meses fechados para partições")
+    fechar.add_argument("--ate", help="último mês a fechar (AAAA-MM, padrão: o mês passado)")
+    fechar.add_argument("--lote", type=int, default=LOTE, help="corridas por transação")
+    fechar.add_argument("--arquivar", action="store_true", help="leva as partições para o banco de arquivo")
+    arquivar = sub.add_parser("arquivar", help="leva partições fechadas para o banco de arquivo")
+    arquivar.add_argument("meses", nargs="*", help="AAAA-MM (padrão: todas as fechadas)")
+    args = parser.parse_args(argv)
+
+    conn = banco_tkx.conectar()
+    try:
+        if args.comando == "fechar":
+            for mes in meses_para_fechar(args.ate, conn):
+                fechar_mes(mes, args.lote, verbose=True, conn=conn)
+                if args.arquivar:
+                    arquivar_mes(mes, verbose=True, conn=conn)
+        elif args.comando == "arquivar":
+            for mes in args.meses or [p.mes for p in banco_tkx.listar_particoes(conn) if p.status == "fechada"]:
+                arquivar_mes(mes, verbose=True, conn=conn)
+    except ValueError as e:
+        print(f"❌ {e}")
+    exibir_particoes(conn)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
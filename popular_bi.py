@@ -1,53 +1,186 @@
-import sqlite3
+import argparse
+import itertools
 import random
+import time
 from datetime import datetime, timedelta
 
-def popular_banco():
-    conn = sqlite3.connect('tkx_franca.db')
-    cursor = conn.cursor()
-
-    print("⏳ Gerando 100 corridas de teste para o BI... Aguarde.")
-
-    # Lista de motoristas e clientes para o teste
-    motoristas = [1] # Fernanda (ID 1)
-    clientes = [1]   # Alessandro (ID 1)
-    
-    for _ in range(100):
-        # Gera data e hora aleatória nos últimos 30 dias
-        dias_atras = random.randint(0, 30)
-        hora = random.randint(0, 23)
-        minuto = random.randint(0, 59)
-        data_hora = datetime.now() - timedelta(days=dias_atras)
-        hora_str = f"{hora:02d}:{minuto:02d}"
-
-        km = round(random.uniform(2.0, 25.0), 1)
-        valor_base = 5.0 + (km * 2.5) # Simulação de tarifa base
-        
-        # Simula multiplicadores dinâmicos
-        multiplicador = 1.0
-        if 6 <= hora < 11: multiplicador = 1.0
-        elif 20 <= hora <= 23: multiplicador = 1.2
-        elif 0 <= hora <= 5: multiplicador = 1.4
-
-        valor_total = round(valor_base * multiplicador, 2)
-        taxa_app = round(valor_total * 0.15, 2)
-        gateway = 0.80
-        fixo = 1.35
-        
-        # Dados extras para o BI Avançado
-        preco_concorrente = round(valor_total * random.uniform(0.9, 1.15), 2)
-        avaliacao = random.randint(3, 5)
-
-        cursor.execute("""
-            INSERT INTO historico_corridas 
-            (motorista_id, cliente_id, valor_total_pago, km_distancia, taxa_app_valor, 
-             custo_gateway, custos_fixos_totais, hora_partida, preco_concorrente, avaliacao_motorista)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (1, 1, valor_total, km, taxa_app, gateway, fixo, hora_str, preco_concorrente, avaliacao))
-
-    conn.commit()
-    conn.close()
-    print("✅ Sucesso! 100 corridas inseridas. Agora teste as opções 7 e 8 no Menu Principal.")
+import banco_tkx
+import consolidado_dre
+
+# Peso de cada hora do dia (0h..23h) na geração: picos de manhã, fim de tarde e saída noturna
+PESOS_HORAS_PADRAO = [
+    2, 1, 1, 1, 1, 2, 4, 8, 9, 6, 5, 5,
+    6, 6, 5, 5, 6, 9, 10, 8, 7, 6, 5, 3,
+]
+
+COLUNAS_INSERCAO = (
+    "motorista_id, cliente_id, valor_total_pago, km_distancia, taxa_app_valor, "
+    "custo_gateway, custos_fixos_totais, data_cadastro, hora_partida, hora_chegada, "
+    "tempo_total, preco_concorrente, avaliacao_motorista, minuto_dia, turno_id"
+)
+SQL_INSERCAO = f"INSERT INTO historico_corridas ({COLUNAS_INSERCAO}) VALUES ({', '.join('?' * 15)})"
+
+
+def multiplicador_dinamico(hora):
+    # Simula multiplicadores dinâmicos
+    multiplicador = 1.0
+    if 6 <= hora < 11: multiplicador = 1.0
+    elif 20 <= hora <= 23: multiplicador = 1.2
+    elif 0 <= hora <= 5: multiplicador = 1.4
+    return multiplicador
+
+
+def _ids_cadastro(conn, tabela, quantidade):
+    """Devolve `quantidade` ids da tabela, criando cadastros sintéticos se faltar gente."""
+    ids = [linha[0] for linha in conn.execute(f"SELECT id FROM {tabela} ORDER BY id LIMIT ?", (quantidade,))]
+    faltam = quantidade - len(ids)
+    if faltam > 0:
+        with banco_tkx.transacao(conn):
+            inicio = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabela}").fetchone()[0] + 1
+            novos = range(inicio, inicio + faltam)
+            if tabela == "motoristas_cadastro":
+                conn.executemany(
+                    "INSERT INTO motoristas_cadastro (id, nome, cpf, telefone, veiculo_modelo, placa, status) VALUES (?, ?, ?, ?, ?, ?, 'ativo')",
+                    ((i, f"Motorista {i}", f"SINT{i:011d}", f"169{i:08d}", "Veículo Teste", f"TST{i:07d}") for i in novos),
+                )
+            else:
+                conn.executemany(
+                    "INSERT INTO clientes (id, nome, telefone, email) VALUES (?, ?, ?, ?)",
+                    ((i, f"Cliente {i}", f"SINT{i:011d}", f"cliente{i}@teste.tkx") for i in novos),
+                )
+        ids.extend(novos)
+    return ids
+
+
+def gerar_corridas(total, motoristas, clientes, dias=30, pesos_horas=None, semente=None, fim=None, config=None,
+                   turnos_por_minuto=None):
+    """Gera `total` corridas realistas (tuplas na ordem de SQL_INSERCAO), sem tocar no banco.
+
+    Com `turnos_por_minuto` (banco_tkx.turnos_por_minuto) o turno já sai preenchido e o
+    gatilho de turno não precisa fazer o UPDATE de cada linha.
+    """
+    turnos_por_minuto = turnos_por_minuto or [None] * 1440
+    rnd = random.Random(semente)
+    acumulado = list(itertools.accumulate(pesos_horas or PESOS_HORAS_PADRAO))
+    fim = fim or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    datas = [(fim - timedelta(days=d)).strftime('%Y-%m-%d') for d in range(dias)]
+    gateway_perc = (config.custo_gateway_percentual if config else 2.5) / 100
+    fixo = round(config.seguro_app_fixo + config.manutencao_app_fixo, 2) if config else 1.35
+    # Motoristas e clientes não rodam por igual: poucos concentram boa parte das corridas
+    peso_motoristas = list(itertools.accumulate(1 / (i + 1) ** 0.6 for i in range(len(motoristas))))
+    peso_clientes = list(itertools.accumulate(1 / (i + 1) ** 0.9 for i in range(len(clientes))))
+
+    # Sorteios feitos em blocos (random.choices com k=) para não pagar uma chamada por campo
+    restantes = total
+    while restantes > 0:
+        n = min(restantes, 10_000)
+        restantes -= n
+        horas = rnd.choices(range(24), cum_weights=acumulado, k=n)
+        ids_m = rnd.choices(motoristas, cum_weights=peso_motoristas, k=n)
+        ids_c = rnd.choices(clientes, cum_weights=peso_clientes, k=n)
+        notas = rnd.choices((1, 2, 3, 4, 5), weights=(1, 2, 8, 30, 59), k=n)
+        for hora, motorista_id, cliente_id, nota in zip(horas, ids_m, ids_c, notas):
+            minuto = rnd.randrange(60)
+            km = round(min(max(rnd.lognormvariate(1.8, 0.55), 1.0), 45.0), 1)
+            duracao = max(4, int(km * rnd.uniform(2.0, 3.5)))
+            chegada = (hora * 60 + minuto + duracao) % 1440
+
+            valor_base = 5.0 + (km * 2.5) # Simulação de tarifa base
+            valor_total = round(valor_base * multiplicador_dinamico(hora), 2)
+
+            yield (
+                motorista_id,
+                cliente_id,
+                valor_total,
+                km,
+                round(valor_total * 0.15, 2),
+                round(valor_total * gateway_perc, 2),
+                fixo,
+                f"{rnd.choice(datas)} {hora:02d}:{minuto:02d}:{rnd.randrange(60):02d}",
+                f"{hora:02d}:{minuto:02d}",
+                f"{chegada // 60:02d}:{chegada % 60:02d}",
+                f"{duracao} min",
+                round(valor_total * rnd.uniform(0.9, 1.15), 2),
+                nota,
+                hora * 60 + minuto,
+                turnos_por_minuto[hora * 60 + minuto],
+            )
+
+
+def _objetos_derivados(conn):
+    """Índices e gatilhos do historico_corridas (SQL para recriar depois da carga)."""
+    return conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = 'historico_corridas' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """).fetchall()
+
+
+def carregar_corridas(total, motoristas=50, clientes=2000, dias=30, pesos_horas=None,
+                      semente=None, lote=50_000, rapido=False, fim=None, conn=None, verbose=True):
+    """Insere `total` corridas sintéticas em transações de `lote` linhas. Retorna linhas/s.
+
+    rapido=True desliga o fsync e remove índices e gatilhos durante a carga; no fim os
+    índices são recriados de uma vez e os consolidados do DRE recalculados.
+    """
+    conn = conn or banco_tkx.conectar()
+    config = banco_tkx.buscar_configuracao(conn=conn)
+    ids_motoristas = _ids_cadastro(conn, "motoristas_cadastro", motoristas)
+    ids_clientes = _ids_cadastro(conn, "clientes", clientes)
+    corridas = gerar_corridas(total, ids_motoristas, ids_clientes, dias, pesos_horas, semente, fim, config,
+                              banco_tkx.turnos_por_minuto(conn))
+
+    derivados = []
+    if rapido:
+        conn.execute("PRAGMA synchronous = OFF")
+        derivados = _objetos_derivados(conn)
+        with banco_tkx.transacao(conn):
+            for tipo, nome, _ in derivados:
+                conn.execute(f"DROP {tipo.upper()} IF EXISTS {nome}")
+
+    inicio = time.perf_counter()
+    inseridas = 0
+    try:
+        while inseridas < total:
+            bloco = list(itertools.islice(corridas, lote))
+            if not bloco:
+                break
+            with banco_tkx.transacao(conn):
+                conn.executemany(SQL_INSERCAO, bloco)
+            inseridas += len(bloco)
+            if verbose:
+                decorrido = time.perf_counter() - inicio
+                print(f"   {inseridas:>12,} / {total:,} corridas | {inseridas / decorrido:,.0f} linhas/s")
+    finally:
+        if rapido:
+            t_indices = time.perf_counter()
+            with banco_tkx.transacao(conn):
+                for _, _, sql in derivados:
+                    conn.execute(sql)
+            consolidado_dre.reconstruir_consolidados(conn=conn)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA optimize")
+            if verbose:
+                print(f"   Índices, gatilhos e consolidados recriados em {time.perf_counter() - t_indices:.1f}s")
+
+    taxa = inseridas / max(time.perf_counter() - inicio, 1e-9)
+    return taxa
+
+
+def popular_banco(total=100, **opcoes):
+    print(f"⏳ Gerando {total:,} corridas de teste para o BI... Aguarde.")
+    taxa = carregar_corridas(total, **opcoes)
+    print(f"✅ Sucesso! {total:,} corridas inseridas ({taxa:,.0f} linhas/s). Agora teste as opções 7 e 8 no Menu Principal.")
+
 
 if __name__ == "__main__":
-    popular_banco()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Gera corridas sintéticas para testar o BI em escala.")
+    parser.add_argument("--corridas", type=int, default=100)
+    parser.add_argument("--motoristas", type=int, default=50)
+    parser.add_argument("--clientes", type=int, default=2000)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--lote", type=int, default=50_000, help="linhas por transação")
+    parser.add_argument("--semente", type=int, default=None, help="semente para gerar sempre o mesmo banco")
+    parser.add_argument("--rapido", action="store_true", help="carga rápida: sem fsync e com índices recriados no fim")
+    args = parser.parse_args()
+    popular_banco(args.corridas, motoristas=args.motoristas, clientes=args.clientes, dias=args.dias,
+                  lote=args.lote, semente=args.semente, rapido=args.rapido)
@@ -0,0 +1,392 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+try:
+    import numpy as np
+except ImportError:  # sem NumPy não há projeção: o simulador do React segue determinístico
+    np = None
+
+import banco_tkx
+import calculadora_tkx
+
+# Projeção de viabilidade em 36 meses por Monte Carlo: o mesmo modelo do calculateProjections
+# (services/financeEngine.ts), rodado em dezenas de milhares de cenários sorteados a partir
+# das corridas reais em vez de um cenário fixo.
+#
+#   configuracoes_estrategicas  gateway (%) e custos fixos por corrida do município
+#   historico_corridas          por dia: ticket médio, km médio, diferença para a concorrência
+#                               e volume; por hora: a distribuição da demanda no dia;
+#                               últimos 30 dias: frota ativa, clientes ativos, corridas/cliente
+#
+# Em cada cenário cada mês sorteia um dia real (ticket, km, concorrência), o crescimento de
+# usuários tem um fator próprio do cenário e ruído mensal do tamanho da variação diária do
+# volume, e a frota cresce por Poisson. Os meses são vetorizados em NumPy sobre os cenários
+# (só a base de usuários, que depende do mês anterior, anda mês a mês); os blocos de cenários
+# rodam num pool de processos, cada um com a sua semente derivada (mesmo resultado com
+# qualquer número de processos).
+#
+#   python projecao_viabilidade.py --cenarios 20000 --saida public/projecao_viabilidade.json
+
+CENARIOS = 20_000
+MESES = 36
+BLOCO = 2_500                  # cenários por tarefa do pool
+PERCENTIS = (5, 25, 50, 75, 95)
+SAIDA_PADRAO = os.path.join("public", "projecao_viabilidade.json")  # servido pelo Vite em /projecao_viabilidade.json
+JANELA_BASE_DIAS = 30          # frota e clientes ativos = quem rodou nestes últimos dias
+
+# Premissas do simulador (constants.ts INITIAL_PARAMS e financeEngine.ts), em R$ por mês
+PARAMETROS_PADRAO = {
+    "motoristas_iniciais": 44,          # sem corridas recentes no banco
+    "usuarios_iniciais": 3_333,         # initialRides / ridesPerUserMonth
+    "corridas_por_usuario_mes": 4.2,
+    "ticket_medio": 18.5,
+    "novos_motoristas_mes": 10,
+    "teto_motoristas": 2_000,
+    "teto_usuarios": 27_398,            # SOM de Franca
+    "crescimento_fases": ((6, 0.07), (24, 0.15), (None, 0.04)),  # (até o mês, crescimento mensal)
+    "corridas_por_motorista_dia": 10.1,
+    "dias_mes": 30.5,
+    "sazonalidade": {1: 0.85, 7: 0.85, 12: 1.20},
+    "custos_fixos": 6_200 + 8_000,      # fixedCosts + custoComercialMkt
+    "marketing": 11_000 + 3_000 + 4_000 + 6_000 + 1_500 + 2_000,  # marketingMonthly + campanhas
+    "tecnologia_por_corrida": 0.15,
+    "impostos_sobre_comissao": 0.112,
+    "elite_motoristas_semestral": 10_000,
+    "fidelidade_passageiros_anual": 5_000,
+    "reserva_operacional_lucro": 0.02,
+    "investimento_inicial": 0.0,
+    # Incertezas do Monte Carlo (não vêm do TS: lá o cenário é fixo)
+    "incerteza_crescimento": 0.25,      # desvio (log) do fator de crescimento de cada cenário
+    "elasticidade_preco": 1.0,          # crescimento extra por 1 ponto de preço abaixo da concorrência
+    "alinhamento_frota": 0.8,           # 1 = frota se distribui nas horas exatamente como a demanda
+}
+
+
+def _exigir_numpy():
+    if np is None:
+        raise RuntimeError("a projeção de viabilidade requer NumPy")
+
+
+# --- Dados reais ---
+
+SQL_DIAS_PARTE = """
+    SELECT substr(data_cadastro, 1, 10) AS dia, SUM(km_distancia) AS km, COUNT(km_distancia) AS n_km,
+           SUM(CASE WHEN preco_concorrente > 0 THEN preco_concorrente END) AS concorrente,
+           SUM(CASE WHEN preco_concorrente > 0 THEN valor_total_pago END) AS pago_comparado
+    FROM {corridas} WHERE data_cadastro IS NOT NULL GROUP BY dia
+"""
+SQL_HORAS_PARTE = "SELECT minuto_dia / 60 AS hora, COUNT(*) AS n FROM {corridas} WHERE minuto_dia IS NOT NULL GROUP BY hora"
+
+
+def dados_empiricos(conn=None, municipio=None):
+    """Distribuições e base inicial tiradas do banco (listas simples: vão para os processos)."""
+    conn = conn or banco_tkx.conectar()
+    config = calculadora_tkx.carregar_configuracao(municipio, conn)
+    if config is None:
+        raise LookupError(f"Configuração não encontrada para {municipio or banco_tkx.municipio_atual()}.")
+
+    volume = dict(conn.execute("SELECT dia, corridas FROM dre_diario WHERE corridas > 0"))
+    ticket = dict(conn.execute("SELECT dia, bruto / corridas FROM dre_diario WHERE corridas > 0"))
+    dias = conn.execute(f"""
+        SELECT dia, SUM(km) / SUM(n_km), SUM(concorrente) / SUM(pago_comparado) - 1
+        FROM ({banco_tkx.sql_por_particao(SQL_DIAS_PARTE, conn)}) GROUP BY dia ORDER BY dia
+    """).fetchall()
+    horas = dict(conn.execute(f"SELECT hora, SUM(n) FROM ({banco_tkx.sql_por_particao(SQL_HORAS_PARTE, conn)}) GROUP BY hora"))
+
+    dados = {
+        "gateway": config.custo_gateway_percentual / 100,
+        "fixo_por_corrida": config.seguro_app_fixo + config.manutencao_app_fixo,
+        "dias": len(dias),
+        "ultimo_dia": dias[-1][0] if dias else None,
+        "tickets_diarios": [ticket[d] for d, _, _ in dias if d in ticket] or [PARAMETROS_PADRAO["ticket_medio"]],
+        "km_diarios": [km for _, km, _ in dias if km] or [None],
+        "diferencas_concorrente": [dif for _, _, dif in dias if dif is not None] or [0.0],
+        "volumes_diarios": [volume[d] for d, _, _ in dias if d in volume],
+        "mix_horas": [horas.get(h, 0) for h in range(24)],
+    }
+    if sum(dados["mix_horas"]) == 0:
+        dados["mix_horas"] = [1] * 24
+
+    # Base no fim do histórico: quem rodou nos últimos JANELA_BASE_DIAS dias
+    if dados["ultimo_dia"]:
+        fim = dados["ultimo_dia"]
+        inicio = date.fromordinal(date.fromisoformat(fim).toordinal() - JANELA_BASE_DIAS + 1).isoformat()
+        fonte = banco_tkx.fonte_corridas(conn, inicio, fim, ("data_cadastro", "motorista_id", "cliente_id"))
+        motoristas, clientes, corridas = conn.execute(f"""
+            SELECT COUNT(DISTINCT motorista_id), COUNT(DISTINCT cliente_id), COUNT(*) FROM {fonte}
+            WHERE data_cadastro >= ? AND data_cadastro < date(?, '+1 day')
+        """, (inicio, fim)).fetchone()
+        if motoristas:
+            dados["motoristas_iniciais"] = motoristas
+        if clientes:
+            dados["usuarios_iniciais"] = clientes
+            dados["corridas_por_usuario_mes"] = corridas / clientes * PARAMETROS_PADRAO["dias_mes"] / JANELA_BASE_DIAS
+    return dados
+
+
+# --- Simulação (roda nos processos do pool) ---
+
+def _fase(mes, fases):
+    for ate, crescimento in fases:
+        if ate is None or mes <= ate:
+            return crescimento
+
+
+def simular_bloco(cenarios, semente, dados, parametros, meses=MESES, primeiro_mes=1):
+    """Roda `cenarios` cenários e devolve arrays (cenários x meses) e os fatores de cada cenário."""
+    _exigir_numpy()
+    p = parametros
+    rng = np.random.default_rng(semente)
+    forma = (cenarios, meses)
+
+    # Sorteios mês a mês a partir dos dias reais
+    ticket = rng.choice(np.asarray(dados["tickets_diarios"], dtype=float), forma)
+    diferenca = rng.choice(np.asarray(dados["diferencas_concorrente"], dtype=float), forma)
+    km_diarios = np.asarray([k for k in dados["km_diarios"] if k], dtype=float)
+    if len(km_diarios):
+        # Corridas mais longas ocupam o motorista por mais tempo: capacidade inversa ao km médio
+        capacidade_relativa = km_diarios.mean() / rng.choice(km_diarios, forma)
+    else:
+        capacidade_relativa = np.ones(forma)
+    # Variação do volume: desvio robusto (MAD) do log do volume diário, que um dia atípico
+    # (carga em lote, feriado) não distorce; no mês ela se dilui pelos dias
+    volumes = np.log(np.asarray([v for v in dados["volumes_diarios"] if v > 0], dtype=float))
+    desvio_diario = 1.4826 * np.median(np.abs(volumes - np.median(volumes))) if len(volumes) > 1 else 0.1
+    desvio_mes = desvio_diario / np.sqrt(p["dias_mes"])
+    ruido = rng.lognormal(-desvio_mes ** 2 / 2, desvio_mes, forma)
+
+    fator_crescimento = rng.lognormal(0, p["incerteza_crescimento"], cenarios)
+    calendario = (np.arange(meses) + primeiro_mes - 1) % 12 + 1
+    fases = np.array([_fase(m + 1, p["crescimento_fases"]) for m in range(meses)])
+    crescimento = np.maximum(fases * fator_crescimento[:, None] * (1 + p["elasticidade_preco"] * diferenca), 0)
+    sazonalidade = np.array([p["sazonalidade"].get(int(m), 1.0) for m in calendario])
+
+    motoristas = np.minimum(dados.get("motoristas_iniciais", p["motoristas_iniciais"])
+                            + np.cumsum(rng.poisson(p["novos_motoristas_mes"], forma), axis=1), p["teto_motoristas"])
+
+    # Base de usuários: curva S com saturação no teto (cada mês depende do anterior)
+    usuarios = np.empty(forma)
+    atual = np.full(cenarios, float(dados.get("usuarios_iniciais", p["usuarios_iniciais"])))
+    for m in range(meses):
+        atual = np.minimum(p["teto_usuarios"], atual * (1 + crescimento[:, m] * np.maximum(0, 1 - atual / p["teto_usuarios"])))
+        usuarios[:, m] = atual
+    por_usuario = dados.get("corridas_por_usuario_mes", p["corridas_por_usuario_mes"])
+    demanda = usuarios * por_usuario * sazonalidade * ruido
+
+    # Atendimento hora a hora: a frota não acompanha perfeitamente o pico
+    mix = np.asarray(dados["mix_horas"], dtype=float)
+    mix /= mix.sum()
+    oferta_hora = p["alinhamento_frota"] * mix + (1 - p["alinhamento_frota"]) / 24
+    capacidade = motoristas * p["corridas_por_motorista_dia"] * p["dias_mes"] * capacidade_relativa
+    corridas = np.minimum(demanda[..., None] * mix, capacidade[..., None] * oferta_hora).sum(axis=2)
+
+    # DRE mensal (mesmas faixas de repasse do simulador: 15% na fonte, cashback acima de 300/450)
+    por_motorista = corridas / motoristas
+    taxa_efetiva = np.where(por_motorista >= 450, 0.10, np.where(por_motorista >= 300, 0.12, 0.15))
+    bruto = corridas * ticket
+    comissao_bruta = bruto * calculadora_tkx.TAXA_COMISSAO
+    receita = bruto * taxa_efetiva
+    impostos = comissao_bruta * p["impostos_sobre_comissao"]
+    variaveis = corridas * dados["fixo_por_corrida"] + bruto * dados["gateway"]
+    meses_corridos = np.arange(1, meses + 1)
+    campanhas = (np.where(meses_corridos % 6 == 0, p["elite_motoristas_semestral"], 0)
+                 + np.where(meses_corridos % 12 == 0, p["fidelidade_passageiros_anual"], 0))
+    preliminar = (receita - impostos - variaveis - p["custos_fixos"] - corridas * p["tecnologia_por_corrida"]
+                  - p["marketing"] - campanhas)
+    lucro = preliminar - np.maximum(preliminar, 0) * p["reserva_operacional_lucro"]
+    acumulado = np.cumsum(lucro, axis=1) - p["investimento_inicial"]
+
+    return {
+        "lucro": lucro.astype(np.float32),
+        "acumulado": acumulado.astype(np.float32),
+        "corridas": corridas.astype(np.float32),
+        # Fatores por cenário para a sensibilidade
+        "fatores": {
+            "crescimento": fator_crescimento,
+            "ticket": ticket.mean(axis=1),
+            "diferenca_concorrente": diferenca.mean(axis=1),
+            "capacidade_por_km": capacidade_relativa.mean(axis=1),
+        },
+    }
+
+
+def _simular_tarefa(argumentos):
+    return simular_bloco(*argumentos)
+
+
+# --- Resumo ---
+
+def _percentis(valores, eixo=0):
+    """{'p5': ..., ...}; listas por mês com eixo=0 em arrays 2D. NaN (nunca aconteceu) vira None."""
+    if valores.size == 0:
+        return {f"p{q}": None for q in PERCENTIS}
+    resultado = np.percentile(valores, PERCENTIS, axis=eixo)
+    return {f"p{q}": np.round(r, 2).tolist() for q, r in zip(PERCENTIS, resultado)}
+
+
+def _primeiro_mes(condicao):
+    """Primeiro mês (1..N) em que a condição vale em cada cenário; NaN se nunca."""
+    mes = np.argmax(condicao, axis=1).astype(float) + 1
+    mes[~condicao.any(axis=1)] = np.nan
+    return mes
+
+
+def _mes_em_diante(condicao):
+    """Primeiro mês a partir do qual a condição vale até o fim (lucro que não volta a ser prejuízo)."""
+    ate_o_fim = np.flip(np.logical_and.accumulate(np.flip(condicao, axis=1), axis=1), axis=1)
+    return _primeiro_mes(ate_o_fim)
+
+
+def _resumo_mes(meses):
+    validos = meses[~np.isnan(meses)]
+    return dict(_percentis(validos), probabilidade=round(len(validos) / len(meses), 4))
+
+
+def _postos(x):
+    ordem = np.argsort(x, kind="stable")
+    postos = np.empty(len(x))
+    postos[ordem] = np.arange(len(x))
+    return postos
+
+
+def resumir(blocos, dados, parametros, rotulos, semente):
+    """Junta os blocos e resume em percentis (dict pronto para JSON)."""
+    lucro = np.concatenate([b["lucro"] for b in blocos])
+    acumulado = np.concatenate([b["acumulado"] for b in blocos])
+    corridas = np.concatenate([b["corridas"] for b in blocos])
+
+    caixa_minimo = acumulado.min(axis=1)
+    mes_caixa_minimo = acumulado.argmin(axis=1) + 1.0
+    final = acumulado[:, -1]
+    # Sensibilidade: correlação de postos (Spearman) de cada fator com o resultado acumulado
+    postos_final = _postos(final)
+    sensibilidade = {}
+    for nome in blocos[0]["fatores"]:
+        fator = np.concatenate([b["fatores"][nome] for b in blocos])
+        if np.ptp(fator) > 0:
+            sensibilidade[nome] = round(float(np.corrcoef(_postos(fator), postos_final)[0, 1]), 4)
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "cenarios": int(lucro.shape[0]),
+        "semente": semente,
+        "meses": rotulos,
+        "percentis": list(PERCENTIS),
+        "empirico": {
+            "dias": dados["dias"],
+            "ultimo_dia": dados["ultimo_dia"],
+            "ticket_medio": round(float(np.mean(dados["tickets_diarios"])), 2),
+            "diferenca_concorrente_media": round(float(np.mean(dados["diferencas_concorrente"])), 4),
+            "mix_horas": [round(h / sum(dados["mix_horas"]), 4) for h in dados["mix_horas"]],
+            "motoristas_iniciais": dados.get("motoristas_iniciais", parametros["motoristas_iniciais"]),
+            "usuarios_iniciais": dados.get("usuarios_iniciais", parametros["usuarios_iniciais"]),
+            "corridas_por_usuario_mes": round(dados.get("corridas_por_usuario_mes", parametros["corridas_por_usuario_mes"]), 2),
+        },
+        "lucro_liquido": _percentis(lucro),
+        "lucro_acumulado": _percentis(acumulado),
+        "corridas": _percentis(corridas),
+        "equilibrio": {
+            # Primeiro mês de lucro que não volta a ser prejuízo, e o mês em que o acumulado
+            # volta a zero; probabilidade = fração dos cenários em que acontece nos N meses
+            "mes_lucro": _resumo_mes(_mes_em_diante(lucro >= 0)),
+            "mes_payback": _resumo_mes(_mes_em_diante(acumulado >= 0)),
+        },
+        "caixa_minimo": {"valor": _percentis(caixa_minimo), "mes": _percentis(mes_caixa_minimo)},
+        "lucro_acumulado_final": dict(_percentis(final), probabilidade_positivo=round(float((final > 0).mean()), 4)),
+        "sensibilidade": sensibilidade,
+    }
+
+
+# --- Execução ---
+
+def _mes_seguinte(dia):
+    """(ano, mês) do mês seguinte ao último dia com corridas (hoje, sem histórico)."""
+    base = date.fromisoformat(dia) if dia else date.today()
+    return (base.year + 1, 1) if base.month == 12 else (base.year, base.month + 1)
+
+
+def projetar(cenarios=CENARIOS, meses=MESES, processos=None, semente=None, parametros=None, conn=None, municipio=None):
+    """Roda a projeção e devolve o resumo (dict pronto para JSON)."""
+    _exigir_numpy()
+    t0 = time.perf_counter()
+    parametros = dict(PARAMETROS_PADRAO, **(parametros or {}))
+    dados = dados_empiricos(conn, municipio)
+    ano, mes = _mes_seguinte(dados["ultimo_dia"])
+    semente = semente if semente is not None else int(np.random.SeedSequence().entropy % 2**32)
+
+    tamanhos = [min(BLOCO, cenarios - i) for i in range(0, cenarios, BLOCO)]
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+    tarefas = [(n, s, dados, parametros, meses, mes) for n, s in zip(tamanhos, sementes)]
+    processos = processos or min(len(tarefas), os.cpu_count() or 1)
+    if processos <= 1:
+        blocos = [_simular_tarefa(t) for t in tarefas]
+    else:
+        # spawn, como no relatório consolidado: nada de conexão herdada por fork
+        with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn")) as pool:
+            blocos = list(pool.map(_simular_tarefa, tarefas))
+    rotulos = [f"{ano + (mes - 1 + i) // 12:04d}-{(mes - 1 + i) % 12 + 1:02d}" for i in range(meses)]
+    resumo = resumir(blocos, dados, parametros, rotulos, semente)
+    resumo["segundos"] = round(time.perf_counter() - t0, 2)
+    return resumo
+
+
+def exibir_resumo(resumo):
+    print("\n" + "=" * 60)
+    print(f"   PROJEÇÃO DE VIABILIDADE - {resumo['cenarios']:,} CENÁRIOS ({resumo['meses'][0]} a {resumo['meses'][-1]})")
+    print("=" * 60)
+    e = resumo["empirico"]
+    print(f"Base: {e['motoristas_iniciais']} motoristas | {e['usuarios_iniciais']:,} clientes | "
+          f"ticket R$ {e['ticket_medio']:.2f} | {e['dias']} dias de histórico")
+    print(f"\n{'MÊS':<9}{'LUCRO P5':>13}{'P50':>13}{'P95':>13}{'ACUMULADO P50':>16}")
+    for i, rotulo in enumerate(resumo["meses"]):
+        if i % 6 == 5 or i == 0:
+            l, a = resumo["lucro_liquido"], resumo["lucro_acumulado"]
+            print(f"{rotulo:<9}{l['p5'][i]:>13,.0f}{l['p50'][i]:>13,.0f}{l['p95'][i]:>13,.0f}{a['p50'][i]:>16,.0f}")
+
+    def mes(faixa):
+        if faixa["p50"] is None:
+            return "não acontece"
+        return f"mês {faixa['p50']:.0f} (P5-P95: {faixa['p5']:.0f}-{faixa['p95']:.0f}) em {faixa['probabilidade']:.0%} dos cenários"
+
+    print(f"\nLucro mensal sustentado: {mes(resumo['equilibrio']['mes_lucro'])}")
+    print(f"Payback do acumulado:    {mes(resumo['equilibrio']['mes_payback'])}")
+    caixa = resumo["caixa_minimo"]
+    print(f"Caixa mínimo: R$ {caixa['valor']['p50']:,.0f} (P5: R$ {caixa['valor']['p5']:,.0f}) no mês {caixa['mes']['p50']:.0f}")
+    final = resumo["lucro_acumulado_final"]
+    print(f"Acumulado em {len(resumo['meses'])} meses: R$ {final['p50']:,.0f} (P5: R$ {final['p5']:,.0f} | "
+          f"P95: R$ {final['p95']:,.0f}) | positivo em {final['probabilidade_positivo']:.0%}")
+    print("Sensibilidade (Spearman com o acumulado): " +
+          ", ".join(f"{k} {v:+.2f}" for k, v in sorted(resumo["sensibilidade"].items(), key=lambda kv: -abs(kv[1]))))
+    print(f"\n[{resumo['segundos']:.2f}s]")
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Projeção de viabilidade por Monte Carlo a partir das corridas reais.")
+    parser.add_argument("--cenarios", type=int, default=CENARIOS)
+    parser.add_argument("--meses", type=int, default=MESES)
+    parser.add_argument("--processos", type=int, help="padrão: um por bloco, até o nº de CPUs")
+    parser.add_argument("--semente", type=int, help="repete a mesma projeção")
+    parser.add_argument("--saida", default=SAIDA_PADRAO, help="JSON para o dashboard React")
+    args = parser.parse_args(argv)
+
+    try:
+        resumo = projetar(args.cenarios, args.meses, args.processos, args.semente)
+    except (LookupError, RuntimeError) as e:
+        print(f"❌ {e}")
+        return
+    exibir_resumo(resumo)
+    os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+    with open(args.saida + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(resumo, f, ensure_ascii=False, allow_nan=False)  # NaN não é JSON válido no navegador
+    os.replace(args.saida + ".tmp", args.saida)
+    print(f"✅ Projeção salva em {args.saida}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,117 @@
+import sys
+
+import banco_tkx
+import cache_consultas
+from migracoes import K_PLACAR
+
+# Rankings do BI lidos dos placares da migração 9, sem ordenar o histórico.
+#
+#   placar_corridas_lucro   as K_PLACAR corridas de maior lucro líquido de cada mês
+#   dre_motorista           corridas e comissão por (mês, motorista), índice (mes, comissao)
+#   placar_clientes         corridas por (mês, cliente)
+#   placar_avaliacoes       avaliações e soma das notas por (mês, motorista), média gerada
+#   clientes.total_corridas corridas de cada cliente no histórico inteiro (migração 13)
+#
+# Os gatilhos do historico_corridas mantêm tudo a cada corrida; a reconstrução fica em
+# consolidado_dre.reconstruir_consolidados. Com mes='AAAA-MM' cada ranking lê só as
+# primeiras linhas do mês pelo índice; sem mês, combina os meses.
+
+MINIMO_AVALIACOES = 20  # abaixo disso a média de um motorista não entra no ranking
+
+
+@cache_consultas.em_cache("historico_corridas")
+def top_corridas_lucro(limite=5, mes=None, conn=None):
+    """[(corrida_id, lucro líquido)] das corridas mais lucrativas do mês ou do histórico inteiro."""
+    if limite > K_PLACAR:
+        raise ValueError(f"o placar guarda só as {K_PLACAR} melhores corridas de cada mês")
+    conn = conn or banco_tkx.conectar()
+    filtro, params = ("WHERE mes = ?", (mes,)) if mes else ("", ())
+    return conn.execute(f"""
+        SELECT corrida_id, lucro FROM placar_corridas_lucro {filtro}
+        ORDER BY lucro DESC, corrida_id LIMIT ?
+    """, params + (limite,)).fetchall()
+
+
+@cache_consultas.em_cache("historico_corridas", "motoristas_cadastro")
+def top_motoristas_comissao(limite=10, mes=None, conn=None):
+    """[(nome, corridas, comissão)] dos motoristas que mais geraram comissão TKX."""
+    conn = conn or banco_tkx.conectar()
+    if mes:
+        sql, params = """
+            SELECT m.nome, d.corridas, d.comissao FROM dre_motorista d
+            JOIN motoristas_cadastro m ON m.id = d.motorista_id
+            WHERE d.mes = ? ORDER BY d.comissao DESC LIMIT ?
+        """, (mes, limite)
+    else:
+        sql, params = """
+            SELECT m.nome, SUM(d.corridas), SUM(d.comissao) FROM dre_motorista d
+            JOIN motoristas_cadastro m ON m.id = d.motorista_id
+            GROUP BY d.motorista_id ORDER BY SUM(d.comissao) DESC LIMIT ?
+        """, (limite,)
+    return conn.execute(sql, params).fetchall()
+
+
+@cache_consultas.em_cache("historico_corridas", "clientes")
+def clientes_fieis(limite=3, mes=None, conn=None):
+    """[(nome, viagens)] dos clientes com mais corridas."""
+    conn = conn or banco_tkx.conectar()
+    if mes is None:
+        # Histórico inteiro: as primeiras entradas do índice de total_corridas
+        return conn.execute("""
+            SELECT nome, total_corridas FROM clientes WHERE total_corridas > 0
+            ORDER BY total_corridas DESC LIMIT ?
+        """, (limite,)).fetchall()
+    return conn.execute("""
+        SELECT c.nome, SUM(p.corridas) FROM placar_clientes p
+        JOIN clientes c ON c.id = p.cliente_id
+        WHERE p.mes = ?
+        GROUP BY c.nome ORDER BY SUM(p.corridas) DESC LIMIT ?
+    """, (mes, limite)).fetchall()
+
+
+@cache_consultas.em_cache("historico_corridas", "motoristas_cadastro")
+def motoristas_melhor_avaliados(limite=5, mes=None, minimo=MINIMO_AVALIACOES, conn=None):
+    """[(nome, nota média, avaliações)] dos motoristas com pelo menos `minimo` avaliações."""
+    conn = conn or banco_tkx.conectar()
+    if mes:
+        sql, params = """
+            SELECT m.nome, p.media, p.avaliacoes FROM placar_avaliacoes p
+            JOIN motoristas_cadastro m ON m.id = p.motorista_id
+            WHERE p.mes = ? AND p.avaliacoes >= ? ORDER BY p.media DESC LIMIT ?
+        """, (mes, minimo, limite)
+    else:
+        sql, params = """
+            SELECT m.nome, SUM(p.soma_notas) / SUM(p.avaliacoes), SUM(p.avaliacoes) FROM placar_avaliacoes p
+            JOIN motoristas_cadastro m ON m.id = p.motorista_id
+            GROUP BY p.motorista_id HAVING SUM(p.avaliacoes) >= ?
+            ORDER BY SUM(p.soma_notas) / SUM(p.avaliacoes) DESC LIMIT ?
+        """, (minimo, limite)
+    return conn.execute(sql, params).fetchall()
+
+
+def exibir_rankings(mes=None):
+    periodo = mes or "histórico completo"
+    print("\n" + "🏆" * 25)
+    print(f"      RANKINGS TKX ({periodo})")
+    print("🏆" * 25)
+
+    print("\n💎 CORRIDAS MAIS LUCRATIVAS:")
+    for corrida_id, lucro in top_corridas_lucro(5, mes):
+        print(f"Corrida #{corrida_id} | Lucro Líquido: R$ {lucro:.2f}")
+
+    print("\n🚗 MOTORISTAS POR COMISSÃO TKX:")
+    for nome, corridas, comissao in top_motoristas_comissao(10, mes):
+        print(f"{nome:<25} | {corridas:>6} corridas | R$ {comissao:>10.2f}")
+
+    print("\n👥 CLIENTES MAIS FIÉIS:")
+    for nome, viagens in clientes_fieis(3, mes):
+        print(f"Passageiro: {nome} | Viagens: {viagens}")
+
+    print(f"\n⭐ MOTORISTAS MELHOR AVALIADOS (mín. {MINIMO_AVALIACOES} avaliações):")
+    for nome, media, avaliacoes in motoristas_melhor_avaliados(5, mes):
+        print(f"{nome:<25} | Nota: {media:.2f} | {avaliacoes} avaliações")
+
+
+if __name__ == "__main__":
+    # python rankings_bi.py [AAAA-MM]
+    exibir_rankings(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,278 @@
+import atexit
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Rastreamento das instruções SQL de todos os módulos (via banco_tkx.conectar()).
+#
+#   TKX_SQL_TRACE=1                 liga e, na saída, mostra as 10 instruções mais caras no stderr
+#   TKX_SQL_TRACE=sql_stats.json    liga e, na saída, grava as estatísticas em JSON
+#   TKX_SQL_LENTO_MS=100            instruções acima disso vão para o stderr com o EXPLAIN QUERY PLAN
+#
+# Desligado, banco_tkx abre um sqlite3.Connection comum: nenhum custo por instrução.
+# Ligado, cada execute/fetch é cronometrado e atribuído ao módulo.função que o chamou
+# (ex.: bi_estrategico.dados_bi_estrategico, consultas_gui.consultar_estrategico).
+
+VARIAVEL_ATIVACAO = 'TKX_SQL_TRACE'
+VARIAVEL_LIMITE = 'TKX_SQL_LENTO_MS'
+LIMITE_LENTO_MS = 100.0
+
+_configuracao = os.environ.get(VARIAVEL_ATIVACAO, "").strip()
+ATIVO = _configuracao not in ("", "0")
+limite_lento_ms = float(os.environ.get(VARIAVEL_LIMITE, LIMITE_LENTO_MS))
+
+# Módulos que só repassam a chamada: o chamador registrado é o primeiro fora deles
+MODULOS_INTERMEDIARIOS = {"rastreamento_sql", "banco_tkx", "cache_consultas", "sqlite3", "sqlite3.dbapi2", "functools"}
+
+_trava = threading.Lock()
+_estatisticas = {}  # sql normalizado -> dict de contadores
+_local = threading.local()
+
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar(sql):
+    """Texto da instrução sem literais nem espaços extras: agrupa execuções da mesma consulta."""
+    sql = _LITERAIS.sub("?", sql)
+    sql = _LISTAS.sub("(?, ...)", sql)
+    return _ESPACOS.sub(" ", sql).strip()
+
+
+def _nome_modulo(globais):
+    modulo = globais.get("__name__", "")
+    if modulo == "__main__" and globais.get("__file__"):
+        # Script rodado direto (python bi_estrategico.py): usa o nome do arquivo
+        return os.path.splitext(os.path.basename(globais["__file__"]))[0]
+    return modulo
+
+
+def _funcao_chamadora(profundidade):
+    quadro = sys._getframe(profundidade + 1)
+    nome = "?"
+    while quadro is not None:
+        modulo = _nome_modulo(quadro.f_globals)
+        # Métodos aparecem com a classe (co_qualname), ex.: AppTKX.atualizar_operacional
+        nome = f"{modulo}.{quadro.f_code.co_qualname}".removesuffix(".<module>")
+        if modulo not in MODULOS_INTERMEDIARIOS:
+            break
+        quadro = quadro.f_back
+    return nome
+
+
+def _chamador():
+    funcao = _funcao_chamadora(2)
+    origem = getattr(_local, "origem", None)
+    return f"{origem} > {funcao}" if origem else funcao
+
+
+def origem_atual():
+    """Quem chamou a função que chamou isto (None com o rastreamento desligado).
+
+    Para código que despacha consultas a outra thread guardar quem as pediu.
+    """
+    return _funcao_chamadora(2) if ATIVO else None
+
+
+@contextmanager
+def origem(nome):
+    """As instruções executadas dentro do bloco são atribuídas a `nome > função`."""
+    anterior = getattr(_local, "origem", None)
+    _local.origem = nome
+    try:
+        yield
+    finally:
+        _local.origem = anterior
+
+
+class _Execucao:
+    __slots__ = ("conexao", "sql", "parametros", "chave", "chamador", "segundos", "linhas", "registrada_lenta",
+                 "pendente_segundos", "pendente_linhas")
+
+    def __init__(self, conexao, sql, parametros, chamador):
+        self.conexao = conexao
+        self.sql = sql
+        self.parametros = parametros
+        self.chave = normalizar(sql)
+        self.chamador = chamador
+        self.segundos = 0.0
+        self.linhas = 0
+        self.registrada_lenta = False
+        # Linhas lidas uma a uma (for linha in cursor) acumulam aqui e vão para as
+        # estatísticas de uma vez, sem pegar a trava a cada linha
+        self.pendente_segundos = 0.0
+        self.pendente_linhas = 0
+
+    def descarregar(self):
+        if self.pendente_linhas or self.pendente_segundos:
+            segundos, linhas = self.pendente_segundos, self.pendente_linhas
+            self.pendente_segundos, self.pendente_linhas = 0.0, 0
+            self.somar(segundos, linhas)
+
+    def somar(self, segundos, linhas, nova=False):
+        self.segundos += segundos
+        self.linhas += linhas
+        with _trava:
+            e = _estatisticas.get(self.chave)
+            if e is None:
+                e = _estatisticas[self.chave] = {"execucoes": 0, "total_ms": 0.0, "max_ms": 0.0, "linhas": 0, "lentas": 0, "chamadores": {}}
+            if nova:
+                e["execucoes"] += 1
+                e["chamadores"][self.chamador] = e["chamadores"].get(self.chamador, 0) + 1
+            e["total_ms"] += segundos * 1000
+            e["linhas"] += linhas
+            e["max_ms"] = max(e["max_ms"], self.segundos * 1000)
+            lenta = self.segundos * 1000 >= limite_lento_ms and not self.registrada_lenta
+            if lenta:
+                e["lentas"] += 1
+                self.registrada_lenta = True
+        if lenta:
+            self._registrar_lenta()
+
+    def _registrar_lenta(self):
+        plano = []
+        # Só consultas e DML têm plano (DDL, PRAGMA, transações e afins ficam sem)
+        if re.match(r"\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", self.sql, re.IGNORECASE):
+            try:
+                linhas = sqlite3.Connection.execute(self.conexao, "EXPLAIN QUERY PLAN " + self.sql, self.parametros or ())
+                plano = [linha[-1] for linha in linhas]
+            except sqlite3.Error as e:
+                plano = [f"(sem plano: {e})"]
+        print(f"🐢 SQL lento ({self.segundos * 1000:.1f} ms, {self.linhas} linhas) em {self.chamador}: {self.chave}", file=sys.stderr)
+        for detalhe in plano:
+            print(f"     {detalhe}", file=sys.stderr)
+
+
+class CursorRastreado(sqlite3.Cursor):
+    _execucao = None
+
+    def execute(self, sql, parametros=()):
+        if self._execucao is not None:
+            self._execucao.descarregar()
+        self._execucao = _Execucao(self.connection, sql, parametros, _chamador())
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._execucao.somar(time.perf_counter() - inicio, 0, nova=True)
+
+    def executemany(self, sql, sequencia):
+        if self._execucao is not None:
+            self._execucao.descarregar()
+        self._execucao = _Execucao(self.connection, sql, None, _chamador())
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, sequencia)
+        finally:
+            self._execucao.somar(time.perf_counter() - inicio, max(self.rowcount, 0), nova=True)
+
+    def _medir(self, buscar, contar):
+        inicio = time.perf_counter()
+        resultado = buscar()
+        if self._execucao is not None:
+            self._execucao.somar(time.perf_counter() - inicio, contar(resultado))
+        return resultado
+
+    def fetchone(self):
+        return self._medir(super().fetchone, lambda linha: linha is not None)
+
+    def fetchmany(self, size=None):
+        buscar = super().fetchmany
+        return self._medir(lambda: buscar() if size is None else buscar(size), len)
+
+    def fetchall(self):
+        return self._medir(super().fetchall, len)
+
+    def __next__(self):
+        execucao = self._execucao
+        inicio = time.perf_counter()
+        try:
+            linha = super().__next__()
+        except StopIteration:
+            if execucao is not None:
+                execucao.pendente_segundos += time.perf_counter() - inicio
+                execucao.descarregar()
+            raise
+        if execucao is not None:
+            execucao.pendente_segundos += time.perf_counter() - inicio
+            execucao.pendente_linhas += 1
+        return linha
+
+    def close(self):
+        if self._execucao is not None:
+            self._execucao.descarregar()
+        super().close()
+
+
+class ConexaoRastreada(sqlite3.Connection):
+    """sqlite3.Connection cujos execute/executemany/cursor passam por CursorRastreado."""
+
+    def cursor(self, factory=CursorRastreado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+
+def fabrica_conexao():
+    """Classe de conexão para sqlite3.connect(factory=...), conforme TKX_SQL_TRACE."""
+    return ConexaoRastreada if ATIVO else sqlite3.Connection
+
+
+def estatisticas():
+    """{sql normalizado: contadores}, das instruções mais caras para as mais baratas."""
+    with _trava:
+        copia = {sql: {**e, "chamadores": dict(e["chamadores"])} for sql, e in _estatisticas.items()}
+    for e in copia.values():
+        e["media_ms"] = e["total_ms"] / e["execucoes"] if e["execucoes"] else 0.0
+    return dict(sorted(copia.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+def exportar_json(caminho):
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump({"limite_lento_ms": limite_lento_ms, "instrucoes": estatisticas()}, f, indent=2, ensure_ascii=False)
+
+
+def limpar():
+    with _trava:
+        _estatisticas.clear()
+
+
+def resumo(limite=10, arquivo=sys.stderr):
+    print(f"\n--- SQL: {limite} instruções mais caras ---", file=arquivo)
+    for sql, e in list(estatisticas().items())[:limite]:
+        chamador = max(e["chamadores"], key=e["chamadores"].get) if e["chamadores"] else "?"
+        print(f"{e['total_ms']:9.1f} ms | {e['execucoes']:6d}x | média {e['media_ms']:7.2f} ms | "
+              f"{e['linhas']:8d} linhas | {chamador} | {sql[:90]}", file=arquivo)
+
+
+def _ao_sair():
+    if not _estatisticas:
+        return
+    if _configuracao.lower().endswith(".json"):
+        exportar_json(_configuracao)
+    else:
+        resumo()
+
+
+if ATIVO:
+    atexit.register(_ao_sair)
+
+
+if __name__ == "__main__":
+    # python rastreamento_sql.py sql_stats.json  -> resumo de um JSON exportado
+    with open(sys.argv[1], encoding="utf-8") as f:
+        dados = json.load(f)
+    for sql, e in list(dados["instrucoes"].items())[:20]:
+        print(f"{e['total_ms']:9.1f} ms | {e['execucoes']:6d}x | máx {e['max_ms']:7.2f} ms | {e['lentas']} lentas | {sql[:100]}")
+        for chamador, vezes in e["chamadores"].items():
+            print(f"{'':12}{vezes:6d}x {chamador}")
@@ -1,53 +1,174 @@
-import sqlite3
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import namedtuple
 
-def gerar_extrato_motorista(motorista_id):
-    conn = sqlite3.connect('tkx_franca.db')
-    cursor = conn.cursor()
+import banco_tkx
 
-    # 1. Busca os dados do motorista
-    cursor.execute("SELECT nome, placa FROM motoristas_cadastro WHERE id = ?", (motorista_id,))
-    motorista = cursor.fetchone()
+# Itens do repasse semanal: uma passada pelas corridas ainda não pagas do período,
+# já ordenadas por motorista pelo índice parcial idx_corridas_a_repassar. Só o
+# historico_corridas: um mês só vira partição depois de todo repassado.
+SQL_ITENS_REPASSE = """
+    SELECT h.motorista_id, m.nome, h.id, h.data_cadastro, h.valor_total_pago, h.taxa_app_valor
+    FROM historico_corridas h
+    LEFT JOIN motoristas_cadastro m ON m.id = h.motorista_id
+    WHERE h.repasse_id IS NULL AND h.id <= ?
+      AND h.data_cadastro >= ? AND h.data_cadastro < date(?, '+1 day')
+    ORDER BY h.motorista_id, h.data_cadastro
+"""
 
-    if not motorista:
-        print(f"\n❌ Motorista com ID {motorista_id} não encontrado.")
-        conn.close()
-        return
+ResumoRepasse = namedtuple("ResumoRepasse", "execucao_id motoristas corridas total_repasse arquivo_itens arquivo_totais segundos")
+
+def dados_extrato_motorista(motorista_id, conn=None):
+    """(motorista, corridas, total_repasse) sem imprimir; motorista é None se o ID não existir."""
+    conn = conn or banco_tkx.conectar()
 
-    nome, placa = motorista
+    # 1. Busca os dados do motorista
+    motorista = banco_tkx.buscar_motorista(motorista_id, conn)
+    if not motorista:
+        return None, [], 0
 
     # 2. Busca as corridas (Ajustado para usar a coluna correta: data_cadastro)
-    cursor.execute("""
+    corridas = conn.execute(f"""
         SELECT valor_total_pago, taxa_app_valor, data_cadastro
-        FROM historico_corridas 
+        FROM {banco_tkx.fonte_corridas(conn, colunas=("motorista_id", "valor_total_pago", "taxa_app_valor", "data_cadastro"))} 
         WHERE motorista_id = ?
-    """, (motorista_id,))
-    
-    corridas = cursor.fetchall()
+    """, (motorista_id,)).fetchall()
+
+    total_repasse = sum(valor_pago - taxa_tkx for valor_pago, taxa_tkx, _ in corridas)
+    return motorista, corridas, total_repasse
+
+def gerar_extrato_motorista(motorista_id):
+    motorista, corridas, total_repasse = dados_extrato_motorista(motorista_id)
+
+    if not motorista:
+        print(f"\n❌ Motorista com ID {motorista_id} não encontrado.")
+        return
 
     print("\n" + "="*45)
     print(f"      EXTRATO DE REPASSE - TKX FRANCA")
     print("="*45)
-    print(f"MOTORISTA: {nome}")
-    print(f"VEÍCULO:   {placa}")
+    print(f"MOTORISTA: {motorista.nome}")
+    print(f"VEÍCULO:   {motorista.placa}")
     print("-"*45)
 
-    total_repasse = 0
-
     if not corridas:
         print("Aviso: Nenhuma corrida vinculada a este ID ainda.")
     else:
-        for c in corridas:
-            valor_pago, taxa_tkx, data = c
+        for valor_pago, taxa_tkx, data in corridas:
             valor_motorista = valor_pago - taxa_tkx
-            total_repasse += valor_motorista
             print(f"{data} | Total: R$ {valor_pago:>6.2f} | Seu: R$ {valor_motorista:>6.2f}")
 
     print("-"*45)
     print(f"VALOR TOTAL A REPASSAR:     R$ {total_repasse:.2f}")
     print("="*45 + "\n")
 
-    conn.close()
+def _escritores(formato, arq_itens, arq_totais):
+    """Funções que gravam uma linha de item e uma linha de total no formato pedido."""
+    if formato == "jsonl":
+        def item(*campos):
+            arq_itens.write(json.dumps(dict(zip(("motorista_id", "motorista", "corrida_id", "data", "valor_pago", "taxa_tkx", "repasse"), campos)), ensure_ascii=False) + "\n")
+        def total(*campos):
+            arq_totais.write(json.dumps(dict(zip(("motorista_id", "motorista", "corridas", "total_repasse"), campos)), ensure_ascii=False) + "\n")
+        return item, total
+    itens, totais = csv.writer(arq_itens), csv.writer(arq_totais)
+    itens.writerow(("motorista_id", "motorista", "corrida_id", "data", "valor_pago", "taxa_tkx", "repasse"))
+    totais.writerow(("motorista_id", "motorista", "corridas", "total_repasse"))
+    return (lambda *campos: itens.writerow(campos)), (lambda *campos: totais.writerow(campos))
+
+def executar_repasse(inicio, fim, pasta="repasses", formato="csv", conn=None):
+    """Repasse de todos os motoristas entre duas datas (AAAA-MM-DD, inclusivas).
+
+    Percorre as corridas ainda não pagas uma única vez, gravando os itens e o total de
+    cada motorista em arquivo à medida que lê (memória constante). No fim marca as
+    corridas com o id da execução, para que o próximo repasse não as pague de novo.
+    """
+    conn = conn or banco_tkx.conectar()
+    os.makedirs(pasta, exist_ok=True)
+    # Corridas gravadas durante a execução ficam para o próximo repasse
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM historico_corridas").fetchone()[0]
+    with banco_tkx.transacao(conn):
+        execucao_id = conn.execute("INSERT INTO repasses_execucoes (inicio, fim) VALUES (?, ?)", (inicio, fim)).lastrowid
+
+    extensao = "jsonl" if formato == "jsonl" else "csv"
+    base = os.path.join(pasta, f"repasse_{execucao_id:05d}_{inicio}_{fim}")
+    arquivo_itens, arquivo_totais = f"{base}.{extensao}", f"{base}_totais.{extensao}"
+    t0 = time.perf_counter()
+    motoristas = corridas = 0
+    total_geral = 0.0
+    try:
+        with open(arquivo_itens, "w", encoding="utf-8", newline="") as f_itens, \
+             open(arquivo_totais, "w", encoding="utf-8", newline="") as f_totais:
+            gravar_item, gravar_total = _escritores(formato, f_itens, f_totais)
+            atual, nome_atual, qtd, soma = None, None, 0, 0.0
+            for motorista_id, nome, corrida_id, data, valor_pago, taxa_tkx in conn.execute(SQL_ITENS_REPASSE, (ultimo_id, inicio, fim)):
+                if qtd and motorista_id != atual:
+                    gravar_total(atual, nome_atual, qtd, round(soma, 2))
+                    motoristas += 1
+                    total_geral += soma
+                    qtd, soma = 0, 0.0
+                atual, nome_atual = motorista_id, nome
+                valor_motorista = (valor_pago or 0) - (taxa_tkx or 0)
+                gravar_item(motorista_id, nome, corrida_id, data, valor_pago, taxa_tkx, round(valor_motorista, 2))
+                qtd += 1
+                soma += valor_motorista
+                corridas += 1
+            if qtd:
+                gravar_total(atual, nome_atual, qtd, round(soma, 2))
+                motoristas += 1
+                total_geral += soma
+
+        with banco_tkx.transacao(conn):
+            marcadas = conn.execute("""
+                UPDATE historico_corridas SET repasse_id = ?
+                WHERE repasse_id IS NULL AND id <= ?
+                  AND data_cadastro >= ? AND data_cadastro < date(?, '+1 day')
+            """, (execucao_id, ultimo_id, inicio, fim)).rowcount
+            if marcadas != corridas:
+                raise RuntimeError(f"{marcadas} corridas marcadas, mas {corridas} foram lidas: outro repasse rodou ao mesmo tempo?")
+            conn.execute("""
+                UPDATE repasses_execucoes SET status = 'concluido', motoristas = ?, corridas = ?, total_repasse = ?, arquivo = ?
+                WHERE id = ?
+            """, (motoristas, corridas, round(total_geral, 2), arquivo_itens, execucao_id))
+    except BaseException:
+        with banco_tkx.transacao(conn):
+            conn.execute("UPDATE repasses_execucoes SET status = 'falhou' WHERE id = ?", (execucao_id,))
+        raise
+
+    return ResumoRepasse(execucao_id, motoristas, corridas, round(total_geral, 2),
+                         arquivo_itens, arquivo_totais, time.perf_counter() - t0)
+
+def repasse_semanal(inicio, fim, pasta="repasses", formato="csv"):
+    print(f"\n⏳ Repasse de {inicio} a {fim}...")
+    resumo = executar_repasse(inicio, fim, pasta, formato)
+    taxa = resumo.corridas / resumo.segundos if resumo.segundos else 0
+
+    print("\n" + "="*45)
+    print(f"      REPASSE SEMANAL #{resumo.execucao_id} - TKX FRANCA")
+    print("="*45)
+    print(f"MOTORISTAS:  {resumo.motoristas}")
+    print(f"CORRIDAS:    {resumo.corridas} ({taxa:,.0f} corridas/s)")
+    print(f"TOTAL:       R$ {resumo.total_repasse:.2f}")
+    print(f"ITENS:       {resumo.arquivo_itens}")
+    print(f"TOTAIS:      {resumo.arquivo_totais}")
+    print("="*45 + "\n")
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Extrato de um motorista ou repasse de toda a frota.")
+    parser.add_argument("--inicio", help="repasse da frota: data inicial AAAA-MM-DD")
+    parser.add_argument("--fim", help="repasse da frota: data final AAAA-MM-DD (inclusiva)")
+    parser.add_argument("--formato", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--pasta", default="repasses")
+    args = parser.parse_args(argv)
+
+    if args.inicio and args.fim:
+        repasse_semanal(args.inicio, args.fim, args.pasta, args.formato)
+    else:
+        m_id = input("Digite o ID do motorista (Ex: 1): ")
+        gerar_extrato_motorista(m_id)
 
 if __name__ == "__main__":
-    m_id = input("Digite o ID do motorista (Ex: 1): ")
-    gerar_extrato_motorista(m_id)
\ No newline at end of file
+    main(sys.argv[1:])
@@ -0,0 +1,173 @@
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # sem NumPy o lote é resolvido com listas
+    np = None
+
+import banco_tkx
+
+# Grade de tarifas compilada por minuto do dia (0..1439).
+#
+# Cada linha de tarifas_dinamicas/grade_horarios vale de hora_inicio (inclusive) até
+# hora_fim (exclusive). Fim terminando em :59 (ex.: 23:59, 05:59) inclui o próprio
+# minuto, que é como as tabelas foram preenchidas. Início maior que o fim atravessa a
+# meia-noite (ex.: 22:00 -> 04:00). Buracos na grade recebem o período reserva ('Noite',
+# como o simulador sempre fez) e sobreposições ficam com a linha de menor id.
+
+MINUTOS_DIA = 1440
+PERIODO_RESERVA = 'Noite'
+INTERVALO_VERIFICACAO = 1.0  # segundos entre consultas ao contador de alterações
+
+
+def minuto_do_dia(hora):
+    """'HH:MM', 'HH:MM:SS', datetime/time ou int (já em minutos) -> 0..1439."""
+    if isinstance(hora, int):
+        return hora % MINUTOS_DIA
+    if isinstance(hora, str):
+        h, m = hora.strip()[:5].split(":")
+        return (int(h) * 60 + int(m)) % MINUTOS_DIA
+    return hora.hour * 60 + hora.minute
+
+
+def _formatar(minuto):
+    return f"{minuto // 60:02d}:{minuto % 60:02d}"
+
+
+def _intervalos(lista_minutos):
+    """[1, 2, 3, 7, 8] -> [(1, 3), (7, 8)]"""
+    intervalos = []
+    for m in lista_minutos:
+        if intervalos and intervalos[-1][1] == m - 1:
+            intervalos[-1][1] = m
+        else:
+            intervalos.append([m, m])
+    return [tuple(i) for i in intervalos]
+
+
+def compilar_grade(tarifas, periodo_reserva=PERIODO_RESERVA):
+    """Compila linhas Tarifa em (periodos[1440], multiplicadores[1440], problemas)."""
+    periodos = [None] * MINUTOS_DIA
+    multiplicadores = [0.0] * MINUTOS_DIA
+    sobrepostos = {}
+
+    for tarifa in tarifas:
+        inicio = minuto_do_dia(tarifa.hora_inicio)
+        fim = minuto_do_dia(tarifa.hora_fim)
+        if str(tarifa.hora_fim).strip()[3:5] == "59":
+            fim = (fim + 1) % MINUTOS_DIA
+        if inicio < fim:
+            minutos = range(inicio, fim)
+        elif inicio > fim:  # atravessa a meia-noite
+            minutos = list(range(inicio, MINUTOS_DIA)) + list(range(0, fim))
+        else:
+            minutos = range(MINUTOS_DIA)
+
+        for m in minutos:
+            if periodos[m] is None:
+                periodos[m] = tarifa.periodo
+                multiplicadores[m] = float(tarifa.multiplicador)
+            elif periodos[m] != tarifa.periodo:
+                sobrepostos.setdefault((periodos[m], tarifa.periodo), []).append(m)
+
+    problemas = []
+    for (primeiro, segundo), minutos in sobrepostos.items():
+        for ini, fim in _intervalos(minutos):
+            problemas.append(f"Sobreposição {_formatar(ini)}-{_formatar(fim)}: '{segundo}' ignorado, vale '{primeiro}'")
+
+    buracos = [m for m in range(MINUTOS_DIA) if periodos[m] is None]
+    if buracos:
+        reserva = next((t for t in tarifas if t.periodo == periodo_reserva), None)
+        nome, mult = (reserva.periodo, float(reserva.multiplicador)) if reserva else ("Padrão", 1.0)
+        for ini, fim in _intervalos(buracos):
+            problemas.append(f"Sem tarifa {_formatar(ini)}-{_formatar(fim)}: usando '{nome}' ({mult:.1f}x)")
+        for m in buracos:
+            periodos[m] = nome
+            multiplicadores[m] = mult
+
+    return periodos, multiplicadores, problemas
+
+
+class ResolvedorTarifas:
+    """Consulta O(1) da dinâmica por horário, recompilada quando a tabela muda no banco."""
+
+    def __init__(self, tabela='tarifas_dinamicas', caminho=None, intervalo_verificacao=INTERVALO_VERIFICACAO):
+        self.tabela = tabela
+        self.caminho = caminho
+        self.intervalo_verificacao = intervalo_verificacao
+        self._trava = threading.Lock()
+        self._versao = None
+        self._ultima_verificacao = 0.0
+        self._grade = None
+        self.problemas = []
+
+    def _versao_banco(self, conn):
+        linha = conn.execute("SELECT versao FROM versoes_tabelas WHERE tabela = ?", (self.tabela,)).fetchone()
+        return linha[0] if linha else 0
+
+    def _atualizar(self):
+        agora = time.monotonic()
+        if self._grade is not None and agora - self._ultima_verificacao < self.intervalo_verificacao:
+            return self._grade
+        with self._trava:
+            conn = banco_tkx.conectar(self.caminho)
+            versao = self._versao_banco(conn)
+            if self._grade is None or versao != self._versao:
+                periodos, multiplicadores, self.problemas = compilar_grade(banco_tkx.listar_tarifas(self.tabela, conn))
+                vetor = np.asarray(multiplicadores, dtype=np.float64) if np is not None else None
+                self._grade = (periodos, multiplicadores, vetor)
+                self._versao = versao
+            self._ultima_verificacao = agora
+        return self._grade
+
+    def invalidar(self):
+        """Força a recompilação na próxima consulta."""
+        self._grade = None
+
+    def resolver(self, hora):
+        """(periodo, multiplicador) para um horário."""
+        periodos, multiplicadores, _ = self._atualizar()
+        m = minuto_do_dia(hora)
+        return periodos[m], multiplicadores[m]
+
+    def multiplicadores(self, horas):
+        """Multiplicadores de vários horários de uma vez.
+
+        Um array NumPy de minutos do dia é resolvido vetorizado e devolve outro array;
+        qualquer outra sequência (strings, datetimes, ints) devolve uma lista.
+        """
+        _, multiplicadores, vetor = self._atualizar()
+        if vetor is not None and isinstance(horas, np.ndarray):
+            return vetor[np.mod(horas.astype(np.int64), MINUTOS_DIA)]
+        return [multiplicadores[minuto_do_dia(h)] for h in horas]
+
+    def periodos(self, horas):
+        """Nome do período de vários horários de uma vez."""
+        periodos, _, _ = self._atualizar()
+        return [periodos[minuto_do_dia(h)] for h in horas]
+
+
+_resolvedores = {}
+
+
+def resolvedor(tabela='tarifas_dinamicas', caminho=None):
+    """Resolvedor compartilhado por tabela e banco."""
+    chave = (tabela, banco_tkx.caminho_banco(caminho))
+    if chave not in _resolvedores:
+        _resolvedores[chave] = ResolvedorTarifas(tabela, caminho)
+    return _resolvedores[chave]
+
+
+if __name__ == "__main__":
+    for tabela in ("tarifas_dinamicas", "grade_horarios"):
+        r = resolvedor(tabela)
+        print(f"\n=== {tabela.upper()} ===")
+        anterior = None
+        for minuto in range(MINUTOS_DIA):
+            atual = r.resolver(minuto)
+            if atual != anterior:
+                print(f"{_formatar(minuto)} -> {atual[0]:<14} {atual[1]:.1f}x")
+                anterior = atual
+        for problema in r.problemas:
+            print(f"⚠️ {problema}")
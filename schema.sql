@@ -1,61 +1,97 @@
--- 1. Tabela de Motoristas
-CREATE TABLE IF NOT EXISTS motoristas (
+-- Schema canônico do tkx_franca.db
+-- Aplicado pela migração 1 de migracoes.py (PRAGMA user_version).
+-- Todas as instruções são idempotentes: o mesmo arquivo roda num banco novo
+-- ou num banco que já está em uso sem duplicar dados.
+
+-- 1. Tabela de Motoristas (cadastro completo usado por todos os scripts)
+CREATE TABLE IF NOT EXISTS motoristas_cadastro (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     nome TEXT NOT NULL,
-    status TEXT DEFAULT 'ativo',
-    taxa_adesao_paga BOOLEAN DEFAULT 0,
-    saldo_a_receber REAL DEFAULT 0.00
+    cpf TEXT UNIQUE NOT NULL,
+    telefone TEXT,
+    veiculo_modelo TEXT,
+    placa TEXT UNIQUE,
+    data_cadastro DATETIME DEFAULT CURRENT_TIMESTAMP,
+    status TEXT DEFAULT 'pendente' -- pendente, ativo, bloqueado
 );
 
--- 2. Tabela de Horários e Multiplicadores (Para automação das Tabelas 1.0 a 1.3)
-CREATE TABLE IF NOT EXISTS grade_horarios (
+-- 2. Tabela de Clientes (Passageiros)
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT NOT NULL,
+    email TEXT UNIQUE,
+    telefone TEXT UNIQUE NOT NULL,
+    data_cadastro DATETIME DEFAULT CURRENT_TIMESTAMP,
+    total_corridas INTEGER DEFAULT 0,
+    nota_media REAL DEFAULT 5.0
+);
+
+-- 3. Tabela de Horários e Multiplicadores (usada pelo simulador_preco.py)
+CREATE TABLE IF NOT EXISTS tarifas_dinamicas (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    periodo TEXT, -- Ex: Madrugada, Pico, Normal
+    periodo TEXT, -- Ex: Manhã, Tarde, Noite, Madrugada
     hora_inicio TIME,
     hora_fim TIME,
     multiplicador REAL -- Ex: 1.20
 );
 
--- 3. Tabela Principal de Corridas (Onde o DRE nasce)
+-- 4. Parâmetros do DRE por município
+CREATE TABLE IF NOT EXISTS configuracoes_estrategicas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    municipio TEXT,
+    tarifa_base_fixa REAL,
+    valor_por_km REAL,
+    custo_gateway_percentual REAL,
+    seguro_app_fixo REAL,
+    manutencao_app_fixo REAL
+);
+
+-- 5. Tabela Principal de Corridas (Onde o DRE nasce)
 CREATE TABLE IF NOT EXISTS historico_corridas (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     motorista_id INTEGER,
     valor_total_pago REAL, -- Valor do Slider
     km_distancia REAL,
     taxa_app_valor REAL, -- Os 15% calculados na hora
-    custo_gateway REAL, -- Os 2.5% 
-    custos_fixos_totais REAL, -- Soma do Seguro + Manutencao + Provisao 
-    liquido_motorista REAL,
-    data_corrida DATETIME DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (motorista_id) REFERENCES motoristas(id)
+    custo_gateway REAL, -- Os 2.5%
+    custos_fixos_totais REAL, -- Soma do Seguro + Manutencao + Provisao
+    data_cadastro DATETIME DEFAULT CURRENT_TIMESTAMP,
+    local_partida TEXT,
+    local_chegada TEXT,
+    hora_partida TEXT, -- HH:MM
+    hora_chegada TEXT,
+    tempo_total TEXT,
+    preco_concorrente REAL,
+    avaliacao_motorista INTEGER,
+    cliente_id INTEGER,
+    FOREIGN KEY (motorista_id) REFERENCES motoristas_cadastro(id)
 );
 
--- Inserindo os multiplicadores base
-INSERT INTO grade_horarios (periodo, hora_inicio, hora_fim, multiplicador) VALUES 
-('Madrugada', '00:00', '05:59', 1.2),
-('Normal', '06:00', '17:59', 1.0),
-('Pico', '18:00', '20:59', 1.1),
-('Noite', '21:00', '23:59', 1.2);
-
--- 4. Refinando a Tabela de Motoristas (com campos reais)
-CREATE TABLE IF NOT EXISTS motoristas_cadastro (
+-- Tabelas legadas: mantidas apenas para não perder dados de bancos antigos.
+-- motoristas      -> substituída por motoristas_cadastro
+-- clientes_cadastro -> substituída por clientes
+-- grade_horarios  -> substituída por tarifas_dinamicas
+CREATE TABLE IF NOT EXISTS grade_horarios (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    nome TEXT NOT NULL,
-    cpf TEXT UNIQUE NOT NULL,
-    telefone TEXT,
-    veiculo_modelo TEXT,
-    placa TEXT UNIQUE,
-    data_cadastro DATETIME DEFAULT CURRENT_TIMESTAMP,
-    status TEXT DEFAULT 'pendente' -- pendente, ativo, bloqueado
+    periodo TEXT,
+    hora_inicio TIME,
+    hora_fim TIME,
+    multiplicador REAL
 );
 
--- 5. Criando a Tabela de Clientes (Passageiros)
-CREATE TABLE IF NOT EXISTS clientes (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    nome TEXT NOT NULL,
-    email TEXT UNIQUE,
-    telefone TEXT UNIQUE NOT NULL,
-    data_cadastro DATETIME DEFAULT CURRENT_TIMESTAMP,
-    total_corridas INTEGER DEFAULT 0,
-    nota_media REAL DEFAULT 5.0
-);
\ No newline at end of file
+-- Configuração padrão de Franca
+INSERT INTO configuracoes_estrategicas (municipio, tarifa_base_fixa, valor_por_km, custo_gateway_percentual, seguro_app_fixo, manutencao_app_fixo)
+SELECT 'Franca', 5.00, 2.43, 2.5, 0.60, 0.40
+WHERE NOT EXISTS (SELECT 1 FROM configuracoes_estrategicas WHERE municipio = 'Franca');
+
+-- Multiplicadores base (só quando a tabela ainda está vazia)
+INSERT INTO tarifas_dinamicas (periodo, hora_inicio, hora_fim, multiplicador)
+SELECT periodo, hora_inicio, hora_fim, multiplicador FROM (
+    SELECT 'Manhã' AS periodo, '06:30' AS hora_inicio, '11:00' AS hora_fim, 1.0 AS multiplicador
+    UNION ALL SELECT 'Tarde', '11:00', '17:00', 0.9
+    UNION ALL SELECT 'Vespertina', '17:00', '20:00', 1.1
+    UNION ALL SELECT 'Noite', '20:00', '23:59', 1.2
+    UNION ALL SELECT 'Madrugada', '00:00', '05:30', 1.4
+    UNION ALL SELECT 'Madrugada II', '05:30', '06:30', 1.3
+)
+WHERE NOT EXISTS (SELECT 1 FROM tarifas_dinamicas);
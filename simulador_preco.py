@@ -1,35 +1,30 @@
-import sqlite3
 from datetime import datetime
 
-def calcular_simulacao(distancia_km, hora_manual=None):
-    conn = sqlite3.connect('tkx_franca.db')
-    cursor = conn.cursor()
+import resolvedor_tarifas
+
+def cotar_corrida(distancia_km, hora_atual, caminho=None):
+    """(periodo, multiplicador, valor_final) para a distância e o horário HH:MM, sem imprimir."""
+    # Dinâmica do horário: consulta em memória na grade compilada (sem SQL por cotação)
+    periodo, multiplicador = resolvedor_tarifas.resolvedor(caminho=caminho).resolver(hora_atual)
+
+    # Regra de cálculo base (Exemplo: R$ 2.00 por KM + R$ 5.00 base)
+    valor_base = 5.00 + (distancia_km * 2.50)
+    valor_final = valor_base * multiplicador
+    return periodo, multiplicador, valor_final
 
+def cotar_lote(distancias_km, horarios, caminho=None):
+    """Valores estimados de várias corridas (mesma regra de cotar_corrida)."""
+    multiplicadores = resolvedor_tarifas.resolvedor(caminho=caminho).multiplicadores(horarios)
+    return [(5.00 + (km * 2.50)) * m for km, m in zip(distancias_km, multiplicadores)]
+
+def calcular_simulacao(distancia_km, hora_manual=None):
     # Se não digitarmos uma hora, ele pega a hora atual do computador
     if hora_manual:
         hora_atual = hora_manual
     else:
         hora_atual = datetime.now().strftime('%H:%M')
 
-    # Busca a dinâmica para o horário informado
-    cursor.execute("""
-        SELECT periodo, multiplicador 
-        FROM tarifas_dinamicas 
-        WHERE ? BETWEEN hora_inicio AND hora_fim
-    """, (hora_atual,))
-    
-    resultado = cursor.fetchone()
-    
-    if not resultado:
-        # Caso o horário esteja no limite da meia-noite (00:00)
-        cursor.execute("SELECT periodo, multiplicador FROM tarifas_dinamicas WHERE periodo = 'Noite'")
-        resultado = cursor.fetchone()
-
-    periodo, multiplicador = resultado
-
-    # Regra de cálculo base (Exemplo: R$ 2.00 por KM + R$ 5.00 base)
-    valor_base = 5.00 + (distancia_km * 2.50)
-    valor_final = valor_base * multiplicador
+    periodo, multiplicador, valor_final = cotar_corrida(distancia_km, hora_atual)
 
     print("\n" + "="*40)
     print("      SIMULADOR DE CORRIDA TKX")
@@ -42,9 +37,10 @@ def calcular_simulacao(distancia_km, hora_manual=None):
     print(f"VALOR ESTIMADO:     R$ {valor_final:.2f}")
     print("="*40 + "\n")
 
-    conn.close()
-
-if __name__ == "__main__":
+def main():
     km = float(input("Distância da corrida (KM): "))
     h = input("Deseja testar um horário específico? (HH:MM) ou Enter para agora: ")
-    calcular_simulacao(km, h if h else None)
\ No newline at end of file
+    calcular_simulacao(km, h if h else None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import json
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # sem NumPy não há snapshot: os relatórios seguem pelo SQLite
+    np = None
+
+import banco_tkx
+
+# Cópia colunar do historico_corridas para as agregações do BI.
+#
+# Cada coluna é um arquivo binário cru (<pasta>/<coluna>.bin) lido com np.memmap, sem
+# cópia. O manifesto.json guarda quantas linhas valem, o último id copiado, os contadores
+# de versoes_tabelas vistos na cópia e os totais do que já está no snapshot. A
+# sincronização só acrescenta corridas com id maior que o último; se o contador de edições
+# (migração 14: alteração ou remoção de corrida já gravada) ou o dos turnos andou, o
+# snapshot é refeito do zero. Os totais conferidos com o dre_mensal são só uma checagem
+# de consistência da cópia. O SQLite continua sendo a fonte da verdade: os relatórios usam
+# o snapshot só com motor="colunar".
+
+# (coluna, expressão no SELECT, dtype). NULL vira -1 nos inteiros e NaN nos reais.
+COLUNAS = [
+    ("id", "id", "<i8"),
+    ("motorista_id", "COALESCE(motorista_id, -1)", "<i8"),
+    ("cliente_id", "COALESCE(cliente_id, -1)", "<i8"),
+    ("valor_total_pago", "valor_total_pago", "<f8"),
+    ("taxa_app_valor", "taxa_app_valor", "<f8"),
+    ("custo_gateway", "custo_gateway", "<f8"),
+    ("custos_fixos_totais", "custos_fixos_totais", "<f8"),
+    ("preco_concorrente", "preco_concorrente", "<f8"),
+    ("avaliacao_motorista", "avaliacao_motorista", "<f8"),
+    ("minuto_dia", "COALESCE(minuto_dia, -1)", "<i2"),
+    ("turno_id", "COALESCE(turno_id, -1)", "<i4"),
+    ("dia", "COALESCE(CAST(strftime('%Y%m%d', data_cadastro) AS INTEGER), 0)", "<i4"),  # AAAAMMDD
+]
+# Totais conferidos com dre_mensal a cada sincronização (mesmas métricas dos consolidados)
+TOTAIS = [("corridas", None), ("bruto", "valor_total_pago"), ("comissao", "taxa_app_valor"),
+          ("gateway", "custo_gateway"), ("fixos", "custos_fixos_totais")]
+COLUNAS_ORIGEM = ("id", "motorista_id", "cliente_id", "valor_total_pago", "taxa_app_valor", "custo_gateway",
+                  "custos_fixos_totais", "preco_concorrente", "avaliacao_motorista", "minuto_dia", "turno_id", "data_cadastro")
+COLUNAS_TOTAIS = {coluna: total for total, coluna in TOTAIS if coluna}
+TOLERANCIA_TOTAIS = 1e-6  # relativa: somas de float em ordens diferentes
+LOTE_LEITURA = 200_000
+VERSAO_FORMATO = 2
+
+_abertos = {}  # pasta -> SnapshotColunar
+
+
+def pasta_padrao(caminho=None):
+    return banco_tkx.caminho_banco(caminho) + ".colunar"
+
+
+class SnapshotColunar:
+    """Colunas memory-mapped de um snapshot (somente leitura)."""
+
+    def __init__(self, pasta, manifesto):
+        self.pasta = pasta
+        self.manifesto = manifesto
+        self.linhas = manifesto["linhas"]
+        self.ultimo_id = manifesto["ultimo_id"]
+        self._colunas = {}
+
+    def __getitem__(self, coluna):
+        arr = self._colunas.get(coluna)
+        if arr is None:
+            dtype = dict((c, d) for c, _, d in COLUNAS)[coluna]
+            if self.linhas == 0:
+                arr = np.empty(0, dtype=dtype)
+            else:
+                arr = np.memmap(os.path.join(self.pasta, f"{coluna}.bin"), dtype=dtype, mode="r", shape=(self.linhas,))
+            self._colunas[coluna] = arr
+        return arr
+
+
+def _ler_manifesto(pasta):
+    try:
+        with open(os.path.join(pasta, "manifesto.json"), encoding="utf-8") as f:
+            manifesto = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifesto if manifesto.get("formato") == VERSAO_FORMATO else None
+
+
+def _gravar_manifesto(pasta, manifesto):
+    temporario = os.path.join(pasta, "manifesto.json.tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2)
+    os.replace(temporario, os.path.join(pasta, "manifesto.json"))
+
+
+def _versao(conn, tabela):
+    linha = conn.execute("SELECT versao FROM versoes_tabelas WHERE tabela = ?", (tabela,)).fetchone()
+    return linha[0] if linha else 0
+
+
+def _totais_banco(conn):
+    linha = conn.execute("""
+        SELECT COALESCE(SUM(corridas), 0), COALESCE(SUM(bruto), 0), COALESCE(SUM(comissao), 0),
+               COALESCE(SUM(gateway), 0), COALESCE(SUM(fixos), 0)
+        FROM dre_mensal
+    """).fetchone()
+    return dict(zip((t for t, _ in TOTAIS), linha))
+
+
+def _totais_batem(a, b):
+    return all(abs(a[t] - b[t]) <= TOLERANCIA_TOTAIS * max(1.0, abs(b[t])) for t, _ in TOTAIS)
+
+
+def _acrescentar(conn, pasta, manifesto, ate_id, verbose):
+    """Copia as corridas (ultimo_id, ate_id] para o fim dos arquivos das colunas."""
+    arquivos = {}
+    for coluna, _, dtype in COLUNAS:
+        caminho = os.path.join(pasta, f"{coluna}.bin")
+        f = open(caminho, "r+b" if os.path.exists(caminho) else "w+b")
+        # Descarta bytes de uma sincronização interrompida (além do que o manifesto diz valer)
+        f.truncate(manifesto["linhas"] * np.dtype(dtype).itemsize)
+        f.seek(0, os.SEEK_END)
+        arquivos[coluna] = f
+
+    inicio = time.perf_counter()
+    novas = 0
+    try:
+        cursor = conn.execute(
+            f"SELECT {', '.join(e for _, e, _ in COLUNAS)} FROM {banco_tkx.fonte_corridas(conn, colunas=COLUNAS_ORIGEM)} WHERE id > ? AND id <= ? ORDER BY id",
+            (manifesto["ultimo_id"], ate_id),
+        )
+        while True:
+            bloco = cursor.fetchmany(LOTE_LEITURA)
+            if not bloco:
+                break
+            for (coluna, _, dtype), valores in zip(COLUNAS, zip(*bloco)):
+                arr = np.array(valores, dtype=dtype)
+                arquivos[coluna].write(arr.tobytes())
+                if coluna in COLUNAS_TOTAIS:
+                    manifesto["totais"][COLUNAS_TOTAIS[coluna]] += float(np.nansum(arr))
+            novas += len(bloco)
+            if verbose:
+                print(f"   {manifesto['linhas'] + novas:>12,} corridas no snapshot")
+    finally:
+        for f in arquivos.values():
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+
+    manifesto["linhas"] += novas
+    manifesto["totais"]["corridas"] += novas
+    manifesto["ultimo_id"] = ate_id if novas else manifesto["ultimo_id"]
+    if verbose and novas:
+        print(f"   {novas:,} corridas copiadas em {time.perf_counter() - inicio:.1f}s")
+    return novas
+
+
+def sincronizar(conn=None, pasta=None, reconstruir=False, verbose=False):
+    """Atualiza o snapshot com as corridas novas (ou o refaz) e devolve o SnapshotColunar aberto."""
+    if np is None:
+        raise RuntimeError("snapshot colunar requer NumPy")
+    conn = conn or banco_tkx.conectar()
+    pasta = pasta or pasta_padrao()
+    os.makedirs(pasta, exist_ok=True)
+
+    banco_tkx.fonte_corridas(conn)  # anexa o arquivo, se houver, antes de abrir a transação
+    conn.execute("BEGIN")  # leitura consistente: MAX(id), consolidados e corridas do mesmo instante
+    try:
+        ate_id = banco_tkx.ultimo_id_corridas(conn)
+        totais_banco = _totais_banco(conn)
+        versao_turnos = _versao(conn, "turnos")
+        versao_edicoes = _versao(conn, "historico_corridas_edicoes")
+
+        manifesto = None if reconstruir else _ler_manifesto(pasta)
+        # turno_id de todas as corridas muda quando os turnos são reconfigurados; qualquer
+        # edição de corrida já gravada pode ter atingido uma linha copiada
+        if manifesto is not None and (manifesto["versao_turnos"] != versao_turnos
+                                      or manifesto["versao_edicoes"] != versao_edicoes
+                                      or manifesto["ultimo_id"] > ate_id):
+            manifesto = None
+        if manifesto is not None and manifesto["ultimo_id"] == ate_id:
+            return _abrir(pasta, manifesto)
+
+        for tentativa in range(2):
+            if manifesto is None:
+                if verbose:
+                    print("⏳ Montando o snapshot colunar do zero...")
+                manifesto = {"formato": VERSAO_FORMATO, "linhas": 0, "ultimo_id": 0, "versao_turnos": versao_turnos,
+                             "versao_edicoes": versao_edicoes, "totais": {t: 0.0 for t, _ in TOTAIS}}
+                for coluna, _, _ in COLUNAS:
+                    caminho = os.path.join(pasta, f"{coluna}.bin")
+                    if os.path.exists(caminho):
+                        os.remove(caminho)
+            anterior = dict(manifesto["totais"])
+            _acrescentar(conn, pasta, manifesto, ate_id, verbose)
+            if _totais_batem(manifesto["totais"], totais_banco):
+                break
+            if tentativa == 0 and anterior["corridas"] > 0:
+                manifesto = None  # cópia incremental inconsistente: refaz
+            else:
+                raise RuntimeError("snapshot colunar não bate com dre_mensal (rode consolidado_dre.py --reconstruir)")
+    finally:
+        conn.commit()
+
+    manifesto["sincronizado_em"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    _gravar_manifesto(pasta, manifesto)
+    return _abrir(pasta, manifesto)
+
+
+def _abrir(pasta, manifesto):
+    aberto = _abertos.get(pasta)
+    if aberto is None or aberto.linhas != manifesto["linhas"] or aberto.manifesto.get("sincronizado_em") != manifesto.get("sincronizado_em"):
+        aberto = _abertos[pasta] = SnapshotColunar(pasta, manifesto)
+    return aberto
+
+
+# --- Agregações do BI sobre o snapshot (mesmos resultados das versões SQL) ---
+
+def _nomes(conn, tabela, ids):
+    """{id: nome} só dos ids pedidos (cadastros são pequenos perto do histórico)."""
+    nomes = {}
+    ids = [int(i) for i in ids]
+    for i in range(0, len(ids), 900):
+        parte = ids[i:i + 900]
+        nomes.update(conn.execute(f"SELECT id, nome FROM {tabela} WHERE id IN ({', '.join('?' * len(parte))})", parte))
+    return nomes
+
+
+def mercado(s):
+    """(média paga, média concorrente) das corridas com preço do concorrente."""
+    com_preco = ~np.isnan(s["preco_concorrente"])
+    if not com_preco.any():
+        return None, None
+    valores = s["valor_total_pago"][com_preco]
+    media_valor = float(np.nanmean(valores)) if (~np.isnan(valores)).any() else None
+    return media_valor, float(s["preco_concorrente"][com_preco].mean())
+
+
+def top_lucro(s, limite=5):
+    """[(id, lucro líquido)] das corridas mais lucrativas."""
+    lucro = s["taxa_app_valor"] - s["custo_gateway"] - s["custos_fixos_totais"]
+    lucro = np.where(np.isnan(lucro), -np.inf, lucro)
+    limite = min(limite, len(lucro))
+    if limite == 0:
+        return []
+    candidatos = np.argpartition(lucro, -limite)[-limite:]
+    ordem = candidatos[np.argsort(-lucro[candidatos], kind="stable")]
+    return [(int(s["id"][i]), float(lucro[i]) if np.isfinite(lucro[i]) else None) for i in ordem]
+
+
+def clientes_fieis(s, conn, limite=3):
+    """[(nome, corridas)] dos clientes com mais corridas (agrupado por nome, como no SQL)."""
+    clientes = s["cliente_id"]
+    contagem = np.bincount(clientes[clientes >= 0])
+    ids = np.nonzero(contagem)[0]
+    por_nome = {}
+    for cliente_id, nome in _nomes(conn, "clientes", ids).items():
+        por_nome[nome] = por_nome.get(nome, 0) + int(contagem[cliente_id])
+    return sorted(por_nome.items(), key=lambda item: item[1], reverse=True)[:limite]
+
+
+def nota_media(s):
+    notas = s["avaliacao_motorista"]
+    return float(np.nanmean(notas)) if (~np.isnan(notas)).any() else None
+
+
+def ranking_turnos(s, conn, limite=10, ordem="comissao"):
+    """Mesmo formato de bi_operacional.ranking_turnos: [(Turno, [(nome, corridas, comissão)])]."""
+    turnos, motoristas = s["turno_id"], s["motorista_id"]
+    validas = (turnos >= 0) & (motoristas >= 0)
+    t, m = turnos[validas].astype(np.int64), motoristas[validas]
+    comissao = np.nan_to_num(s["taxa_app_valor"][validas])
+
+    largura = int(m.max()) + 1 if len(m) else 1
+    chave = t * largura + m
+    corridas = np.bincount(chave)
+    somas = np.bincount(chave, weights=comissao)
+    grupos = np.nonzero(corridas)[0]
+    nomes = _nomes(conn, "motoristas_cadastro", np.unique(grupos % largura))
+    # Só motoristas cadastrados, como o JOIN da versão SQL
+    grupos = grupos[np.isin(grupos % largura, np.fromiter(nomes, dtype=np.int64, count=len(nomes)))]
+
+    resultado = []
+    for turno in banco_tkx.listar_turnos(conn):
+        do_turno = grupos[grupos // largura == turno.id]
+        if len(do_turno) == 0:
+            resultado.append((turno, []))
+            continue
+        metrica = corridas[do_turno] if ordem == "corridas" else somas[do_turno]
+        # Maior métrica primeiro; empate pelo menor motorista_id, como no ROW_NUMBER() do SQL
+        escolhidos = do_turno[np.lexsort((do_turno % largura, -metrica))][:limite]
+        resultado.append((turno, [(nomes[int(g % largura)], int(corridas[g]), float(somas[g])) for g in escolhidos]))
+    return resultado
+
+
+def dados_bi_estrategico(conn=None):
+    conn = conn or banco_tkx.conectar()
+    s = sincronizar(conn)
+    media_valor, media_concorrente = mercado(s)
+    diferenca = None
+    if media_valor and media_concorrente:
+        diferenca = ((media_valor / media_concorrente) - 1) * 100
+    return {"diferenca_mercado": diferenca, "top_lucro": top_lucro(s), "clientes_fieis": clientes_fieis(s, conn)}
+
+
+def dados_bi_operacional(conn=None):
+    conn = conn or banco_tkx.conectar()
+    s = sincronizar(conn)
+    turnos = [(t.nome, t.hora_inicio, t.hora_fim, ranking) for t, ranking in ranking_turnos(s, conn)]
+    return {"turnos": turnos, "nota_media": nota_media(s) or 0}
+
+
+if __name__ == "__main__":
+    reconstruir = "--reconstruir" in sys.argv
+    inicio = time.perf_counter()
+    s = sincronizar(reconstruir=reconstruir, verbose=True)
+    print(f"✅ Snapshot com {s.linhas:,} corridas (até o id {s.ultimo_id}) em {s.pasta} "
+          f"[{time.perf_counter() - inicio:.2f}s]")
@@ -0,0 +1,234 @@
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+import banco_tkx
+import consolidado_dre
+import migracoes
+import popular_bi
+from migracoes import CONSOLIDADOS_DRE, DIAS_ANEL, JANELAS_METRICAS, PLACARES_AGREGADOS, SQL_CORTE_JANELAS
+
+# Confere o que os gatilhos mantêm (consolidados do DRE, placares, esboços de preços, janelas
+# móveis e totais dos clientes) contra o recálculo completo de consolidado_dre.reconstruir_consolidados,
+# depois de inserções, alterações e remoções aleatórias no histórico. Depois roda
+# migracoes.verificar_planos. Tudo numa cópia do banco: o original não é alterado.
+# Com --gerar, o banco é gerado pelo popular_bi (vários motoristas por dia, tamanho de CI).
+#
+#   python verificar_gatilhos.py                         banco atual (TKX_DB_PATH ou o do município)
+#   python verificar_gatilhos.py tkx_franca.db --operacoes 2000 --semente 7
+#   python verificar_gatilhos.py --gerar 20000 --operacoes 3000 --semente 5
+#
+# Sai com código 1 se alguma tabela divergir ou algum plano varrer o histórico sem permissão.
+
+OPERACOES = 500
+LOTE = 50                 # operações por transação
+MAXIMO_DIFERENCAS = 5     # diferenças mostradas por tabela
+ZERO = 1e-6               # resíduo de ponto flutuante das somas e descontos dos gatilhos
+# Banco gerado com --gerar: motoristas, clientes e dias do popular_bi
+GERAR_MOTORISTAS, GERAR_CLIENTES, GERAR_DIAS = 40, 500, 90
+COLUNAS_CORRIDA = ("motorista_id", "cliente_id", "valor_total_pago", "km_distancia", "taxa_app_valor", "custo_gateway",
+                   "custos_fixos_totais", "data_cadastro", "hora_partida", "preco_concorrente", "avaliacao_motorista")
+
+# tabela -> colunas-chave; as demais colunas são os valores comparados. Linhas só com zeros
+# (o que sobra quando os gatilhos descontam tudo, a menos de ZERO) contam como ausentes.
+CHAVES = {tabela: tuple(chaves) for tabela, chaves, _ in CONSOLIDADOS_DRE}
+CHAVES.update({tabela: ("mes", entidade) for tabela, entidade, *_ in PLACARES_AGREGADOS})
+CHAVES["esboco_precos"] = ("mes", "turno_id", "faixa_km", "metrica", "balde")
+CHAVES.update({tabela: (entidade, "dia") for tabela, entidade in JANELAS_METRICAS})
+CHAVES["clientes"] = ("id",)
+COLUNAS_CLIENTES = ("id", "total_corridas", "avaliacoes", "soma_notas", "nota_media")
+
+
+def copiar_banco(origem, pasta):
+    """Cópia consistente (API de backup, com o WAL) do banco e do banco de arquivo, se houver."""
+    destino = os.path.join(pasta, os.path.basename(origem))
+    base, extensao = os.path.splitext(origem)
+    arquivo = f"{base}_arquivo{extensao or '.db'}"
+    pares = [(origem, destino)]
+    if os.path.exists(arquivo):
+        pares.append((arquivo, os.path.join(pasta, os.path.basename(arquivo))))
+    for de, para in pares:
+        fonte, alvo = sqlite3.connect(de), sqlite3.connect(para)
+        with alvo:
+            fonte.backup(alvo)
+        fonte.close()
+        alvo.close()
+    return destino
+
+
+def _colunas(conn, tabela):
+    if tabela == "clientes":
+        return COLUNAS_CLIENTES
+    # A posição no anel sai do dia: não é um valor a comparar
+    return tuple(l[1] for l in conn.execute(f"PRAGMA table_info({tabela})") if l[1] != "posicao")
+
+
+def estado(conn):
+    """{tabela: {chave: valores}} das tabelas mantidas pelos gatilhos."""
+    corte = conn.execute(SQL_CORTE_JANELAS).fetchone()[0] or "0000-00-00"
+    resultado = {}
+    for tabela, chaves in CHAVES.items():
+        colunas = _colunas(conn, tabela)
+        filtro, params = "", ()
+        if tabela in dict(JANELAS_METRICAS):
+            # O recálculo só preenche os DIAS_ANEL dias a partir do corte; o anel pode guardar
+            # dias mais antigos que ainda não foram sobrescritos
+            filtro, params = f" WHERE dia >= ? AND dia < date(?, '+{DIAS_ANEL} days')", (corte, corte)
+        linhas = {}
+        for linha in conn.execute(f"SELECT {', '.join(colunas)} FROM {tabela}{filtro}", params):
+            registro = dict(zip(colunas, linha))
+            valores = tuple(v for c, v in registro.items() if c not in chaves)
+            if any(v is not None and abs(v) >= ZERO for v in valores):
+                linhas[tuple(registro[c] for c in chaves)] = valores
+        resultado[tabela] = linhas
+    # Top-K de lucro: empates podem trocar a corrida, não os valores do placar
+    lucros = {}
+    for mes, lucro in conn.execute("SELECT mes, lucro FROM placar_corridas_lucro"):
+        lucros.setdefault((mes,), []).append(round(lucro, 6))
+    resultado["placar_corridas_lucro"] = {mes: tuple(sorted(v)) for mes, v in lucros.items()}
+    return resultado
+
+
+def _iguais(a, b):
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    return a == b
+
+
+def comparar(gatilhos, recalculo):
+    """{tabela: [(chave, valores dos gatilhos, valores do recálculo)]} das linhas que divergem."""
+    diferencas = {}
+    for tabela, linhas in recalculo.items():
+        atuais = gatilhos[tabela]
+        for chave in sorted(set(atuais) | set(linhas), key=repr):
+            a, b = atuais.get(chave), linhas.get(chave)
+            if a is None or b is None or len(a) != len(b) or not all(map(_iguais, a, b)):
+                diferencas.setdefault(tabela, []).append((chave, a, b))
+    return diferencas
+
+
+def _corrida_aleatoria(conn, rnd, menor, maior):
+    """Id de uma corrida do histórico vivo (a primeira a partir de um id sorteado)."""
+    return conn.execute("""
+        SELECT COALESCE((SELECT id FROM historico_corridas WHERE id >= ? ORDER BY id LIMIT 1),
+                        (SELECT MAX(id) FROM historico_corridas))
+    """, (rnd.randint(menor, maior),)).fetchone()[0]
+
+
+def operacoes_aleatorias(conn, total, semente=None):
+    """Inserções, alterações e remoções sorteadas no histórico vivo. Devolve {operação: quantidade}."""
+    rnd = random.Random(semente)
+    motoristas = [l[0] for l in conn.execute("SELECT id FROM motoristas_cadastro")]
+    clientes = [l[0] for l in conn.execute("SELECT id FROM clientes")]
+    menor, maior = conn.execute("SELECT MIN(id), MAX(id) FROM historico_corridas").fetchone()
+    if maior is None or not motoristas:
+        raise LookupError("É preciso ter corridas e motoristas no histórico vivo.")
+    # Dias que já têm corridas no histórico vivo (meses particionados ficam de fora)
+    dias = [l[0] for l in conn.execute("SELECT DISTINCT date(data_cadastro) FROM historico_corridas "
+                                       "WHERE data_cadastro <= datetime('now', 'localtime')")]
+    contagem = {"inseridas": 0, "alteradas": 0, "removidas": 0}
+
+    def data():
+        return f"{rnd.choice(dias)} {rnd.randrange(24):02d}:{rnd.randrange(60):02d}:00"
+
+    sorteios = {
+        "motorista_id": lambda: rnd.choice(motoristas),
+        "cliente_id": lambda: rnd.choice(clientes + [None]) if clientes else None,
+        "valor_total_pago": lambda: round(rnd.uniform(8, 80), 2),
+        "km_distancia": lambda: rnd.choice([None, round(rnd.uniform(1, 30), 1)]),
+        "taxa_app_valor": lambda: round(rnd.uniform(1, 12), 2),
+        "preco_concorrente": lambda: rnd.choice([None, round(rnd.uniform(8, 80), 2)]),
+        "avaliacao_motorista": lambda: rnd.choice([None, 1, 2, 3, 4, 5]),
+        "data_cadastro": data,
+        "hora_partida": lambda: f"{rnd.randrange(24):02d}:{rnd.randrange(60):02d}",
+    }
+    feitas = 0
+    while feitas < total:
+        with banco_tkx.transacao(conn):
+            for _ in range(min(LOTE, total - feitas)):
+                feitas += 1
+                sorteio = rnd.random()
+                corrida_id = _corrida_aleatoria(conn, rnd, menor, maior)
+                if corrida_id is None:
+                    raise LookupError("O histórico vivo ficou vazio: use menos operações.")
+                if sorteio < 0.4:
+                    base = conn.execute(f"SELECT {', '.join(COLUNAS_CORRIDA)} FROM historico_corridas WHERE id = ?",
+                                        (corrida_id,)).fetchone()
+                    linha = dict(zip(COLUNAS_CORRIDA, base))
+                    for coluna in rnd.sample(list(sorteios), 3):
+                        linha[coluna] = sorteios[coluna]()
+                    conn.execute(f"INSERT INTO historico_corridas ({', '.join(linha)}) VALUES ({', '.join('?' * len(linha))})",
+                                 tuple(linha.values()))
+                    contagem["inseridas"] += 1
+                elif sorteio < 0.8:
+                    colunas = rnd.sample(list(sorteios), rnd.randint(1, 3))
+                    conn.execute(f"UPDATE historico_corridas SET {', '.join(f'{c} = ?' for c in colunas)} WHERE id = ?",
+                                 [sorteios[c]() for c in colunas] + [corrida_id])
+                    contagem["alteradas"] += 1
+                else:
+                    conn.execute("DELETE FROM historico_corridas WHERE id = ?", (corrida_id,))
+                    contagem["removidas"] += 1
+    return contagem
+
+
+def gerar_banco(pasta, corridas, semente=None):
+    """Banco novo em `pasta` com `corridas` corridas do popular_bi (pelos gatilhos, sem carga rápida)."""
+    caminho = os.path.join(pasta, "tkx_gerado.db")
+    popular_bi.carregar_corridas(corridas, GERAR_MOTORISTAS, GERAR_CLIENTES, GERAR_DIAS, semente=semente,
+                                 conn=banco_tkx.conectar(caminho), verbose=False)
+    return caminho
+
+
+def verificar(caminho=None, operacoes=OPERACOES, semente=None, verbose=True, gerar=None):
+    """Roda a verificação numa cópia de `caminho` (ou num banco de `gerar` corridas). Devolve True se tudo bateu."""
+    with tempfile.TemporaryDirectory(prefix="tkx_gatilhos_") as pasta:
+        copia = gerar_banco(pasta, gerar, semente) if gerar else copiar_banco(caminho, pasta)
+        conn = banco_tkx.conectar(copia)
+        try:
+            contagem = operacoes_aleatorias(conn, operacoes, semente)
+            if verbose:
+                print(f"Operações: {contagem['inseridas']} inserções, {contagem['alteradas']} alterações, "
+                      f"{contagem['removidas']} remoções")
+            gatilhos = estado(conn)
+            consolidado_dre.reconstruir_consolidados(conn=conn)
+            diferencas = comparar(gatilhos, estado(conn))
+
+            if verbose:
+                print("\n--- ESTADO DOS GATILHOS VS RECÁLCULO ---")
+                for tabela, linhas in gatilhos.items():
+                    problemas = diferencas.get(tabela, [])
+                    print(f"{'❌' if problemas else '✅'} {tabela} ({len(linhas):,} linhas)")
+                    for chave, a, b in problemas[:MAXIMO_DIFERENCAS]:
+                        print(f"     {chave}: gatilhos {a} | recálculo {b}")
+                    if len(problemas) > MAXIMO_DIFERENCAS:
+                        print(f"     ... e mais {len(problemas) - MAXIMO_DIFERENCAS}")
+                print("\n--- PLANOS DE EXECUÇÃO ---")
+            planos = migracoes.verificar_planos(conn, verbose)
+        finally:
+            banco_tkx.fechar_conexoes()
+    return not diferencas and planos
+
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Confere os gatilhos contra o recálculo completo, numa cópia do banco.")
+    parser.add_argument("banco", nargs="?", help="arquivo do banco (padrão: TKX_DB_PATH ou o do município atual)")
+    parser.add_argument("--operacoes", type=int, default=OPERACOES, help="inserções, alterações e remoções sorteadas")
+    parser.add_argument("--semente", type=int, help="semente dos sorteios (repete a mesma sequência)")
+    parser.add_argument("--gerar", type=int, metavar="CORRIDAS",
+                        help="em vez de copiar o banco, gera um com tantas corridas (popular_bi)")
+    args = parser.parse_args(argv)
+    if args.gerar is not None and args.banco:
+        parser.error("use o banco ou --gerar, não os dois")
+
+    caminho = None if args.gerar else banco_tkx.caminho_banco(args.banco)
+    sucesso = verificar(caminho, args.operacoes, args.semente, gerar=args.gerar)
+    print("\n✅ Gatilhos e planos conferidos." if sucesso else "\n❌ Há divergências (ver acima).")
+    sys.exit(0 if sucesso else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])